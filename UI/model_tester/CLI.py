@@ -1,6 +1,6 @@
 from .. import Path, run_function, fetch_resource, dataset_generator, npargmax, open_fileGUI, npappend
 from cmd import Cmd
-from .util import get_dataset
+from .util import get_dataset, read_input
 from csv import writer as csvwriter
 from tensorflow.data import Dataset as tfdataset
 
@@ -81,7 +81,8 @@ class ModelTesterCLI:
                 rootpath = Path.cwd()
 
             path = open_fileGUI(rootpath)
-            self.ds = tfdataset.from_tensor_slices(fetch_resource(path)[0])
+            self.selected_data = tfdataset.from_tensor_slices(read_input(path))
+            self.ds = self.selected_data
 
         def do_show_data(self, use = None):
             # Display data
@@ -1,9 +1,7 @@
 from .. import Path, Tk, ttk, filedialog, StringVar, build_blueprint, open_fileGUI, run_function, random_sample, get_dataset_info, show_data_tk, tfreshape, exit, dataset_generator, npargmax, nparray, npreshape, npsqueeze, tfdata, is_tensor, fetch_resource, take_image_screen, get_function_attr_values
 from .GUI_config import conf
 from utils.modules import fetch_model
-from utils.datasets import transform_features
-from .util import get_dataset
-from data.util.utils import load_encoders
+from .util import get_dataset, read_input
 
 class ModelTesterGUI:
 
@@ -42,17 +40,8 @@ class ModelTesterGUI:
             self.model = fetch_model(self.model_name, self.conf_name)
 
         
-        data = fetch_resource(path)
-        
-        # Preprocess data
-        print("Select encoders...")
-        encoders = load_encoders(open_fileGUI(Path.cwd().joinpath("data", "handlers")))
-        
-        print(encoders)
-        
-        data = transform_features(data, encoders)
-            
-        self.data = data
+        # Model input of the resource, csv rows can be preprocessed with the encoders fitted for the dataset
+        self.data = read_input(path)
         #self.label = label
         # Set up the data to display in the GUI
         self.setup_data(dataset=False)
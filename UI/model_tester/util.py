@@ -1,5 +1,7 @@
-from .. import Path, open_dirGUI
+from .. import Path, open_dirGUI, open_fileGUI, fetch_resource
 from data.dataset_handler import DatasetHandler
+from data.util.utils import load_encoders
+from utils.datasets import transform_features
 
 def get_dataset():
     # Fetch the dataset path
@@ -10,3 +12,25 @@ def get_dataset():
     dataset.load()
 
     return dataset.fetch_preprocessed_data()
+
+def read_input(path):
+    # Reads a resource as a model input
+    # Csv rows can be preprocessed with the encoders fitted for a dataset, they are asked only for csv files
+    # In:
+    #   path:                       Path, resource file
+    # Out:
+    #   data:                       numpy array, model input
+
+    resource = fetch_resource(path)
+    if path.suffix != '.csv':
+        # Images are returned as (image, model input) only if a shape is given
+        return resource[1] if isinstance(resource, tuple) else resource
+
+    data = resource[1]
+    if input("Preprocess with fitted encoders? (y/n): ").strip().lower() == 'y':
+        print("Select encoders...")
+        encoders = load_encoders(open_fileGUI(Path.cwd().joinpath("data", "handlers")))
+        print(encoders.steps)
+        data = transform_features(data, encoders)
+
+    return data
@@ -1,8 +1,11 @@
 from . import run_function, load_data, if_callable_class_function
 from data import data_info
+from data.util.statistics import sample_dataset
 
 def create_dataset(parsed):
-    load_data(parsed.ds, parsed.s, parsed.dh)
+    ds_handler = load_data(parsed.ds, parsed.s, parsed.dh)
+    if getattr(parsed, 'export_shards', None):
+        ds_handler.export_tfrecords(shards=parsed.export_shards)
 
 def dataset_information(parsed):
 
@@ -20,6 +23,9 @@ def dataset_information(parsed):
         print(parsed.use, " not found...")
         print("train, validate and test are available inputs for -use")
         exit()
+
+    # Information is computed from a random part of the dataset
+    dataset = sample_dataset(dataset, parsed.info_sample)
     
     # Run the function user is defined and feed inputs
     if if_callable_class_function(data_info, parsed.info):
@@ -5,7 +5,7 @@ def train_model(parsed):
 
     dataset = load_data(parsed.ds, parsed.s, parsed.dh)
 
-    train, validation, test = dataset.fetch_preprocessed_data(parsed.sub_sample)
+    train, validation, test = dataset.fetch_preprocessed_data(parsed.sub_sample, split_seed=getattr(parsed, 'split_seed', None))
     
     # Initialize model handler
     model_handler = ModelHandler((train, validation, test), parsed.m, parsed.c)
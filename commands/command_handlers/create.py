@@ -17,6 +17,7 @@ class CreateArgs:
                 {'name':['-dh'], 'type':str, 'required':True, 'help':'Name of the dataset handler, if dataset name (-ds) is not given, this -dh is used in its place'},
                 {'name':['-s'], 'type':str, 'default':None, 'help':'Name of the source file. Uses the default value in handler if None is given'},
                 {'name':['-ds'], 'type':str, 'default':None, 'help':'Name for the dataset'},
+                {'name':['--export_shards'], 'type':int, 'default':None, 'help':'Export the preprocessed splits into this many TFRecord shards per split'},
                 ]
             # Parse arguments
             parsed_args = create_args(parser_args, add_args)
@@ -49,6 +50,7 @@ class CreateArgs:
                 {'name':['--loss_function'], 'type':str, 'default':None, 'help':'Learning rate (do not change for sklearn functions)'},
                 {'name':['--optimization_function'], 'type':str, 'default':None, 'help':'Learning rate (do not change for sklearn functions)'},
                 {'name':['--sub_sample'], 'type':int, 'default':None, 'help':'Use a subsample of the dataset'},
+                {'name':['--split_seed'], 'type':int, 'default':None, 'help':'Seed of the train, validate and test split'},
                 ]
         
             # Parse arguments
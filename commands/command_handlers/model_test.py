@@ -16,7 +16,8 @@ class ModelTestArgs:
             {'name':['-use'], 'type':str, 'default':'train', 'help':'Dataset part used'},
             {'name':['--scale'], 'type':lambda x: (str(x).lower() in ['true', '1', 'yes']), 'default':False, 'help':'True = dataset svaling is applied'},
             {'name':['--balance'], 'type':lambda x: (str(x).lower() in ['true', '1', 'yes']), 'default':True, 'help':'True = dataset balancing is applied'},
-            {'name':['--sub_sample'], 'type':int, 'default':None, 'help':'Use a subsample of the dataset'}
+            {'name':['--sub_sample'], 'type':int, 'default':None, 'help':'Use a subsample of the dataset'},
+            {'name':['--info_sample'], 'type':float, 'default':None, 'help':'Fraction (0-1) of the dataset read by the information function'}
             ]
         # Parse arguments
         parsed_args = create_args(parser_args, add_args)
@@ -1,7 +1,7 @@
 from pathlib import Path
 from collections import Counter
 from operator import itemgetter
-from json import dump as jsondump, load as jsonload
+from json import dump as jsondump, load as jsonload, dumps as jsondumps, loads as jsonloads
 from sys import exit
 from importlib import import_module
 
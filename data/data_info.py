@@ -1,54 +1,39 @@
 from plotting.util.plotting import build_histogram
-from collections import Counter
-from third_party.scipy.util import print_description
+from third_party.scipy.util import print_statistics
+from .util.statistics import dataset_stats, dataset_frequencies
+
+# Information functions read the dataset batch by batch, so the dataset is never loaded in memory at once
+
+def plot_frequencies(counter):
+    values, counts = counter.frequencies()
+    print(counter.most_common())
+    build_histogram(counts, [str(v) for v in values])
 
 def frequencies(dataset):
     # Plots frequencies of a dataset by label
-    
-    # Get data and labels in a numpy array
-    for batch in dataset.batch(dataset.cardinality()):
-        labels = batch[1].numpy()
-    
-    # Convert labels to strings
-    labels = [str(i) for i in labels]
-    print(Counter(labels).most_common())
-    # Get number of instances per label
-    labels, amounts = zip(*sorted(Counter(labels).items(), key=lambda x: x[0]))
-
-    build_histogram(amounts, labels)
+    # Labels are counted with bincount (or unique for other than small integer labels) batch by batch
+    plot_frequencies(dataset_frequencies(dataset))
 
 def frequencies_by_feature(dataset):
     # Plots frequencies of a dataset by feature
-    
-    # Get data and labels in a numpy array
-    for batch in dataset.batch(dataset.cardinality()):
-        x = batch[0].numpy()
-        print(x.shape)
-        print("This dataset has ", x[0].shape, " features...")
-        if len(x[0].shape) == 1:
-            f = int(input("Choose feature (num): "))
-            labels = x[:, f-1:f].flatten()
-            print(labels.shape)
-        else:
-            print("More than 1 dim unimplemented...")
-            exit()
-
-        #labels = batch[1].numpy()
-    
-    print(Counter(labels).most_common())
-    # Get number of instances per label
-    labels, amounts = zip(*sorted(Counter(labels).items(), key=lambda x: x[0]))
+    # If a feature has too many distinct values the frequencies are shown as a histogram
+
+    shape = dataset.element_spec[0].shape
+    print("This dataset has ", tuple(shape), " features...")
+    if len(shape) == 1:
+        f = int(input("Choose feature (num): "))
+    else:
+        print("More than 1 dim unimplemented...")
+        exit()
 
-    build_histogram(amounts, labels)
+    plot_frequencies(dataset_frequencies(dataset, feature=f-1))
 
 def describe(dataset):
     # Prints description of the data
 
-    for batch in dataset.batch(dataset.cardinality()):
-        data = batch[0].numpy()
-        labels = batch[1].numpy()
+    data_stats, label_stats = dataset_stats(dataset)
     
     print("\nData description:")
-    print_description(data)
+    print_statistics(data_stats.describe())
     print("\nLabels description:")
-    print_description(labels)
+    print_statistics(label_stats.describe())
@@ -1,4 +1,10 @@
 from . import Path, jsondump, jsonload, Counter, itemgetter, import_module
+from .util.dataset_store import load_memmap_dataset, open_memmap_arrays, store_exists
+from .util.balancing import balance_dataset
+from .util.splitting import derive_split_dataset, DEFAULT_SPLIT_SEED
+from .util.tfrecord_store import export_tfrecords, DEFAULT_SHARDS
+from .util.preprocess_cache import PreprocessCache, DEFAULT_CACHE_BUDGET
+from .util.encoders import EncoderPipeline
 
 def import_error(mod, ds_name, path):
     print("You do not have a ",mod," for ", ds_name, " in ", path)
@@ -8,16 +14,19 @@ def import_error(mod, ds_name, path):
 class DatasetHandler:
     # Calls handlers
 
-    def __init__(self, handler_name, dataset_name, source):
+    def __init__(self, handler_name, dataset_name, source, cache_budget=DEFAULT_CACHE_BUDGET):
         # Initial variables and dataset fetch
         # In: 
         #   handler_name:               str, name of the handler to use.
         #   dataset_name:               str, name for/of the dataset.
         #   source:                     str, input for the fetcher .
+        #   cache_budget:               int, size budget in bytes for the cached preprocessed variants
         
         # Use handlers name as dataset name if it is not given
         if dataset_name is None:
             dataset_name = handler_name
+        self.handler_name = handler_name
+        self.dataset_name = dataset_name
         
         # Make a list from the parameters
         params = [handler_name, dataset_name]
@@ -35,6 +44,12 @@ class DatasetHandler:
             self.data_preprocessor = processor.DataPreprocessor(*params)
         else:
             import_error("DataPreprocessor", handler_name, p_path)
+
+        # Handlers which store their splits use the preprocessing cache
+        if hasattr(self.data_preprocessor, 'processed_path'):
+            self.cache = PreprocessCache(self.data_preprocessor.processed_path, cache_budget)
+        else:
+            self.cache = None
         
     def load(self, sub_sample=None):
         # Actual fetching of the data
@@ -44,12 +59,101 @@ class DatasetHandler:
         # Fetches the unpreprocessed data
         return self.data_preprocessor.get_data(sub_sample)
 
-    def fetch_preprocessed_data(self, sub_sample=None, scale=True, balance=True, new_split=False):
+    def fetch_preprocessed_data(self, sub_sample=None, scale=True, balance=True, new_split=False, split_seed=None):
+        # split_seed:   int, seed of the train, validate and test split, None = seed of the handler
+        #               Every seed is its own cached variant, a new seed shares the features of a stored variant
+        #               and writes only new index arrays and a new scaler
+        if split_seed is not None and hasattr(self.data_preprocessor, 'split_seed'):
+            self.data_preprocessor.split_seed = split_seed
+
+        if self.cache is None:
+            dataset = self.fetch_raw_data(sub_sample)
+            return self.data_preprocessor.preprocess(
+                                        dataset, 
+                                        scale, 
+                                        balance, 
+                                        new_split
+                                        )
+
+        # Every combination of raw data, handler code and arguments is its own variant
+        params = {'sub_sample': sub_sample, 'scale': scale, 'balance': balance}
+        if hasattr(self.data_preprocessor, 'balance_mode'):
+            # Stored splits are balanced when they are read, balanced and unbalanced variants are the same
+            del params['balance']
+        raw_path = getattr(self.data_preprocessor, 'raw_path', None)
+        key = self.cache.variant_key(raw_path, type(self.data_preprocessor), params)
+
+        split_seed = getattr(self.data_preprocessor, 'split_seed', None)
+        if split_seed is not None:
+            # Every split seed is its own variant so a stored split and scaler are never changed,
+            # variants of the other seeds with the same base key share their features
+            base_key = key
+            params = dict(params, split_seed=split_seed, base=base_key)
+            key = self.cache.variant_key(raw_path, type(self.data_preprocessor), params)
+        
+        # Preprocessor writes the splits in the variant folder
+        processed_path = self.cache.variant_path(key)
+        self.data_preprocessor.processed_path = processed_path
+
+        if not new_split and split_seed is not None and not self.cache.contains(key):
+            # Split the features of a variant with another seed again, only the index arrays and the scaler are new
+            source = self.cache.find_variant(base=base_key)
+            if source is not None:
+                scaler = derive_split_dataset(self.cache.variant_path(source), processed_path, split_seed)
+                if scaler is not None:
+                    self.data_preprocessor.feature_scaler = scaler
+                    EncoderPipeline([{"Input": "All", "Encoder": scaler}]).save(processed_path.joinpath("encoders.pkl"))
+                self.cache.register(key, params)
+
+        # Use the stored variant if it is found
+        if not new_split and self.cache.contains(key):
+            datasets = load_memmap_dataset(processed_path)
+            if datasets is not None:
+                self.cache.touch(key)
+                return self.balance_splits((datasets['train'], datasets['validate'], datasets['test']), balance)
+
         dataset = self.fetch_raw_data(sub_sample)
-        return self.data_preprocessor.preprocess(
+        datasets = self.data_preprocessor.preprocess(
                                     dataset, 
                                     scale, 
                                     balance, 
                                     new_split
                                     )
+        self.cache.register(key, params)
+        
+        return self.balance_splits(datasets, balance)
+
+    def balance_splits(self, datasets, balance):
+        # Balances the stored splits in the dataset pipelines if the handler has a balance_mode
+        # Labels are read from the stored label arrays so the splits are not read or copied
+        if not balance or not hasattr(self.data_preprocessor, 'balance_mode'):
+            return datasets
+
+        path = self.data_preprocessor.processed_path
+        arrays = open_memmap_arrays(path) if store_exists(path) else None
+        if arrays is None or not all(split in arrays for split in ('train', 'validate', 'test')):
+            print("Stored splits not found in ", path, ", splits are not balanced")
+            return datasets
+
+        # Balanced splits are selected with the split seed so they are reproducible
+        seed = getattr(self.data_preprocessor, 'split_seed', DEFAULT_SPLIT_SEED)
+        balanced = []
+        for split, dataset in zip(('train', 'validate', 'test'), datasets):
+            _, labels, indexes = arrays[split]
+            if indexes is not None:
+                labels = labels[indexes]
+            balanced.append(balance_dataset(dataset, self.data_preprocessor.balance_mode, labels=labels, seed=seed))
+
+        return tuple(balanced)
+
+    def export_tfrecords(self, path=None, shards=DEFAULT_SHARDS, sub_sample=None, scale=True, balance=True):
+        # Writes the preprocessed splits into sharded TFRecord files, read them with load_tfdataset (data/util/utils.py)
+        # In:
+        #   path:                       Path, export folder, None = tfrecords folder of the dataset
+        #   shards:                     int, files per split
+        if path is None:
+            path = Path("data", "handlers", self.handler_name, "datasets", self.dataset_name, "tfrecords")
 
+        datasets = self.fetch_preprocessed_data(sub_sample, scale, balance)
+        export_tfrecords(path, dict(zip(('train', 'validate', 'test'), datasets)), shards)
+        print("Dataset exported to ", path)
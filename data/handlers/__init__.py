@@ -1,8 +1,13 @@
 from .. import Path, jsonload, jsondump
-from ..util.data_fetching import load_with_tfds_load, mysqldb_fetch, spotify_api_fetch
-from ..util.preprocessing import normalize_image, preprocess_spotify_features, preprocess_billboard
+from ..util.data_fetching import load_with_tfds_load, mysqldb_fetch, mysqldb_fetch_chunks, spotify_api_fetch
+from ..util.preprocessing import normalize_image, preprocess_spotify_features, preprocess_billboard, extract_track_features, bucket_popularity, drop_duplicates
+from ..util.streaming import iter_json_records, read_feature_chunks
 from ..util.utils import save_encoders, load_encoders, save_tfdataset, load_tfdataset
-from random import sample as rndsample
+from ..util.dataset_store import save_memmap_dataset, load_memmap_dataset
+from ..util.tabular import read_zip_tables, sample_table, encode_column, fill_missing, stack_columns
+from ..util.statistics import array_stats, dataset_stats, fit_minmax_scaler
+from ..util.sampling import sample_indexes, sample_json_records, sample_tf_dataset
+from ..util.splitting import split_indexes, save_split_dataset, fit_split_scaler, DEFAULT_SPLIT_SEED
 
 from third_party.sklearn.sklearn_functions import split_dataset, label_encoding as sk_label_encoding, one_hot_encoding as sk_one_hot
 from tensorflow import data as tfdata
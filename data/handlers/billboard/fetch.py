@@ -1,4 +1,4 @@
-from .. import spotify_api_fetch, jsonload, tfdata, split_dataset, rndsample
+from .. import spotify_api_fetch, iter_json_records, jsonload, tfdata, split_dataset, sample_indexes, sample_json_records
 from collections import Counter
 from json import dump as jsondump
 
@@ -30,20 +30,30 @@ class DataFetcher:
             
             # Take a random sample of the full dataset
             if sample is not None:
-                new_data = {}
-                for key, value in rndsample(data.items(), sample):
-                    new_data[key] = value
-                data = new_data
+                items = list(data.items())
+                data = dict(items[i] for i in sample_indexes(len(items), sample))
             
             spotify_api_fetch(data, self.save_path, crawl_albums=True)
             
-        self.dataset = jsonload(self.save_path.open("r", encoding='utf-8'))
+
+    def read_dataset(self):
+        # The dataset file is read only when the raw data is needed
+        # so loading preprocessed splits does not parse the json
+        # Records are streamed from the file one by one
+        return iter_json_records(self.save_path)
 
 
     def get_data(self, sample=None):
         # Wrap dataset into tensorflow dataset object
         if sample is not None:
-            return rndsample(self.dataset, sample)
+            # Labels are sampled in proportion to their sizes
+            # The sample is cached so the same sub_sample is read without reading the whole dataset
+            return sample_json_records(
+                        self.save_path, 
+                        sample, 
+                        lambda records: [r.get('labels', 0) for r in records], 
+                        cache_folder=self.save_folder.joinpath("samples")
+                        )
         else:
-            return self.dataset
+            return self.read_dataset()
         
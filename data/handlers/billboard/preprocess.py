@@ -1,10 +1,8 @@
-from .. import tfdata, preprocess_spotify_features, split_dataset, Path, save_tfdataset, load_tfdataset, save_encoders
+from .. import tfdata, preprocess_spotify_features, extract_track_features, read_feature_chunks, drop_duplicates, Path, load_memmap_dataset, save_encoders, array_stats, fit_minmax_scaler, split_indexes, save_split_dataset, fit_split_scaler, DEFAULT_SPLIT_SEED
 from sklearn.preprocessing import MinMaxScaler
-from imblearn.under_sampling import RandomUnderSampler
 from third_party.scipy.util import print_description
-from numpy import array as nparray, unique as npunique
+from numpy import array as nparray
 from collections import Counter
-from pickle import dump as pkldump, load as pklload
 
 from .fetch import DataFetcher
 
@@ -20,140 +18,79 @@ class DataPreprocessor(DataFetcher):
         # Dataset saving path
         self.save_folder = Path(Path.cwd(), "data", "handlers", "billboard", "datasets", ds_name)
 
-        save_name = ds_name+"_dataset.json"
+        save_name = ds_name+"_dataset.jsonl"
 
         self.save_path = self.save_folder.joinpath(save_name)
+        # Datasets created before JSON Lines are read from the old json file
+        if not self.save_path.exists() and self.save_path.with_suffix(".json").exists():
+            self.save_path = self.save_path.with_suffix(".json")
+
+        # Preprocessed splits are stored here
+        # DatasetHandler points this to the cached variant folder
+        self.processed_path = self.save_folder.joinpath("processed")
+        # Raw data file used to identify the preprocessed variants
+        self.raw_path = self.save_path
+
+        # Tolerance for near duplicate features, None drops only exact duplicates
+        self.duplicate_tolerance = None
+        # Seed of the train, validate and test split, DatasetHandler splits the stored dataset again if it is changed
+        self.split_seed = DEFAULT_SPLIT_SEED
+        # Stored splits are balanced in the dataset pipeline (data/util/balancing.py)
+        # under = smallest class size, over = largest class size, weight = class weights
+        self.balance_mode = 'under'
         super()
 
-    def check_unique(self, features):
-        uniques, indexes, counts = npunique(features, return_index=True, return_counts=True, axis=0)
-        duplicate_indexes = [i for i, dupli in enumerate(features) if i not in indexes]
-        #print(len(duplicate_indexes))
-        #print(uniques.shape, indexes)
-        #print(features.shape)
-        return (uniques, duplicate_indexes, indexes)
+    def check_unique(self, features, labels):
+        # Drops duplicate tracks, features and labels stay aligned
+        # If duplicate_tolerance is set tracks with nearly equal features are also dropped
+        features, labels, _, duplicate_indexes = drop_duplicates(
+                                                    features, 
+                                                    labels, 
+                                                    tolerance=self.duplicate_tolerance
+                                                    )
+        print(len(duplicate_indexes), " duplicates dropped...")
+        return (features, labels, duplicate_indexes)
  
-    def balance_ds(self, features, labels):
-        #print(list(reversed(Counter(labels).most_common())))
-        sampler = RandomUnderSampler()
-        return sampler.fit_resample(features, labels)
-
-    def preprocess_features(self, features):
+    def preprocess_features(self, features, fit_indexes=None):
+        # Scaler is fitted from minimums and maximums computed chunk by chunk
+        # fit_indexes are the rows used to fit the scaler, None = all rows
         if not hasattr(self, 'feature_scaler'):
-            self.feature_scaler = MinMaxScaler()
-            self.feature_scaler.fit(features)
+            self.feature_scaler = fit_minmax_scaler(MinMaxScaler(), array_stats(features, indexes=fit_indexes))
         
         return self.feature_scaler.transform(features)
     
     def preprocess(self, dataset, scale=True, balance=True, new_split=False):
-        processed_path = self.save_folder.joinpath('p_data.pkl')
-        save_path = self.save_folder.joinpath("processed")
-        if not save_path.exists() or new_split:
-            
-            # Take features and popularities from the sample
-            features = []
-            labels = []
-            for d in dataset:
-                # Drop duration feature
-                feat = d['features']
-                # Take release year from date and add it to the features
-                date = d['release_date']
-                if '-' in date:
-                    split = date.split('-')
-                    if len(split) == 3:
-                        y, m, da = split
-                    elif len(split) == 2:
-                        y, m = split
-                    else:
-                        print("Not possible", date)
-
-                elif len(date) == 4:
-                    y = date
-                else:
-                    print(date)
-                    exit()
-
-                # Use only the decade
-                y = y[2:]
-            
-                feat.append(y)
-                features.append(feat)
-
-                if 'labels' in d.keys():
-                    label = d['labels']
-                else:
-                    label = 0
-
-                labels.append(int(label))
-            
-            features = nparray(features, dtype="float32")
-            features, duplicate_indexes, selected_indexes = self.check_unique(features)
-            # Drop duplicates from labels
-            if len(duplicate_indexes) > 1:
-                labels = [l for i, l in enumerate(labels) if i in selected_indexes]
         
-                duplicate_instances = []
-                for i, d in enumerate(dataset):
-                    if i in duplicate_indexes:
-                        duplicate_instances.append(d)
-            else:
-                print("No duplicates ", duplicate_indexes)
-                #print([d['name'] for d in duplicate_instances])
+        # Take features and labels from the sample in chunks
+        features, labels = read_feature_chunks(
+                                dataset, 
+                                lambda records: extract_track_features(records, 'labels', 0)
+                                )
         
-            # Cast to float32
-            features = nparray(features, dtype="float32")
-
-            # Description
-            #print_description(features)
-            #print_description(labels)
-            
-            # Split dataset
-            datasets = split_dataset(features, labels, 0.33, True, 0.15)
-
-            # Store split
-            pkldump(datasets, processed_path.open('wb'))
-
-            processed_datasets = []
-            if scale:
-                # Apply scaling
-                for dataset in datasets:
-                    # Convert to list for changes
-                    processed_datasets.append([self.preprocess_features(dataset[0]), dataset[1]])
-            else:
-                for dataset in datasets:
-                    processed_datasets.append([dataset[0], dataset[1]])
-
-            if balance:
-                # Balance out the dataset
-                # Done by taking a random sample from each dataset label subset
-                # the samples are equal sized = dataset is balanced
-                for i, dataset in enumerate(processed_datasets):
-                    # Convert to list for changes
-                    f, l = self.balance_ds(dataset[0], dataset[1])
-                    processed_datasets[i] = [f, l]
+        # Drop duplicates
+        features, labels, duplicate_indexes = self.check_unique(features, labels)
         
-            datasets = processed_datasets
-            # Wrap to tf dataset
-            train = tfdata.Dataset.from_tensor_slices((datasets[0][0], datasets[0][1]))
-            test = tfdata.Dataset.from_tensor_slices((datasets[2][0], datasets[2][1]))
-            validate = tfdata.Dataset.from_tensor_slices((datasets[1][0], datasets[1][1]))
-            
-            datasets = {
-                    "train": train,
-                    "validate": validate,
-                    "test": test
-                    }
-
+        # Train, validate and test splits as stratified index arrays
+        split_params = {'test_size': 0.33, 'validation': 0.15, 'seed': self.split_seed}
+        indexes = split_indexes(labels, **split_params)
+
+        # Description
+        #print_description(features)
+        #print_description(labels)
+
+        # Features are stored once as memory-mapped arrays and the splits as index arrays
+        # Splits are stored unbalanced, DatasetHandler balances them when they are read
+        save_split_dataset(self.processed_path, features, labels, indexes, split_params)
+        if scale:
+            # Stored features are unscaled, the scaler is fitted with the train rows and applied when the splits are read
+            self.feature_scaler = fit_split_scaler(self.processed_path, MinMaxScaler())
             encoder = [{
                     "Input": "All",
                     "Encoder": self.feature_scaler
                     }]
-            save_tfdataset(save_path, datasets)
-            save_encoders(save_path, encoder)
-        else:
-            datasets = load_tfdataset(save_path)
-            train = datasets['train']
-            validate = datasets['validate']
-            test = datasets['test']
+            save_encoders(self.processed_path, encoder)
+        
+        # Read the splits back from the store
+        datasets = load_memmap_dataset(self.processed_path)
 
-        return (train, validate, test)
+        return (datasets['train'], datasets['validate'], datasets['test'])
@@ -1,4 +1,4 @@
-from .. import Path, load_with_tfds_load
+from .. import Path, load_with_tfds_load, sample_tf_dataset
 
 class DataFetcher:
 
@@ -19,7 +19,11 @@ class DataFetcher:
             # Fetch the full dataset
             return self.dataset
         else:
-            # Fetch a random sample
-            train = self.dataset[0]
-            train.shuffle()
-            return train.take(sample)
+            # Fetch a random sample with the labels in proportion to their frequencies
+            # Sampled indexes are cached so the labels are read only once
+            return sample_tf_dataset(
+                        self.dataset[0], 
+                        sample, 
+                        self.handler_name+"/"+self.ds_name, 
+                        cache_folder=self.save_path.joinpath("samples")
+                        )
@@ -1,24 +1,36 @@
-from .. import spotify_api_fetch, mysqldb_fetch, jsonload, rndsample
+from .. import spotify_api_fetch, iter_json_records, mysqldb_fetch, jsonload, sample_indexes, sample_json_records, bucket_popularity
 from collections import Counter
 
 class DataFetcher:
 
     def load_data(self, sample=None):
         if not self.save_path.exists():
-            # Fetch data from mysql
+            # Fetch data from mysql, rows are streamed into numpy arrays
             data, labels = mysqldb_fetch(self.sql_path)
             if sample is not None:
-                data = rndsample(data, sample)
+                data = data[sample_indexes(len(data), sample)]
 
-            spotify_api_fetch(data, self.save_path)
+            spotify_api_fetch(data.tolist(), self.save_path)
         
-        self.dataset = jsonload(self.save_path.open("r", encoding='utf-8'))
+
+    def read_dataset(self):
+        # The dataset file is read only when the raw data is needed
+        # so loading preprocessed splits does not parse the json
+        # Records are streamed from the file one by one
+        return iter_json_records(self.save_path)
 
     def get_data(self, sample=None):
         # Wrap the dataset into a Tensorflow Dataset object
         if sample is not None:
-            return rndsample(self.dataset, sample)
+            # Popularity buckets are sampled in proportion to their sizes
+            # The sample is cached so the same sub_sample is read without reading the whole dataset
+            return sample_json_records(
+                        self.save_path, 
+                        sample, 
+                        lambda records: bucket_popularity([r['popularity'] for r in records]), 
+                        cache_folder=self.save_folder.joinpath("samples")
+                        )
         else:
-            return self.dataset
+            return self.read_dataset()
         
         
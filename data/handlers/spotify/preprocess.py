@@ -1,9 +1,8 @@
-from .. import tfdata, split_dataset, preprocess_spotify_features, Path, save_tfdataset, load_tfdataset, save_encoders
+from .. import tfdata, preprocess_spotify_features, extract_track_features, bucket_popularity, read_feature_chunks, drop_duplicates, Path, load_memmap_dataset, save_encoders, array_stats, fit_minmax_scaler, split_indexes, save_split_dataset, fit_split_scaler, DEFAULT_SPLIT_SEED
 from sklearn.preprocessing import MinMaxScaler
 from third_party.scipy.util import print_description
-from numpy import array as nparray, unique as npunique
+from numpy import array as nparray
 from collections import Counter
-from pickle import dump as pkldump, load as pklload
 
 from .fetch import DataFetcher
 
@@ -20,149 +19,85 @@ class DataPreprocessor(DataFetcher):
         self.save_folder = Path(Path.cwd(), "data", "handlers", "spotify", "datasets", ds_name)
         
         # DS save path
-        save_name = ds_name+"_dataset.json"
+        save_name = ds_name+"_dataset.jsonl"
 
         self.save_path = self.save_folder.joinpath(save_name)
+        # Datasets created before JSON Lines are read from the old json file
+        if not self.save_path.exists() and self.save_path.with_suffix(".json").exists():
+            self.save_path = self.save_path.with_suffix(".json")
+        
+        # Preprocessed splits are stored here
+        # DatasetHandler points this to the cached variant folder
+        self.processed_path = self.save_folder.joinpath("processed")
+        # Raw data file used to identify the preprocessed variants
+        self.raw_path = self.save_path
+
+        # Tolerance for near duplicate features, None drops only exact duplicates
+        self.duplicate_tolerance = None
+        # Seed of the train, validate and test split, DatasetHandler splits the stored dataset again if it is changed
+        self.split_seed = DEFAULT_SPLIT_SEED
         
         super()
 
-    def check_unique(self, features):
-        uniques, indexes, counts = npunique(features, return_index=True, return_counts=True, axis=0)
-        # NOTE try out filter function
-        duplicate_indexes = [i for i, dupli in enumerate(features) if i not in indexes]
-        print(len(duplicate_indexes))
-        print(uniques.shape, indexes)
-        print(features.shape)
-        return (uniques, duplicate_indexes, indexes)
-
-    def preprocess_features(self, features):
+    def check_unique(self, features, labels):
+        # Drops duplicate tracks, features and labels stay aligned
+        # If duplicate_tolerance is set tracks with nearly equal features are also dropped
+        features, labels, _, duplicate_indexes = drop_duplicates(
+                                                    features, 
+                                                    labels, 
+                                                    tolerance=self.duplicate_tolerance
+                                                    )
+        print(len(duplicate_indexes), " duplicates dropped...")
+        return (features, labels, duplicate_indexes)
+
+    def preprocess_features(self, features, fit_indexes=None):
         # Duration to scale 0 to 1
+        # Scaler is fitted from minimums and maximums computed chunk by chunk
+        # fit_indexes are the rows used to fit the scaler, None = all rows
         if not hasattr(self, 'feature_scaler'):
-            self.feature_scaler = MinMaxScaler()
-            self.feature_scaler.fit(features)
+            self.feature_scaler = fit_minmax_scaler(MinMaxScaler(), array_stats(features, indexes=fit_indexes))
         
         return self.feature_scaler.transform(features)
 
 
     def preprocess_labels(self, sample):
-        for i, s in enumerate(sample):
-            if s < 10:
-                sample[i] = 0
-            elif s < 20:
-                sample[i] = 1
-            elif s < 30:
-                sample[i] = 2
-            elif s < 40:
-                sample[i] = 3
-            elif s < 50:
-                sample[i] = 4
-            elif s < 60:
-                sample[i] = 5
-            elif s < 70:
-                sample[i] = 6
-            elif s < 80:
-                sample[i] = 7
-            elif s < 90:
-                sample[i] = 8
-            else:
-                sample[i] = 9
-
-        return sample
+        # Popularities to sets of tens
+        return bucket_popularity(sample)
 
     def preprocess(self, dataset, scale=True, balance=True, new_split=False):
         
-        processed_path = self.save_folder.joinpath('p_data.pkl')
-        save_path = self.save_folder.joinpath("processed")
-        if not save_path.exists() or new_split:
-            # Take features and popularities from the sample
-            # Also morph popularities into sets of tens
-            features = []
-            popularities = []
-            for d in dataset:
-                feat = d['features']
-                # Take release year from date and add it to the features
-                date = d['release_date']
-                if '-' in date:
-                    split = date.split('-')
-                    if len(split) == 3:
-                        y, m, da = split
-                    elif len(split) == 2:
-                        y, m = split
-                    else:
-                        print("Not possible", date)
-
-                elif len(date) == 4:
-                    y = date
-                else:
-                    print(date)
-                    exit()
-            
-                # Use only the decade
-                y = y[2:]
-            
-                # Add release year to the features
-                feat.append(y)
-
-                # Append to the feature list
-                features.append(feat)
-            
-                # Append to popularity list
-                popularity = d['popularity']
-                popularities.append(popularity)
-        
-            # Cast to float32
-            features = nparray(features, dtype="float32")
-            
-            features, duplicate_indexes, selected_indexes = self.check_unique(features)
-            labels = popularities
-            # NOTE try out filter
-            labels = [l for i, l in enumerate(labels) if i in selected_indexes]
-                
-            duplicate_instances = []
-            for i, d in enumerate(dataset):
-                if i in duplicate_indexes:
-                    duplicate_instances.append(d)
-
-            #print([d['name'] for d in duplicate_instances])
-        
-            labels = self.preprocess_labels(labels)
+        # Take features and popularities from the sample in chunks
+        # Also morph popularities into sets of tens
+        features, popularities = read_feature_chunks(
+                                    dataset, 
+                                    lambda records: extract_track_features(records, 'popularity')
+                                    )
         
-            # Split dataset
-            datasets = split_dataset(features, labels, 0.33, True, 0.15)
-        
-            # Store split
-            pkldump(datasets, processed_path.open('wb'))
-
-        
-            if scale:
-                # Apply scaling
-                for dataset in datasets:
-                    features = self.preprocess_features(dataset[0])
-
-            # Description
-            #print_description(features)
-            #print_description(labels)
-        
-            # Wrap to tf dataset
-            train = tfdata.Dataset.from_tensor_slices((datasets[0][0], datasets[0][1]))
-            test = tfdata.Dataset.from_tensor_slices((datasets[1][0], datasets[1][1]))
-            validate = tfdata.Dataset.from_tensor_slices((datasets[2][0], datasets[2][1]))
-            datasets = {
-                    "train": train,
-                    "validate": validate,
-                    "test": test
-                    }
-
+        features, labels, duplicate_indexes = self.check_unique(features, popularities)
+    
+        labels = self.preprocess_labels(labels)
+    
+        # Train, validate and test splits as stratified index arrays
+        split_params = {'test_size': 0.33, 'validation': 0.15, 'seed': self.split_seed}
+        indexes = split_indexes(labels, **split_params)
+
+        # Description
+        #print_description(features)
+        #print_description(labels)
+
+        # Features are stored once as memory-mapped arrays and the splits as index arrays
+        # Splits are stored unbalanced, DatasetHandler balances them when they are read
+        save_split_dataset(self.processed_path, features, labels, indexes, split_params)
+        if scale:
+            # Stored features are unscaled, the scaler is fitted with the train rows and applied when the splits are read
+            self.feature_scaler = fit_split_scaler(self.processed_path, MinMaxScaler())
             encoder = [{
                     "Input": "All",
                     "Encoder": self.feature_scaler
                     }]
-            save_tfdataset(save_path, datasets)
-            save_encoders(save_path, encoder)
-        else:
-            datasets = load_tfdataset(save_path)
-            train = datasets['train']
-            validate = datasets['validate']
-            test = datasets['test']
+            save_encoders(self.processed_path, encoder)
+        
+        # Read the splits back from the store
+        datasets = load_memmap_dataset(self.processed_path)
 
-        return (train, validate, test)
+        return (datasets['train'], datasets['validate'], datasets['test'])
@@ -1,58 +1,11 @@
-from .. import tfdata, rndsample, jsonload, jsondump, Path, save_tfdataset, load_tfdataset, save_encoders
+from .. import tfdata, Path, save_memmap_dataset, load_memmap_dataset, save_encoders, read_zip_tables, sample_table, encode_column, fill_missing, stack_columns
 from ...util.fetchers.kaggle.kaggle_fetcher import KaggleCompetitionDataFetcher
 
-from zipfile import ZipFile
-from csv import reader as csv_reader
-
 from sklearn.preprocessing import OrdinalEncoder, OneHotEncoder, MinMaxScaler
 from sklearn.model_selection import train_test_split
-from collections import Counter
-from numpy import mean as npmean, array as nparray, float32 as npfloat32, append as npappend
+from numpy import append as npappend, where as npwhere
 from scipy import stats
 
-def resolve_type(column):
-    # Check if column has any digit strings
-    if any(i.isdigit() for i in column):
-        # Add zeros to empty values
-        column = ['0' if i == '' else i for i in column]
-        # Check if all values are ints
-        if all(i.isdigit() for i in column):
-            return (column, int)
-        
-        # Check if there are decimal points and that there are no empty space values
-        if any('.' in i for i in column) and not any(' ' in i for i in column):
-            # Change empty values to 0.0
-            column = ['0.0' if i == '' else i for i in column]
-            return (column, float)
-
-    # No numeric values
-    return (column, str)
-
-def change_types(data):
-    # Used to change datatypes in titanic data
-    # The dataset contains numeric values in strings
-    # Change numeric types from strings to numeric
-    
-    # Seperate by columns
-    columns = zip(*data)
-    processed = []
-    for i, column in enumerate(columns):
-        column, i_type = resolve_type(column)
-        # If values were numeric change datatypes of the columns values
-        if i_type != str:
-            processed.append(list(map(i_type, column)))
-        else:
-            processed.append(column)
-
-    # Pack columns back together and return the data
-    return list(zip(*processed))
-    
-def list_to_2d_array(lst):
-    lst_2d = []
-    for i in range(len(lst)):
-        lst_2d.append(lst[i:i+1])
-    return lst_2d
-
 class DataPreprocessor(KaggleCompetitionDataFetcher):
 
     def __init__(self, h_name, ds_name, source=""):
@@ -63,195 +16,126 @@ class DataPreprocessor(KaggleCompetitionDataFetcher):
         # Dataset saving folder
         self.save_folder = Path(Path.cwd(), "data", "handlers", "titanic", "datasets", ds_name)
         print(self.save_folder)
+
+        # Preprocessed splits are stored here
+        # DatasetHandler points this to the cached variant folder
+        self.processed_path = self.save_folder.joinpath("processed")
+        # Raw data file used to identify the preprocessed variants
+        self.raw_path = self.save_folder.joinpath("titanic.zip")
         super()
 
     def import_data(self):
-        titanic_data = ZipFile(self.save_folder.joinpath("titanic.zip"))
-        
-        # Read train data csv
-        with titanic_data.open("train.csv", 'r') as f:
-            lines = (line.decode("utf-8") for line in f)
-            train = [line for line in csv_reader(lines)]
-            # Assign columns and data
-            train_columns = train[0]
-            train_data = train[1:]
-        
-        # Read test data csv
-        with titanic_data.open("test.csv", 'r') as f:
-            lines = (line.decode("utf-8") for line in f)
-            test = [line for line in csv_reader(lines)]
-                
-            test_columns = test[0]
-            test_data = test[1:]
-
-        # Read gender data csv
-        with titanic_data.open("gender_submission.csv", 'r') as f:
-            lines = (line.decode("utf-8") for line in f)
-            genders = [line for line in csv_reader(lines)]
-            
-            gender_columns = genders[0]
-            gender_data = genders[1:]
-        
-        data = {
-            'train': (train_columns, change_types(train_data)), 
-            'test': (test_columns, change_types(test_data)),
-            'gender': (gender_columns, change_types(gender_data))
-            }
-            
-        # Save features dataset to a json file
-        with self.save_folder.joinpath('titanic.json').open('w', encoding='utf8') as f:
-            jsondump(data, f, ensure_ascii=False)
-                        
+        # Reads the csv files from the .zip into typed column tables
+        return read_zip_tables(
+                    self.raw_path, 
+                    {
+                        'train': "train.csv", 
+                        'test': "test.csv", 
+                        'gender': "gender_submission.csv"
+                        }
+                    )
 
     def get_data(self, sample=None):
-        # Path to data
-        datapath = self.save_folder.joinpath("titanic.json")
-        if not datapath.exists():
-            # Read files from .zip
-            self.import_data()
-            
         # Load ds
-        self.unprocessed_dataset = jsonload(datapath.open("r", encoding='utf-8'))
+        self.unprocessed_dataset = self.import_data()
         if sample is not None:
-            return rndsample(self.unprocessed_dataset, sample)
-        else:
-            return self.unprocessed_dataset
+            # Sample only the labeled training rows
+            self.unprocessed_dataset['train'] = sample_table(self.unprocessed_dataset['train'], sample)
+        
+        return self.unprocessed_dataset
 
     def preprocess(self, dataset, scale=True, balance=True, new_split=False):
         
-        save_path = self.save_folder.joinpath("processed")
-        print(save_path)
-        if not save_path.exists():
-            # Preprocess original data
-            ds = {}
-            for key, data in dataset.items():
-                tags = data[0]
-                columns = list(zip(*data[1]))
-                ds[key] =  {tag: columns[i] for i, tag in enumerate(tags) }
-            train = ds['train']
-            test = ds['test']
-
-            final_order = ['Pclass', 'Sex', 'Age', 'Alone', 'Fare', 'Cabin', 'Embarked']
-            
-            encoders = (
-                    {'Input': 0, 'Encoder':OneHotEncoder()},
-                    {'Input': 1, 'Encoder':(OrdinalEncoder(), OneHotEncoder())},
-                    {'Input': 5, 'Encoder':OrdinalEncoder()},
-                    {'Input': 6, 'Encoder':OrdinalEncoder()},
-
-                    {'Input': 'All', 'Encoder':MinMaxScaler()},
-                    )
-
-            enc = encoders
-            
-            # Transform Pclass
-            enc[0]['Encoder'].fit(list_to_2d_array(train['Pclass']))
-            train['Pclass'] = enc[0]['Encoder'].transform(list_to_2d_array(train['Pclass'])).toarray()
-            test['Pclass'] = enc[0]['Encoder'].transform(list_to_2d_array(test['Pclass'])).toarray()
-            
-            # Transpose pclass and sex
-            train['Pclass'] = list(map(list, zip(*train['Pclass'])))
-            test['Pclass'] = list(map(list, zip(*test['Pclass'])))
-            
-            # Transform Sex
-            # Ordinal encoding
-            enc[1]['Encoder'][0].fit(list_to_2d_array(train['Sex'] + test['Sex']))
-            
-            train['Sex'] = enc[1]['Encoder'][0].transform(list_to_2d_array(train['Sex']))
-            test['Sex'] = enc[1]['Encoder'][0].transform(list_to_2d_array(test['Sex']))
-            
-            # One hot encoding
-            enc[1]['Encoder'][1].fit(train['Sex'])
-            train['Sex'] = enc[1]['Encoder'][1].transform(train['Sex']).toarray()
-            test['Sex'] = enc[1]['Encoder'][1].transform(test['Sex']).toarray()
-            
-            train['Sex'] = list(map(list, zip(*train['Sex'])))
-            test['Sex'] = list(map(list, zip(*test['Sex'])))
-            
+        # Tables of the original data, key = column name, value = typed column array
+        train = dict(dataset['train'])
+        test = dict(dataset['test'])
+        
+        final_order = ['Pclass', 'Sex', 'Age', 'Alone', 'Fare', 'Cabin', 'Embarked']
+        
+        encoders = (
+                {'Input': 0, 'Encoder':OneHotEncoder()},
+                {'Input': 1, 'Encoder':(OrdinalEncoder(), OneHotEncoder())},
+                {'Input': 5, 'Encoder':OrdinalEncoder()},
+                {'Input': 6, 'Encoder':OrdinalEncoder()},
+        
+                {'Input': 'All', 'Encoder':MinMaxScaler()},
+                )
+        
+        enc = encoders
+        
+        # Transform Pclass, encoder is fitted with the train set
+        train['Pclass'], test['Pclass'] = encode_column(
+                                            enc[0]['Encoder'], 
+                                            [train['Pclass']], 
+                                            [train['Pclass'], test['Pclass']]
+                                            )
+        
+        # Transform Sex, the labels are ordered with the values of both sets and one-hot encoded with the train set
+        ordinal, onehot = enc[1]['Encoder']
+        train['Sex'], test['Sex'] = encode_column(ordinal, [train['Sex'], test['Sex']], [train['Sex'], test['Sex']])
+        train['Sex'], test['Sex'] = encode_column(onehot, [train['Sex']], [train['Sex'], test['Sex']])
+        
+        # Transform Cabin and Embarked, encoders are fitted with the values of both sets
+        for e in enc[2:4]:
+            column = final_order[e['Input']]
+            train[column], test[column] = encode_column(
+                                            e['Encoder'], 
+                                            [train[column], test[column]], 
+                                            [train[column], test[column]]
+                                            )
+        
+        for table in (train, test):
             # Transform Age
             # Fill missing ages with mean
-            mean = npmean(nparray([i for i in train['Age'] if i != 0.0]))
-            train['Age'] = [i if i != 0.0 else mean for i in train['Age']]
-            
-            # Fill missing ages with mean
-            mean = npmean(nparray([i for i in test['Age'] if i != 0.0]))
-            test['Age'] = [i if i != 0.0 else mean for i in test['Age']]
-            
+            table['Age'] = fill_missing(table['Age'], 0.0)
+        
             # Transform Alone
             # Feature engineer is travelling alone
-            train['Alone'] = [0 if sum(with_num) < 1 else 1 for with_num in list(zip(train['SibSp'], train['Parch']))]
-            test['Alone'] = [0 if sum(with_num) < 1 else 1 for with_num in list(zip(test['SibSp'], test['Parch']))]
-            
             # If under 15 and alone add 1 because higly unlikely
-            train['Alone'] = [alone if alone == 0 and train['Age'][i] > 15 else 1 for i, alone in enumerate(train['Alone'])]
-            
-            # If under 15 and alone add 1 because higly unlikely
-            test['Alone'] = [alone if alone == 0 and test['Age'][i] > 15 else 1 for i, alone in enumerate(test['Alone'])]
-            
-            
-            # Transform Cabin
-            enc[2]['Encoder'].fit(list_to_2d_array(train['Cabin'] + test['Cabin']))
-            
-            train['Cabin'] = enc[2]['Encoder'].transform(list_to_2d_array(train['Cabin']))
-            test['Cabin'] = enc[2]['Encoder'].transform(list_to_2d_array(test['Cabin']))
-            
-            # Transform Embarked
-            enc[3]['Encoder'].fit(list_to_2d_array(train['Embarked'] + test['Embarked']))
-            
-            train['Embarked'] = enc[3]['Encoder'].transform(list_to_2d_array(train['Embarked']))
-            test['Embarked'] = enc[3]['Encoder'].transform(list_to_2d_array(test['Embarked']))
-            # zip back together
-            survived = train['Survived']
-            train_id_name = list(zip(train['PassengerId'], train['Name']))
-            train_data = nparray(list(zip(*train['Pclass'], *train['Sex'], train['Age'], train['Alone'], train['Fare'], train['Cabin'], train['Embarked'])), dtype=npfloat32)
-            
-            test_id_name = list(zip(test['PassengerId'], test['Name']))
-            test_data = nparray(list(zip(*test['Pclass'], *test['Sex'], test['Age'], test['Alone'], test['Fare'], test['Cabin'], test['Embarked'])), dtype=npfloat32)
-            
-            # Final MinMax scaling
-            enc[-1]['Encoder'].fit(npappend(train_data, test_data, 0))
-            train_data = enc[-1]['Encoder'].transform(train_data)
-            test_data = enc[-1]['Encoder'].transform(test_data)
-
-            desc = stats.describe(train_data)
-            print("Min: ", desc.minmax[0])
-            print("Max: ", desc.minmax[1])
-            print("Mean: ", desc.mean)
-            print("Variance: ", desc.variance)
-            print("Kurtosis: ", desc.kurtosis) 
-            #exit()
-            
-            # Split the training set to train and validation set
-            train_data, validation_data, survived, validation_survived = train_test_split(train_data, survived, test_size=0.33)
-            
-
-            desc = stats.describe(test_data)
-            print("Min: ", desc.minmax[0])
-            print("Max: ", desc.minmax[1])
-            print("Mean: ", desc.mean)
-            print("Variance: ", desc.variance)
-            print("Kurtosis: ", desc.kurtosis) 
-                
-            print(test_data.shape)
-            print(train_data.shape)
-            # Wrap to tf dataset
-            train = tfdata.Dataset.from_tensor_slices((train_data, survived))
-            test = tfdata.Dataset.from_tensor_slices((test_data, None))
-            validate = tfdata.Dataset.from_tensor_slices((validation_data, validation_survived))
-            
-            dataset = {
-                    "train": train,
-                    "validate": validate,
-                    "test": test
-                    }
-            save_path.mkdir()
-            save_tfdataset(save_path, dataset)
-            save_encoders(save_path, encoders)
-
-        else:
-            datasets = load_tfdataset(save_path)
-            train = datasets['train']
-            validate = datasets['validate']
-            test = datasets['test']
-
-        return (train, validate, test)
+            alone = (table['SibSp'] + table['Parch']) < 1
+            table['Alone'] = npwhere(alone & (table['Age'] > 15), 0, 1)
+        
+        # Stack columns into feature matrices
+        survived = train['Survived']
+        train_data = stack_columns(train, final_order)
+        test_data = stack_columns(test, final_order)
+        
+        # Final MinMax scaling
+        enc[-1]['Encoder'].fit(npappend(train_data, test_data, 0))
+        train_data = enc[-1]['Encoder'].transform(train_data)
+        test_data = enc[-1]['Encoder'].transform(test_data)
+        desc = stats.describe(train_data)
+        print("Min: ", desc.minmax[0])
+        print("Max: ", desc.minmax[1])
+        print("Mean: ", desc.mean)
+        print("Variance: ", desc.variance)
+        print("Kurtosis: ", desc.kurtosis) 
+        #exit()
+        
+        # Split the training set to train and validation set
+        train_data, validation_data, survived, validation_survived = train_test_split(train_data, survived, test_size=0.33)
+        
+        
+        desc = stats.describe(test_data)
+        print("Min: ", desc.minmax[0])
+        print("Max: ", desc.minmax[1])
+        print("Mean: ", desc.mean)
+        print("Variance: ", desc.variance)
+        print("Kurtosis: ", desc.kurtosis) 
+        
+        print(test_data.shape)
+        print(train_data.shape)
+        # Store splits as memory-mapped arrays
+        # Test set has no labels
+        splits = {
+                "train": (train_data, survived),
+                "validate": (validation_data, validation_survived),
+                "test": (test_data, None)
+                }
+        save_memmap_dataset(self.processed_path, splits)
+        save_encoders(self.processed_path, encoders)
+
+        # Read the splits back from the store
+        datasets = load_memmap_dataset(self.processed_path)
+
+        return (datasets['train'], datasets['validate'], datasets['test'])
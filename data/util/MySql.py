@@ -1,27 +1,189 @@
 from importlib.util import find_spec
 from UI.GUI_functions import Mysql_data_selector, define_relation
-import mysql.connector
-from .. import get_credentials
+from mysql.connector.pooling import MySQLConnectionPool
+from mysql.connector.errors import PoolError
+from functools import lru_cache
+from threading import Lock
+from time import monotonic, sleep
+from re import compile as re_compile
+from .. import get_credentials, nparray, exit
+
+# Connection pools shared by all connectors, key = connection arguments
+# Repeated dataset builds and parallel loaders reuse open connections
+POOLS = {}
+POOL_LOCK = Lock()
+DEFAULT_POOL_SIZE = 4
+# Seconds to wait for a free connection when the pool is exhausted
+POOL_TIMEOUT = 30
+
+IDENTIFIER_RE = re_compile(r"[A-Za-z0-9_$]+")
+
+def iter_query_chunks(connector, sql, params=None, chunk_size=10000, dtypes=None):
+    # Streams the results of a query as numpy column chunks
+    # Rows are read with fetchmany from an unbuffered cursor so only one chunk is in memory at once
+    # In:
+    #   connector:                      object with a cursor(streaming) method returning a DB-API cursor (MySQL_Connector)
+    #   sql:                            str, query
+    #   params:                         tuple, query parameters or None
+    #   chunk_size:                     int, rows in one chunk
+    #   dtypes:                         dict, key = column name, value = numpy dtype, other columns are inferred
+    # Out:
+    #   generator:                      yields dicts, key = column name, value = numpy array of the column values
+
+    dtypes = dtypes if dtypes is not None else {}
+    cursor = connector.cursor(streaming=True)
+    try:
+        if params is None:
+            cursor.execute(sql)
+        else:
+            cursor.execute(sql, params)
+
+        columns = [col[0] for col in cursor.description]
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+
+            yield {col: nparray(values, dtype=dtypes.get(col)) for col, values in zip(columns, zip(*rows))}
+    finally:
+        # Unbuffered results have to be read before the cursor can be closed
+        # this happens when the generator is not read to the end
+        try:
+            while cursor.fetchmany(chunk_size):
+                pass
+        except Exception:
+            pass
+        cursor.close()
+
+def quote_identifier(name):
+    # Validates a table or column name and quotes it for a query
+    # Identifiers can't be query parameters so they are checked against a whitelist of characters
+    # In:
+    #   name:                           str, identifier
+    # Out:
+    #   quoted:                         str, identifier in backticks
+
+    if not isinstance(name, str) or IDENTIFIER_RE.fullmatch(name) is None:
+        print("Invalid table or column name: ", name)
+        exit()
+
+    return "`"+name+"`"
+
+@lru_cache(maxsize=64)
+def build_join_query(data_table, data_name, label_table, label_name, relation):
+    # Builds the query joining data and labels from two tables
+    # Queries are cached, the same string object lets a prepared cursor reuse its statement
+    # In:
+    #   data_table, label_table:        str, table names
+    #   data_name, label_name:          str, column names
+    #   relation:                       tuple, (column in data table, column in label table) used in the join
+    # Out:
+    #   sql:                            str, query
+
+    data_key = quote_identifier(relation[0])
+    return (
+        "SELECT A."+data_key+", A."+quote_identifier(data_name)+" AS data, "
+        "MAX(B."+quote_identifier(label_name)+") AS label "
+        "FROM "+quote_identifier(data_table)+" A JOIN "+quote_identifier(label_table)+" B "
+        "ON (A."+data_key+" = B."+quote_identifier(relation[1])+") "
+        "GROUP BY A."+data_key
+        )
+
+@lru_cache(maxsize=64)
+def build_select_query(table, columns):
+    # Builds a query selecting columns from one table
+    # In:
+    #   table:                          str, table name
+    #   columns:                        tuple, (column name, alias or None) pairs, empty = all columns
+    # Out:
+    #   sql:                            str, query
+
+    if columns:
+        select = ", ".join(
+                    quote_identifier(col)+(" AS "+quote_identifier(alias) if alias is not None else "") 
+                    for col, alias in columns
+                    )
+    else:
+        select = "*"
+
+    return "SELECT "+select+" FROM "+quote_identifier(table)
+
+def get_pool(credentials, pool_size=DEFAULT_POOL_SIZE):
+    # Returns the connection pool of the credentials, the pool is created on the first call
+    # In:
+    #   credentials:                    dict, mysql.connector connection arguments
+    #   pool_size:                      int, connections in the pool
+    # Out:
+    #   pool:                           MySQLConnectionPool
+
+    key = tuple(sorted((k, str(v)) for k, v in credentials.items()))
+    with POOL_LOCK:
+        if key not in POOLS:
+            POOLS[key] = MySQLConnectionPool(
+                            pool_name="pool_%d" % len(POOLS), 
+                            pool_size=pool_size, 
+                            **credentials
+                            )
+        return POOLS[key]
 
 class MySQL_Connector:
     # Handles mysql.connector calls
 
-    def __init__(self):
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE):
+        # In:
+        #   pool_size:                  int, connections in the shared pool, used when the pool is created
+
         # Get credentials
         credentials = get_credentials('MySQL_connector_params')
         
-        for cred, val in credentials.items():
-            print(cred, val)
-            print(type(val))
-        # Initializes the connector
+        # Takes a connection from the pool
         if credentials is not None:
-            self.db = mysql.connector.connect(**credentials)
+            pool = get_pool(credentials, pool_size)
+            self.db = self.get_connection(pool)
         else:
             print("Define Mysql credentials... Check guide MySQL credentials!")
             exit()
 
+        # Prepared statement cursors, key = query
+        self.prepared = {}
+
+    def get_connection(self, pool):
+        # Waits for a free connection if all connections are in use
+        deadline = monotonic() + POOL_TIMEOUT
+        while True:
+            try:
+                return pool.get_connection()
+            except PoolError:
+                if monotonic() > deadline:
+                    raise
+                sleep(0.1)
+
+    def cursor(self, streaming=False):
+        # Creates a cursor, streaming cursor does not buffer the results on the client
+        return self.db.cursor(buffered=not streaming)
+
+    def execute(self, sql, params=()):
+        # Executes a parameterized query as a prepared statement
+        # The cursor of a query is reused so the statement is prepared only once per connection
+        # In:
+        #   sql:                        str, query with %s placeholders
+        #   params:                     tuple, query parameters
+        # Out:
+        #   cursor:                     prepared cursor with the results, results have to be read before the next execute
+
+        if sql not in self.prepared:
+            self.prepared[sql] = (sql, self.db.cursor(prepared=True))
+
+        # The cursor compares the query object, the stored query skips the prepare step
+        sql, cursor = self.prepared[sql]
+        cursor.execute(sql, params)
+        return cursor
+
     def close_connection(self):
-        # Closes the connection
+        # Returns the connection to the pool
+        for _, cursor in self.prepared.values():
+            cursor.close()
+        self.prepared = {}
         self.db.close()
         print("Database connection closed...")
     
@@ -31,26 +193,33 @@ class MySQL_Connector:
         cursor.execute("SHOW TABLES")
         return cursor
 
-    def get_data(self, select_q, from_q, inst=None, as_dict=False):
+    def get_data(self, select_q, from_q, inst=None, as_dict=False, params=()):
         # Makes a dataset query
-        cursor = self.db.cursor(dictionary=as_dict, buffered=True)
+        # In:
+        #   select_q:                   str, select part of the query
+        #   from_q:                     str, from part of the query, a plain table name is validated and quoted
+        #   inst:                       int, maximum number of rows, None = all
+        #   as_dict:                    bool, if True rows are returned as dicts
+        #   params:                     tuple, parameters for %s placeholders in the query
+        # Out:
+        #   (columns, data) or data:    list of column names and list of rows, or list of dicts if as_dict
+
+        if IDENTIFIER_RE.fullmatch(from_q):
+            from_q = quote_identifier(from_q)
         sql = "SELECT "+select_q+" FROM "+from_q
-        #print(sql)
-        cursor.execute(sql)
-    
-        if not as_dict:
-            columns = [col_name for col_name in cursor.column_names]
-            if inst is None:
-                data = [d for d in cursor]
-            else:
-                data = [d for d in cursor.fetchmany(inst)]
-        
-            cursor.close()
+        if inst is not None:
+            # Limit on the server instead of reading all rows and dropping the rest
+            sql += " LIMIT %s"
+            params = tuple(params) + (inst,)
         
+        cursor = self.execute(sql, tuple(params))
+        columns = [col[0] for col in cursor.description]
+        data = cursor.fetchall()
+
+        if not as_dict:
             return (columns, data)
         else:
-            data = [d for d in cursor]
-            return data
+            return [dict(zip(columns, d)) for d in data]
 
     def select_data(self):
         #
@@ -72,19 +241,17 @@ class MySQL_Connector:
                 dr = define_relation(data_cols, label_cols)
                 relations = (dr.relation_1.get(), dr.relation_2.get())
                 #print(relations)
-                data = self.get_data(
-                        "A."+relations[0]+", A."+data_name+" as data, max(B."+labels_name+") as label", 
-                        data_table+" A join "+label_table+" B on (A."+relations[0]+"=B."+relations[1]+") GROUP BY A."+relations[0],
-                        as_dict=True
-                        )
+                sql = build_join_query(data_table, data_name, label_table, labels_name, relations)
 
             else:
                 if labels_name != 'None':
-                    q = data_name+label_name
-                    print("No labels choosed...")
+                    columns = ((data_name, 'data'), (labels_name, 'label'))
                 else:
-                    q = data_name
+                    print("No labels choosed...")
+                    columns = ((data_name, 'data'),)
+
+                sql = build_select_query(data_table, columns)
 
-                data = self.get_data(data_table, q, as_dict=True)
-            
-            return data
+            cursor = self.execute(sql)
+            columns = [col[0] for col in cursor.description]
+            return [dict(zip(columns, d)) for d in cursor.fetchall()]
@@ -1,14 +1,85 @@
-from .. import nparray, npfloat32, npappend, npsave, jsondump, exit, Path, get_credentials
+from .. import nparray, npfloat32, npappend, npsave, jsondump, jsondumps, jsonloads, exit, Path, get_credentials
 from importlib.util import find_spec
 from spotipy import Spotify
 from spotipy.oauth2 import SpotifyClientCredentials
+from spotipy.exceptions import SpotifyException
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from time import sleep
+from .rate_limiter import TokenBucket
+from .response_cache import ResponseCache, DEFAULT_RESPONSE_TTL, DEFAULT_RESPONSE_BUDGET
 from collections import Counter
 from random import sample as rndsample
 
+# Maximum number of ids in one request for the Spotify API endpoints
+MAX_ALBUMS_PER_REQUEST = 20
+MAX_TRACKS_PER_REQUEST = 50
+MAX_FEATURES_PER_REQUEST = 100
+
+# Responses of the API are cached here, shared by all handlers using the API
+DEFAULT_RESPONSE_CACHE_PATH = Path(Path.cwd(), "data", "api_cache", "spotify_responses.sqlite")
+
+def count_requests(n_ids, batch_size):
+    # Number of requests needed to fetch n_ids ids
+    return -(-n_ids // batch_size)
+
+def read_checkpoint(checkpoint_path):
+    # Reads completed batches from a checkpoint file
+    # A batch written only partially before a crash is ignored
+    # In:
+    #   checkpoint_path:            Path, JSON Lines file, line = {'ids': fetched ids, 'results': batch results} or None
+    # Out:
+    #   (done_ids, results):        tuple, set of fetched ids and list of results
+
+    done_ids = set()
+    results = []
+    if checkpoint_path is None or not checkpoint_path.exists():
+        return (done_ids, results)
+
+    with checkpoint_path.open('r', encoding='utf8') as f:
+        for line in f:
+            try:
+                batch = jsonloads(line)
+            except ValueError:
+                break
+            done_ids.update(batch['ids'])
+            results.extend(batch['results'])
+
+    return (done_ids, results)
+
 class SpotifyAPI:
     # Handles spotify api features
 
-    def __init__(self):
+    def __init__(
+            self, 
+            client=None, 
+            workers=4, 
+            requests_per_second=10, 
+            max_retries=5, 
+            backoff=1.0, 
+            cache_path=DEFAULT_RESPONSE_CACHE_PATH, 
+            cache_ttl=DEFAULT_RESPONSE_TTL, 
+            cache_budget=DEFAULT_RESPONSE_BUDGET
+            ):
+        # In:
+        #   client:                 object implementing the used spotipy client methods, if None spotipy client is created from the credentials
+        #   workers:                int, number of threads making requests
+        #   requests_per_second:    float, rate limit shared by all threads
+        #   max_retries:            int, retries for a request answered with 429 or server error
+        #   backoff:                float, first wait in seconds when the response has no Retry-After header, doubled on every retry
+        #   cache_path:             Path, sqlite file of the response cache, None = responses are not cached
+        #   cache_ttl:              float, seconds a cached response is used
+        #   cache_budget:           int, maximum size of the cached responses in bytes
+
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.rate_limiter = TokenBucket(requests_per_second)
+        self.cache = ResponseCache(cache_path, cache_ttl, cache_budget) if cache_path is not None else None
+
+        if client is not None:
+            self.sp = client
+            return
+
         # Get credentials
         credentials = get_credentials('Spotify_API_credentials')
 
@@ -16,12 +87,103 @@ class SpotifyAPI:
 
             # Initializes spotipy api object
             # Uses Spotify account keys defined in credential.py
+            # Retries are handled here so that the wait is shared by all threads
             cc = SpotifyClientCredentials(**credentials)
-            self.sp = Spotify(client_credentials_manager=cc)
+            self.sp = Spotify(client_credentials_manager=cc, retries=0, status_retries=0)
         else:
             print("Credentials file not found... Check guide Spotify credential!")
             exit()
 
+    def request(self, method, *args):
+        # Calls a spotipy client method with rate limiting
+        # Rate limit (429) and server errors are retried after Retry-After header or exponential backoff
+        # In:
+        #   method:                 str, name of the client method
+        #   args:                   arguments of the method
+        # Out:
+        #   result:                 dict, response of the API
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                return getattr(self.sp, method)(*args)
+            except SpotifyException as e:
+                status = e.http_status
+                retryable = status == 429 or (status is not None and status >= 500)
+                if not retryable or attempt == self.max_retries:
+                    raise
+
+                retry_after = (e.headers or {}).get('Retry-After')
+                wait = float(retry_after) if retry_after is not None else self.backoff * 2 ** attempt
+                print("Spotify API responded ", status, ", retrying ", method, " in ", wait, " seconds...")
+                if status == 429:
+                    # Every thread has to wait, not only the one which got the response
+                    self.rate_limiter.pause(wait)
+                else:
+                    sleep(wait)
+
+    def request_items(self, method, ids, result_key=None):
+        # Requests the items of ids from an endpoint taking many ids
+        # Items found from the response cache are not requested, ids not found are not cached
+        # In:
+        #   method:                 str, name of the client method
+        #   ids:                    list, spotify ids
+        #   result_key:             str, key of the item list in the response, None if the response is the list
+        # Out:
+        #   items:                  list, item of every id in the same order, None if not found
+
+        cached = self.cache.get_many(method, ids) if self.cache is not None else {}
+        missing = [i for i in dict.fromkeys(ids) if i not in cached]
+
+        if missing:
+            response = self.request(method, missing)
+            items = response[result_key] if result_key is not None else response
+            fetched = dict(zip(missing, items))
+            if self.cache is not None:
+                # Unknown or unavailable ids (None) can be found later, they are requested again
+                self.cache.put_many(method, {i: item for i, item in fetched.items() if item is not None})
+            cached.update(fetched)
+
+        return [cached[i] for i in ids]
+
+    def fetch_concurrently(self, ids, batch_size, fetch_batch, checkpoint_path=None):
+        # Fetches batches of ids in a thread pool
+        # Every completed batch is appended to the checkpoint file,
+        # ids found from the checkpoint are not fetched again
+        # In:
+        #   ids:                    list, ids to fetch
+        #   batch_size:             int, ids in one batch
+        #   fetch_batch:            function, takes a list of ids and returns a list of results
+        #   checkpoint_path:        Path, JSON Lines checkpoint file or None
+        # Out:
+        #   results:                list, results of all batches
+
+        done_ids, results = read_checkpoint(checkpoint_path)
+        if done_ids:
+            print("Resuming from checkpoint ", checkpoint_path.name, ", ", len(done_ids), " ids already fetched...")
+
+        remaining = [i for i in ids if i not in done_ids]
+        batches = [remaining[i:i+batch_size] for i in range(0, len(remaining), batch_size)]
+
+        checkpoint = checkpoint_path.open('a', encoding='utf8') if checkpoint_path is not None else None
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = {executor.submit(fetch_batch, batch): batch for batch in batches}
+                for i, future in enumerate(as_completed(futures)):
+                    batch_results = future.result()
+                    results.extend(batch_results)
+                    if checkpoint is not None:
+                        checkpoint.write(jsondumps({'ids': futures[future], 'results': batch_results}, ensure_ascii=False)+"\n")
+                        checkpoint.flush()
+
+                    if i % 100 == 0:
+                        print("Batch ", i, "/", len(batches))
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+
+        return results
+
     def search_with_name(self, name, limit=10):
         # Make a spotify API search
         # In:
@@ -30,113 +192,166 @@ class SpotifyAPI:
         # Out:
         #   query results:          dict
 
-        return self.sp.search(name, limit)
+        return self.request('search', name, limit)
 
-    def fetch_album_tracks(self, album_ids_list, random_select=None):
-        # Loop album ids and fetch the track ids of tracks in every album
+    def fetch_album_tracks(self, album_ids_list, random_select=None, checkpoint_path=None, known_ids=None):
+        # Fetches the track ids of tracks in every album
+        # Albums are requested MAX_ALBUMS_PER_REQUEST at a time
+        # In:
+        #   album_ids_list:         list, album spotify ids
+        #   random_select:          int, number of tracks taken randomly from every album, None = all
+        #   checkpoint_path:        Path, checkpoint file or None
+        #   known_ids:              set, track ids which are already fetched, these are not selected
+        # Out:
+        #   track_ids:              list, track spotify ids
         
+        known_ids = known_ids if known_ids is not None else set()
         print("Fetching tracks from %d albums..." % len(album_ids_list))
-        track_ids = []
-        for i, album in enumerate(album_ids_list):
-            tracks = self.sp.album_tracks(album)['items']
-            if random_select is not None:
-                if random_select < len(tracks):
+
+        def fetch_albums(albums):
+            track_ids = []
+            for album in self.request_items('albums', albums, 'albums'):
+                if album is None:
+                    continue
+                tracks = [t['id'] for t in album['tracks']['items'] if t['id'] not in known_ids]
+                if random_select is not None and random_select < len(tracks):
                     tracks = rndsample(tracks, random_select)
-                else:
-                    rndsample(tracks, len(tracks))
-            for track in tracks:
-                track_ids.append(track['id'])
+                track_ids += tracks
+
+            return track_ids
+
+        return self.fetch_concurrently(album_ids_list, MAX_ALBUMS_PER_REQUEST, fetch_albums, checkpoint_path)
+
+    def fetch_track_batch(self, batch_track_ids, track_labels=None):
+        # Fetches and parses the data of one batch of tracks
+        # In:
+        #   batch_track_ids:                        list, track spotify ids
+        #   track_labels:                           dict, key = track_id, value = label value or list of labels, or None
+        # Out:
+        #   dataset:                                list of dicts, element contains the data for a single track
+
+        feature_results = self.request_items('audio_features', batch_track_ids)
+        # Tracks endpoint takes fewer ids than the audio features endpoint
+        track_results = {'tracks': []}
+        for i in range(0, len(batch_track_ids), MAX_TRACKS_PER_REQUEST):
+            track_results['tracks'] += self.request_items('tracks', batch_track_ids[i:i+MAX_TRACKS_PER_REQUEST], 'tracks')
+
+        dataset = []
+        for j, result in enumerate(feature_results):
+            if result is not None:
+                #Parse track information
+                track_info = track_results['tracks'][j]
+                track_release_date = track_results['tracks'][j]['album']['release_date']
+                track_album_id = track_results['tracks'][j]['album']['id']
+            
+                # Get artists
+                artists = []
+                for artist in track_info['artists']:
+                    artists.append({'id':artist['id'], 'name':artist['name']})
             
-            if i % 100 == 0:
-                print("Album ", i)
+                # Get track features
+                features = [
+                    result['time_signature'],
+                    result['duration_ms'],
+                    result['key'],
+                    result['mode'],
+                    result['acousticness'], 
+                    result['danceability'], 
+                    result['energy'], 
+                    result['instrumentalness'], 
+                    result['liveness'], 
+                    result['loudness'], 
+                    result['speechiness'], 
+                    result['valence'], 
+                    result['tempo'] 
+                    ]
         
-        return track_ids   
+                # This is the data for every instance stored in the dataset
+                track_data = {
+                    'name':track_info['name'],
+                    'id':track_info['id'],
+                    'artists':artists,
+                    'popularity':track_info['popularity'],
+                    'duration_ms':track_info['duration_ms'],
+                    'release_date':track_release_date,
+                    'album_id':track_album_id,
+                    'features':features
+                    }
+            
+                # Add labels to the track data if defined
+                if track_labels is not None:
+                    labels = track_labels[track_data['id']]
+                    if isinstance(labels, str) or isinstance(labels, int):
+                        track_data['labels'] = labels
+                    # For multiple labels take most common value
+                    elif isinstance(labels, list):
+                        track_data['labels'] = Counter(labels).most_common(1)[0][0]
+            
+                # Add track to dataset
+                dataset.append(track_data)
 
-    def fetch_track_features(self, track_id_list, batch_size=50):
+        return dataset
+
+    def fetch_track_features(self, track_id_list, batch_size=MAX_FEATURES_PER_REQUEST, checkpoint_path=None):
         # The actual function to fetch the data from Spotify API
+        # Batches are fetched concurrently, the order of the tracks is not preserved
         # In:
         #   track__id_list:                         list, track spotify id list or dict, where key = track_id, value = label value or list of DIFFERENT label values
-        #   batch_size:                             int, defines how big is one batch of track data to be fetched in every call to the API, max = 50
+        #   batch_size:                             int, defines how big is one batch of track data to be fetched in every call to the API, max = 100
+        #   checkpoint_path:                        Path, checkpoint file, fetching is resumed from it if it exists
         # Out:
         #   dataset:                                list of dicts, element contains the data for a single track
 
-        def batch_data(labels):
-            for i in range(0, len(track_id_list), batch_size):
-                if labels:
-                    yield list(track_id_list.keys())[i:i+batch_size]
-                else:
-                    yield track_id_list[i:i+batch_size]
-        
-        #Fetch track information in batches and create dataset
-        dataset = []
-        labels = True if isinstance(track_id_list,  dict) else False
-        for i, batch in enumerate(batch_data(labels)):
-            #Get ids of current batch and fetch info from Spotify API
-            batch_track_ids = batch
-
-            feature_results = self.sp.audio_features(batch_track_ids)
-            track_results = self.sp.tracks(batch_track_ids)
-            if i % 100 == 0:
-                print("Batch ", i)
-
-            for j, result in enumerate(feature_results):
-                if result is not None:
-                    #Parse track information
-                    track_info = track_results['tracks'][j]
-                    track_release_date = track_results['tracks'][j]['album']['release_date']
-                    track_album_id = track_results['tracks'][j]['album']['id']
-                
-                    # Get artists
-                    artists = []
-                    for artist in track_info['artists']:
-                        artists.append({'id':artist['id'], 'name':artist['name']})
-                
-                    # Get track features
-                    features = [
-                        result['time_signature'],
-                        result['duration_ms'],
-                        result['key'],
-                        result['mode'],
-                        result['acousticness'], 
-                        result['danceability'], 
-                        result['energy'], 
-                        result['instrumentalness'], 
-                        result['liveness'], 
-                        result['loudness'], 
-                        result['speechiness'], 
-                        result['valence'], 
-                        result['tempo'] 
-                        ]
-            
-                    # This is the data for every instance stored in the dataset
-                    track_data = {
-                        'name':track_info['name'],
-                        'id':track_info['id'],
-                        'artists':artists,
-                        'popularity':track_info['popularity'],
-                        'duration_ms':track_info['duration_ms'],
-                        'release_date':track_release_date,
-                        'album_id':track_album_id,
-                        'features':features
-                        }
-                
-                    # Add labels to the track data if defined
-                    tracks = []
-                    if labels:
-                        track_labels = track_id_list[track_data['id']]
-                        if isinstance(track_labels, str) or isinstance(track_labels, int):
-                            track_data['labels'] = track_labels
-                        # For multiple labels take most common value
-                        elif isinstance(track_labels, list):
-                            track_data['labels'] = Counter(track_labels).most_common(1)[0][0]
-                    tracks.append(track_data)
-                
-                    # Add track to dataset
-                    for track in tracks:
-                        dataset.append(track)
-    
-        return dataset
+        if isinstance(track_id_list, dict):
+            ids = list(track_id_list.keys())
+            track_labels = track_id_list
+        else:
+            ids = list(track_id_list)
+            track_labels = None
+
+        return self.fetch_concurrently(
+                    ids, 
+                    batch_size, 
+                    lambda batch: self.fetch_track_batch(batch, track_labels), 
+                    checkpoint_path
+                    )
     
+    def crawl_albums(self, dataset, track_id_list, random_select, checkpoints=(None, None)):
+        # Plans and fetches the tracks from the albums of the dataset tracks
+        # Every album is requested once and tracks already in the dataset are never requested again
+        # In:
+        #   dataset:                            list of dicts, fetched tracks
+        #   track_id_list:                      list or dict, track ids given to make_feature_dataset
+        #   random_select:                      int, number of new tracks taken from every album
+        #   checkpoints:                        tuple, checkpoint paths for the album and track fetches
+        # Out:
+        #   new_tracks:                         list of dicts, data of the crawled tracks
+
+        album_ids = [d['album_id'] for d in dataset]
+        # Keep the order so that resumed crawls create the same batches
+        unique_album_ids = list(dict.fromkeys(album_ids))
+        known_ids = set(track_id_list) | set(d['id'] for d in dataset)
+
+        track_ids = self.fetch_album_tracks(unique_album_ids, random_select, checkpoints[0], known_ids)
+        track_ids = list(dict.fromkeys(track_ids))
+
+        # Requests made without the plan: one album_tracks call per album id,
+        # features and tracks calls in batches of 50 for every selected track
+        selected = len(album_ids) * random_select
+        naive_requests = len(album_ids) + 2 * count_requests(selected, MAX_TRACKS_PER_REQUEST)
+        planned_requests = (count_requests(len(unique_album_ids), MAX_ALBUMS_PER_REQUEST)
+                            + count_requests(len(track_ids), MAX_FEATURES_PER_REQUEST)
+                            + count_requests(len(track_ids), MAX_TRACKS_PER_REQUEST))
+        print("Album crawl: %d albums (%d unique), %d new tracks, %d requests instead of %d..." % (
+                len(album_ids), 
+                len(unique_album_ids), 
+                len(track_ids), 
+                planned_requests, 
+                naive_requests
+                ))
+
+        return self.fetch_track_features(track_ids, checkpoint_path=checkpoints[1])
+
     def make_feature_dataset(self, track_id_list, save_path, filename=None, crawl_albums=False):
         # Takes spotify track id list, fetches data into dataset
         # and saves data in a created folder with trackdilespath filename as a name
@@ -146,7 +361,7 @@ class SpotifyAPI:
         #   save_path:                          Path object, path to saved dataset
         
         if filename is None:
-            if save_path.suffix != '.json':
+            if save_path.suffix not in ['.json', '.jsonl']:
                 print("You must either give a filename or put it in the path")
                 exit()
             else:
@@ -166,31 +381,37 @@ class SpotifyAPI:
                 else:
                     print("Directory exists!")
                     overwrite = input("Do you want to overwrite existing features?(y/n)")
-                    if overerite != 'y':
+                    if overwrite != 'y':
                         exit()
         
+        # Completed batches of every fetching stage are stored in checkpoint files
+        # next to the dataset, a restarted fetch continues from them
+        checkpoints = [
+            save_path.with_suffix(".tracks.ckpt"),
+            save_path.with_suffix(".albums.ckpt"),
+            save_path.with_suffix(".crawl.ckpt")
+            ]
+
         # Fetch track features
-        dataset = self.fetch_track_features(track_id_list)
+        dataset = self.fetch_track_features(track_id_list, checkpoint_path=checkpoints[0])
         if crawl_albums:
-            # Get all album ids
-            album_ids = []
-            for d in dataset:
-                album_ids.append(d['album_id'])
-
-            # Fetch 5 tracks from albums
-            random_select = 5
-            tracks = self.fetch_album_tracks(album_ids, random_select)
-            dataset2 = self.fetch_track_features(tracks)
-            
-            # Add fetched tracks into the dataset
-            for d2 in dataset2:
-                if d2['id'] not in track_id_list:
-                    dataset.append(d2)
+            # Fetch 5 new tracks from every album
+            dataset += self.crawl_albums(dataset, track_id_list, 5, checkpoints[1:])
             
-        # Save features dataset to a json file
+        # Save features dataset to a JSON Lines file, one track per line
+        # so the dataset can be read without loading the whole file
         with save_path.open('w', encoding='utf8') as jf:
-            jsondump(dataset, jf, ensure_ascii=False)
+            for track in dataset:
+                jf.write(jsondumps(track, ensure_ascii=False)+"\n")
 
         print("Features have been saved in: ", save_path," ...")
+
+        # Dataset is complete, checkpoints are not needed anymore
+        for checkpoint in checkpoints:
+            if checkpoint.exists():
+                checkpoint.unlink()
+
+        if self.cache is not None:
+            self.cache.report()
         
         return (dataset, save_path)
@@ -0,0 +1,122 @@
+from .statistics import StreamingFrequencies, dataset_frequencies, STATS_CHUNK_SIZE
+from .sampling import ReservoirSampler, select_elements
+from numpy import zeros, asarray, sort as npsort
+from tensorflow import constant as tfconstant, gather as tfgather, cast as tfcast, int64 as tfint64, random as tfrandom, \
+    data as tfdata, tensor_scatter_nd_add as tftensor_scatter_nd_add
+from sys import exit
+
+# Class balancing of Tensorflow dataset pipelines
+# Elements are selected, repeated or weighted while the dataset is read, so the splits are never copied
+#   under:      every class is sampled to the size of the smallest class, with the labels array the sampled indexes
+#               are selected exactly, from a dataset every element is kept with the probability min count / class count
+#               (rejection resampling)
+#   over:       elements are repeated so every class has the size of the largest class, the dataset is read once
+#   weight:     elements get a class weight (x, y, weight) and nothing is resampled
+
+BALANCE_MODES = ('under', 'over', 'weight')
+
+def class_counts(dataset=None, labels=None):
+    # Counts the elements of every class
+    # In:
+    #   dataset:                    Tensorflow Dataset object, (data, label) elements, read batch by batch
+    #   labels:                     numpy array or memmap, labels of the dataset, read instead of the dataset if given
+    # Out:
+    #   counts:                     numpy array, count of every class, index = class label
+
+    if labels is not None:
+        frequencies = StreamingFrequencies()
+        for start in range(0, len(labels), STATS_CHUNK_SIZE):
+            frequencies.update(asarray(labels[start:start+STATS_CHUNK_SIZE]))
+    else:
+        frequencies = dataset_frequencies(dataset)
+
+    values, found = frequencies.frequencies()
+    if values.dtype.kind not in 'iu' or (len(values) and values.min() < 0):
+        print("Balancing needs class labels 0-n, labels found: ", values[:10], "...")
+        exit()
+
+    counts = zeros(int(values.max()) + 1 if len(values) else 0, dtype='int64')
+    counts[values] = found
+    return counts
+
+def label_lookup(values):
+    # Returns a function which maps the label of an element to a value of a class
+    values = tfconstant(values)
+    return lambda y: tfgather(values, tfcast(y, tfint64))
+
+def undersample(dataset, counts, seed=None, labels=None):
+    # Keeps every class in the size of the smallest class
+    # In:
+    #   labels:                     numpy array or memmap, labels of the dataset, None = rejection resampling
+    # Out:
+    #   dataset:                    Tensorflow Dataset object, min count elements per class,
+    #                               about min count elements per class without labels
+    found = counts[counts > 0]
+    if labels is not None:
+        # Smallest random keys of every class are kept, the reservoir holds exactly min count elements per class
+        sampler = ReservoirSampler(int(found.min()), seed, stratified=True)
+        for start in range(0, len(labels), STATS_CHUNK_SIZE):
+            sampler.update(strata=asarray(labels[start:start+STATS_CHUNK_SIZE]))
+        return select_elements(dataset, npsort(sampler.ids))
+
+    probability = label_lookup((found.min() / counts.clip(1)).astype('float32'))
+    # Random value of an element depends only on the seed and the position so the selection is reproducible
+    seed = 0 if seed is None else seed
+
+    return dataset.enumerate().filter(
+                lambda i, element: tfrandom.stateless_uniform((), seed=[seed, i]) < probability(element[1])
+                ).map(lambda i, element: element)
+
+def oversample(dataset, counts):
+    # Repeats every class to the size of the largest class in one pass over the dataset
+    # The j:th element of a class is repeated floor((j+1) * max / count) - floor(j * max / count) times,
+    # repeats are next to each other so the pipeline should shuffle the elements
+    # Out:
+    #   dataset:                    Tensorflow Dataset object, max count elements per class
+    largest = int(counts.max())
+    class_sizes = tfconstant(counts.clip(1).astype('int64'))
+
+    def repeats(seen, element):
+        # seen:                     int64 Tensor, elements of every class read so far
+        x, y = element
+        c = tfcast(y, tfint64)
+        j = tfgather(seen, c)
+        size = tfgather(class_sizes, c)
+        n = (j + 1) * largest // size - j * largest // size
+        return (tftensor_scatter_nd_add(seen, [[c]], tfconstant([1], tfint64)), (x, y, n))
+
+    balanced = dataset.scan(zeros(len(counts), dtype='int64'), repeats)
+    balanced = balanced.flat_map(lambda x, y, n: tfdata.Dataset.from_tensors((x, y)).repeat(n))
+    return balanced.apply(tfdata.experimental.assert_cardinality(largest * int((counts > 0).sum())))
+
+def weight_classes(dataset, counts):
+    # Adds a class weight to every element, weights are scaled so that the mean weight of an element is 1
+    # Out:
+    #   dataset:                    Tensorflow Dataset object, (data, label, weight) elements
+    weights = zeros(len(counts), dtype='float32')
+    found = counts > 0
+    weights[found] = counts.sum() / (found.sum() * counts[found])
+    weight = label_lookup(weights)
+
+    return dataset.map(lambda x, y: (x, y, weight(y)), num_parallel_calls=tfdata.experimental.AUTOTUNE)
+
+def balance_dataset(dataset, mode='under', labels=None, seed=None):
+    # Balances the classes of a dataset
+    # In:
+    #   dataset:                    Tensorflow Dataset object, (data, label) elements with int class labels
+    #   mode:                       str, under, over or weight
+    #   labels:                     numpy array or memmap, labels of the dataset, None = labels are read from the dataset
+    #   seed:                       int, random seed
+    # Out:
+    #   dataset:                    Tensorflow Dataset object
+
+    if mode not in BALANCE_MODES:
+        print("Balance mode ", mode, " not found, available modes: ", BALANCE_MODES)
+        exit()
+    counts = class_counts(dataset, labels)
+
+    if mode == 'under':
+        return undersample(dataset, counts, seed, labels)
+    elif mode == 'over':
+        return oversample(dataset, counts)
+    return weight_classes(dataset, counts)
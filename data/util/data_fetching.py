@@ -1,8 +1,9 @@
 from .. import Path, input_check, path_check
-from .MySql import MySQL_Connector
+from .MySql import MySQL_Connector, iter_query_chunks
+from numpy import array as nparray, concatenate as npconcatenate
 from .Spotify_functions import SpotifyAPI
 from tensorflow_datasets import load as tfds_load
-from csv import reader as csv_reader
+from utils.csv_engine import read_csv
 from subprocess import call as sub_call
 
 # TODO Automatic input checking
@@ -58,81 +59,103 @@ def load_with_tfds_load(
             data_dir=save_path
             )
 
-def mysqldb_fetch(path):
-    # Fetches a data, label combination from MySQL dataset
+def mysqldb_fetch_chunks(path, connector=None, chunk_size=10000):
+    # Streams a data, label combination from MySQL database
     # In:
     #   path:                   Path object, path to the sql file
+    #   connector:              MySQL_Connector or an object with the same cursor interface, None = connect with the credentials
+    #   chunk_size:             int, rows read from the database at once
     # Out:
-    #   (data, labels)          tuple of arrays where data i = label i
-    
-    def cli_ui_asker(input_msg):
+    #   generator:              yields (data, labels) tuples of numpy arrays where data i = label i, labels is None if not selected
+
+    def cli_ui_asker(input_msg, keys):
         while not False:
             inp = input(input_msg)
             if inp == '':
                 print("No key given...")
                 return inp
-            elif l not in instance.keys():
-                print("\n"+l, " not a key "+str(list(instance.keys())))
+            elif inp not in keys:
+                print("\n"+inp, " not a key "+str(keys))
             else:
                 return inp
 
-    input_check(path, [Path], "path in mysqldb_fetch")
+    input_check(path, [Path], "path in mysqldb_fetch_chunks")
     
-    connector = MySQL_Connector()
-    #print(path)
-    data = []
-    labels = []
+    # Connection taken here is returned to the pool when the rows are read
+    own_connector = connector is None
+    if own_connector:
+        connector = MySQL_Connector()
+
+    # Read sql file
+    with path.open('r') as f:
+        sql_command = f.read()
+    
+    data_key = 'data'
+    label_key = 'label'
+    try:
+        for chunk in iter_query_chunks(connector, sql_command, chunk_size=chunk_size):
+            keys = list(chunk.keys())
+            if data_key not in chunk:
+                # Ask the user to define which is used as data
+                data_key = cli_ui_asker("Use as data "+str(keys)+": ", keys)
+                if data_key == '':
+                    print("No data key give... exiting...")
+                    exit()
+
+            if label_key is not None and label_key not in chunk:
+                # Ask the user to define what are used as labels
+                label_key = cli_ui_asker("Use as labels (no labels, press enter) "+str(keys)+": ", keys)
+                if label_key == '':
+                    label_key = None
+
+            yield (chunk[data_key], chunk[label_key] if label_key is not None else None)
+    finally:
+        if own_connector:
+            connector.close_connection()
+
+def mysqldb_fetch(path, connector=None, chunk_size=10000):
+    # Fetches a data, label combination from MySQL dataset
+    # In:
+    #   path:                   Path object, path to the sql file
+    #   connector:              MySQL_Connector or an object with the same cursor interface, None = connect with the credentials
+    #   chunk_size:             int, rows read from the database at once
+    # Out:
+    #   (data, labels)          tuple of arrays where data i = label i
+    
+    input_check(path, [Path], "path in mysqldb_fetch")
     
     # Experimental
     if path.name == 'open_db':
+        own_connector = connector is None
+        if own_connector:
+            connector = MySQL_Connector()
+        data = []
+        labels = []
         fetched_data = connector.select_data()
+        if own_connector:
+            connector.close_connection()
         for di in fetched_data:
             #print(di)
             data.append(di['data'])
             labels.append(di['label'])
+        
+        return (data, labels)
 
     #Read data with .sql file
     elif path.suffix == '.sql':
-        # Read sql file
-        with path.open('r') as f:
-            sql = f.readlines()
-        #Prepare the sql command
-        sql_command = ''
-        for i, command in enumerate(sql):
-            sql_command += command
+        data = []
+        labels = []
+        for data_chunk, label_chunk in mysqldb_fetch_chunks(path, connector, chunk_size):
+            data.append(data_chunk)
+            if label_chunk is not None:
+                labels.append(label_chunk)
         
-        #Prepare cursor and fetch data
-        cursor = connector.db.cursor(dictionary=True)
-        cursor.execute(sql_command)
-        
-        data_key = 'data'
-        label_key = 'label'
-        for instance in cursor:
-            # Data is found from results
-            if data_key in instance.keys():
-                data.append(instance[data_key])
-            else:
-                # Ask the user to define which is used as data
-                data_key = cli_ui_asker("Use as data "+str(list(instance.keys())+ ": "))
-                if data_key == '':
-                    print("No data key give... exiting...")
-                    exit()
-                else:
-                    data.append(instance[d])
-            
-            if label_key in instance.keys():
-                # Label are defined
-                labels.append(instance[label_key])
-            else:
-                # Ask teh user to define what are used as labels
+        if not data:
+            return (nparray([]), nparray([]))
 
-                label_key = cli_ui_asker("Use as labels (no labels, press enter) "+str(list(instance.keys()))+": ")
-                if label_key != '':
-                    labels.append(instance[l])
-        
-        cursor.close()
+        return (npconcatenate(data), npconcatenate(labels) if labels else nparray([]))
     
-    return (data, labels)
+    return ([], [])
 
 def kaggle_competition_download(competition_name, path, f=""):
     # In:
@@ -186,32 +209,32 @@ def kaggle_download(ds_name, path, f=""):
     # Make download call
     sub_call(call)
 
-def file_fetch(path):
+def file_fetch(path, processes=None):
     # This function is not currently in use but it's for reading csv files
-    # TODO Write comment
+    # First row is taken as the column names
+    # In:
+    #   path:                           Path object, path to the csv file
+    #   processes:                      int, processes parsing the file, None = parsed in this process
+    # Out:
+    #   (data, labels):                 tuple, numpy array of the rows (float32 if all values are numeric, else str) and list of column names
 
     input_check(path, [Path], "path from file_fetch")
     path_check(path)
     
     data = []
     labels = []
-    unwanted_characters = ['ï»¿', ';', '*']
+    unwanted_characters = ('ï»¿', ';', '*')
     if path.suffix == '.csv':
-        reader = csv_reader(path.open('r'), delimiter=',')
-        for i, row in enumerate(reader):
-            if i == 0:
-                for key in row:
-                    for uw in unwanted_characters:
-                        key = key.replace(uw, '')
-                    labels.append(key)
-            else:
-                # Check characters
-                for i, r in enumerate(row):
-                    if isinstance(r, str):
-                        for uw in unwanted_characters:
-                            r = r.replace(uw, '')
-                        row[i] = r
-                data.append(row)
+        try:
+            labels, data = read_csv(path, 'float32', strip=unwanted_characters, processes=processes)
+        except ValueError:
+            # Non numeric values are kept as strings
+            data = read_csv(path, str, strip=unwanted_characters, processes=processes)[1]
+            labels = data[0].tolist() if len(data) else []
+            data = data[1:]
+        
+        if labels is None:
+            labels = []
     
     return (data, labels)
 
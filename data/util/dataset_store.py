@@ -0,0 +1,211 @@
+from .. import Path, jsondump, jsonload
+from numpy import save as npsave, load as npload, ascontiguousarray, asarray
+from tensorflow import data as tfdata, as_dtype, TensorShape
+
+# Memory-mapped dataset store
+# Every split is stored as fixed dtype .npy files (x.npy and y.npy) inside a split folder
+# and a manifest describes the stored arrays
+# Arrays are opened with numpy memmap so the data is read from the disk only when it is used
+# Splits can also be stored as index arrays over a stored base split (indexes/<split>.npy),
+# rows of these splits are gathered from the base arrays when they are read
+# A store can have a feature scaling (x * scale + offset) in the manifest, it is applied to the rows when they are read
+
+STORE_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+def store_exists(path):
+    # Checks if a valid dataset store is found from the path
+    # In:
+    #   path:                           Path, to the store folder
+    # Out:
+    #   boolean:                        True if the manifest is found and its version is supported
+
+    manifest_path = path.joinpath(MANIFEST_NAME)
+    if not manifest_path.exists():
+        return False
+
+    with manifest_path.open('r', encoding='utf-8') as f:
+        manifest = jsonload(f)
+
+    return manifest.get('version') == STORE_VERSION
+
+def read_manifest(path):
+    with path.joinpath(MANIFEST_NAME).open('r', encoding='utf-8') as f:
+        return jsonload(f)
+
+def write_manifest(path, manifest):
+    # Manifest is replaced at once so a half written manifest is never read
+    tmp_path = path.joinpath(MANIFEST_NAME+".tmp")
+    with tmp_path.open('w', encoding='utf-8') as f:
+        jsondump(manifest, f)
+    tmp_path.replace(path.joinpath(MANIFEST_NAME))
+
+def save_memmap_dataset(path, datasets, x_dtype='float32', y_dtype='int32'):
+    # Saves dataset splits as .npy arrays and writes a manifest
+    # In:
+    #   path:                           Path, to the store folder
+    #   datasets:                       dict, key = split name, value = (features, labels), labels can be None
+    #   x_dtype:                        str, datatype for the features
+    #   y_dtype:                        str, datatype for the labels
+    # Out:
+    #   manifest:                       dict, description of the stored arrays
+
+    if not path.exists():
+        path.mkdir(parents=True)
+
+    # Remove old manifest so that a half written store is never read
+    manifest_path = path.joinpath(MANIFEST_NAME)
+    if manifest_path.exists():
+        manifest_path.unlink()
+
+    manifest = {'version': STORE_VERSION, 'splits': {}}
+    for split, (x, y) in datasets.items():
+        split_path = path.joinpath(split)
+        if not split_path.exists():
+            split_path.mkdir()
+
+        arrays = {'x': ascontiguousarray(x, dtype=x_dtype)}
+        if y is not None:
+            arrays['y'] = ascontiguousarray(y, dtype=y_dtype)
+
+        split_info = {'length': int(arrays['x'].shape[0]), 'arrays': {}}
+        for name, array in arrays.items():
+            with split_path.joinpath(name+".npy").open('wb') as f:
+                npsave(f, array)
+
+            split_info['arrays'][name] = {
+                    'file': split+"/"+name+".npy",
+                    'dtype': str(array.dtype),
+                    'shape': list(array.shape)
+                    }
+
+        manifest['splits'][split] = split_info
+
+    # Manifest is written last, it marks the store complete
+    write_manifest(path, manifest)
+
+    return manifest
+
+def open_memmap_arrays(path):
+    # Opens the stored arrays as memory-mapped arrays
+    # In:
+    #   path:                           Path, to the store folder
+    # Out:
+    #   arrays:                         dict, key = split name, value = (x memmap, y memmap or None, indexes or None)
+    #                                   indexes are the rows of an index split in the x and y arrays of its base split
+
+    manifest = read_manifest(path)
+
+    arrays = {}
+    for split, split_info in manifest['splits'].items():
+        opened = {}
+        for name, info in split_info['arrays'].items():
+            array = npload(str(path.joinpath(info['file'])), mmap_mode='r')
+            if str(array.dtype) != info['dtype'] or list(array.shape) != info['shape']:
+                print("Stored array ", info['file'], " does not match the manifest in ", path)
+                return None
+            opened[name] = array
+
+        arrays[split] = (opened['x'], opened.get('y'), None)
+
+    for split, split_info in manifest.get('index_splits', {}).items():
+        x, y, _ = arrays[split_info['base']]
+        indexes = npload(str(path.joinpath(split_info['file'])))
+        if len(indexes) != split_info['length']:
+            print("Stored indexes ", split_info['file'], " do not match the manifest in ", path)
+            return None
+        arrays[split] = (x, y, indexes)
+
+    return arrays
+
+def save_split_indexes(path, base, indexes, split_params=None):
+    # Stores splits as index arrays over a stored split, the arrays of the base split are not rewritten
+    # In:
+    #   path:                           Path, to the store folder
+    #   base:                           str, name of the stored split the indexes point to
+    #   indexes:                        dict, key = split name, value = int numpy array of rows in the base split
+    #   split_params:                   dict, parameters used to create the split (stored in the manifest)
+
+    manifest = read_manifest(path)
+    index_path = path.joinpath("indexes")
+    if not index_path.exists():
+        index_path.mkdir()
+
+    manifest['index_splits'] = {}
+    for split, split_indexes in indexes.items():
+        with index_path.joinpath(split+".npy").open('wb') as f:
+            npsave(f, ascontiguousarray(split_indexes, dtype='int64'))
+        manifest['index_splits'][split] = {'base': base, 'file': "indexes/"+split+".npy", 'length': int(len(split_indexes))}
+    manifest['split_params'] = split_params
+
+    write_manifest(path, manifest)
+
+def save_feature_scaling(path, scale=None, offset=None):
+    # Stores the feature scaling applied when the splits are read
+    # In:
+    #   path:                           Path, to the store folder
+    #   scale:                          numpy array, multiplier of every feature, None = features are not scaled
+    #   offset:                         numpy array, added to every feature after the multiplication
+
+    manifest = read_manifest(path)
+    if scale is None:
+        manifest.pop('feature_scaling', None)
+    else:
+        manifest['feature_scaling'] = {'scale': asarray(scale).tolist(), 'offset': asarray(offset).tolist()}
+    write_manifest(path, manifest)
+
+def memmap_to_tfdataset(x, y=None, chunk_size=4096, indexes=None, scaling=None):
+    # Wraps memory-mapped arrays into a Tensorflow Dataset object
+    # Rows are read from the memmap in chunks so the full array is never copied
+    # In:
+    #   x:                              numpy memmap, features
+    #   y:                              numpy memmap, labels or None
+    #   chunk_size:                     int, number of rows read at once
+    #   indexes:                        numpy array, rows read in this order (gathered chunk by chunk), None = all rows
+    #   scaling:                        dict, feature_scaling of the manifest ('scale' and 'offset'), None = no scaling
+    # Out:
+    #   dataset:                        Tensorflow Dataset object
+
+    length = x.shape[0] if indexes is None else len(indexes)
+    if scaling is not None:
+        scale = asarray(scaling['scale'], dtype=x.dtype)
+        offset = asarray(scaling['offset'], dtype=x.dtype)
+
+    def read_chunks():
+        for start in range(0, length, chunk_size):
+            rows = slice(start, start+chunk_size) if indexes is None else indexes[start:start+chunk_size]
+            features = x[rows] if scaling is None else x[rows] * scale + offset
+            if y is None:
+                yield features
+            else:
+                yield (features, y[rows])
+
+    x_type = as_dtype(x.dtype)
+    x_shape = TensorShape([None]+list(x.shape[1:]))
+    if y is None:
+        types = x_type
+        shapes = x_shape
+    else:
+        types = (x_type, as_dtype(y.dtype))
+        shapes = (x_shape, TensorShape([None]+list(y.shape[1:])))
+
+    dataset = tfdata.Dataset.from_generator(read_chunks, output_types=types, output_shapes=shapes)
+    dataset = dataset.unbatch()
+
+    # Generator datasets have unknown length, functions using cardinality need it
+    return dataset.apply(tfdata.experimental.assert_cardinality(length))
+
+def load_memmap_dataset(path, chunk_size=4096):
+    # Loads the stored splits as Tensorflow Dataset objects
+    # In:
+    #   path:                           Path, to the store folder
+    #   chunk_size:                     int, number of rows read at once
+    # Out:
+    #   datasets:                       dict, key = split name, value = Tensorflow Dataset object or None if store is broken
+
+    arrays = open_memmap_arrays(path)
+    if arrays is None:
+        return None
+
+    scaling = read_manifest(path).get('feature_scaling')
+    return {split: memmap_to_tfdataset(x, y, chunk_size, indexes, scaling) for split, (x, y, indexes) in arrays.items()}
@@ -0,0 +1,194 @@
+from numpy import asarray, empty as npempty
+from pickle import dump as pkldump, load as pklload, HIGHEST_PROTOCOL
+from sys import exit
+
+# Fitted encoder pipeline
+# Steps are the {'Input', 'Encoder'} dicts created by the handlers
+#   Input int:      index of the input column, the encoder (or a tuple of encoders applied in order)
+#                   transforms the column into one or more feature columns
+#   Input 'All':    the encoder transforms the whole feature matrix after the column steps
+# Columns without a step are passed through as they are
+# The whole batch of inputs is transformed at once, every encoder is called once per batch
+
+PIPELINE_FORMAT = "encoder_pipeline"
+PIPELINE_VERSION = 1
+
+def encoder_chain(encoder):
+    if isinstance(encoder, (tuple, list)):
+        return tuple(encoder)
+    return (encoder,)
+
+def output_width(chain):
+    # Number of feature columns a fitted chain creates from one input column
+    last = chain[-1]
+    if hasattr(last, 'categories_') and hasattr(last, 'drop_idx_') and last.drop_idx_ is None:
+        # One hot encoder
+        return sum(len(c) for c in last.categories_)
+    return 1
+
+def apply_encoder(encoder, data, inverse=False):
+    # Applies one encoder to a 2d array
+    # Plain functions (for example image normalization) are called with the data
+    if inverse:
+        if not hasattr(encoder, 'inverse_transform'):
+            print(encoder, " can't be inverted, data is returned as it is...")
+            return data
+        result = encoder.inverse_transform(data)
+    elif hasattr(encoder, 'transform'):
+        result = encoder.transform(data)
+    else:
+        result = encoder(data)
+        if isinstance(result, tuple):
+            # Functions mapping (data, label) pairs
+            result = result[0]
+
+    # Encoders can return sparse matrices
+    return result.toarray() if hasattr(result, 'toarray') else asarray(result)
+
+class EncoderPipeline:
+
+    def __init__(self, steps=()):
+        # In:
+        #   steps:                      list, {'Input': int or 'All', 'Encoder': encoder or tuple of encoders} dicts
+
+        if isinstance(steps, dict):
+            steps = [steps]
+
+        self.column_steps = {}
+        self.matrix_steps = []
+        for step in steps:
+            chain = encoder_chain(step['Encoder'])
+            if step['Input'] == 'All':
+                self.matrix_steps.extend(chain)
+            else:
+                self.column_steps[int(step['Input'])] = chain
+
+    @property
+    def steps(self):
+        # Steps in the format used by the handlers
+        steps = [{'Input': i, 'Encoder': c if len(c) > 1 else c[0]} for i, c in sorted(self.column_steps.items())]
+        steps += [{'Input': 'All', 'Encoder': e} for e in self.matrix_steps]
+        return steps
+
+    def fit(self, data):
+        # Fits every encoder, column encoders with their column and matrix encoders with the column step output
+        # In:
+        #   data:                       2d array, rows of inputs
+        # Out:
+        #   self
+
+        data = asarray(data)
+        for i, chain in self.column_steps.items():
+            values = data[:, i:i+1]
+            for encoder in chain:
+                encoder.fit(values)
+                values = apply_encoder(encoder, values)
+
+        features = self.transform_columns(data)
+        for encoder in self.matrix_steps:
+            if hasattr(encoder, 'fit'):
+                encoder.fit(features)
+            features = apply_encoder(encoder, features)
+
+        return self
+
+    def transform_columns(self, data, dtype='float32'):
+        if not self.column_steps:
+            return data
+
+        n_columns = data.shape[1]
+        blocks = []
+        for i in range(n_columns):
+            values = data[:, i:i+1]
+            for encoder in self.column_steps.get(i, ()):
+                values = apply_encoder(encoder, values)
+            blocks.append(values)
+
+        # Fill the feature matrix once
+        features = npempty((data.shape[0], sum(b.shape[1] for b in blocks)), dtype=dtype)
+        start = 0
+        for block in blocks:
+            features[:, start:start+block.shape[1]] = block
+            start += block.shape[1]
+
+        return features
+
+    def transform(self, data, dtype='float32'):
+        # Transforms a batch of inputs into model features
+        # In:
+        #   data:                       array, rows of inputs, a single input is handled as a batch of one
+        #   dtype:                      str, datatype of the features
+        # Out:
+        #   features:                   numpy array
+
+        data = asarray(data)
+        if data.ndim == 1 and self.column_steps:
+            data = data.reshape((1, -1))
+
+        features = self.transform_columns(data, dtype)
+        for encoder in self.matrix_steps:
+            features = apply_encoder(encoder, features)
+
+        return features
+
+    def inverse_transform(self, features):
+        # Transforms model features back into inputs
+        # In:
+        #   features:                   array, rows of features
+        # Out:
+        #   data:                       numpy array, object array if column steps exist
+
+        features = asarray(features)
+        for encoder in reversed(self.matrix_steps):
+            features = apply_encoder(encoder, features, inverse=True)
+
+        if not self.column_steps:
+            return features
+
+        columns = []
+        start = 0
+        n_inputs = features.shape[1] - sum(output_width(c) - 1 for c in self.column_steps.values())
+        for i in range(n_inputs):
+            chain = self.column_steps.get(i, ())
+            width = output_width(chain) if chain else 1
+            values = features[:, start:start+width]
+            for encoder in reversed(chain):
+                values = apply_encoder(encoder, values, inverse=True)
+            columns.append(values.reshape(-1))
+            start += width
+
+        data = npempty((features.shape[0], len(columns)), dtype=object)
+        for i, column in enumerate(columns):
+            data[:, i] = column
+
+        return data
+
+    def save(self, path):
+        # Saves the fitted pipeline with a format version
+        with path.open('wb') as f:
+            pkldump({
+                'format': PIPELINE_FORMAT,
+                'version': PIPELINE_VERSION,
+                'column_steps': self.column_steps,
+                'matrix_steps': self.matrix_steps
+                }, f, protocol=HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        # Loads a saved pipeline, encoder lists saved before the pipeline are converted
+        with path.open('rb') as f:
+            saved = pklload(f)
+
+        if isinstance(saved, EncoderPipeline):
+            return saved
+        if not isinstance(saved, dict) or saved.get('format') != PIPELINE_FORMAT:
+            # Old format, the {'Input', 'Encoder'} list
+            return cls(saved)
+        if saved['version'] > PIPELINE_VERSION:
+            print("Encoder file ", path, " is made with a newer version (", saved['version'], ")...")
+            exit()
+
+        pipeline = cls()
+        pipeline.column_steps = saved['column_steps']
+        pipeline.matrix_steps = saved['matrix_steps']
+        return pipeline
@@ -0,0 +1,190 @@
+from .. import Path, jsondump, jsonload
+from .dataset_store import store_exists
+from hashlib import sha256
+from inspect import getsourcefile
+from shutil import rmtree
+from time import time
+
+# Content-addressed cache for preprocessed dataset variants
+# Every variant is stored in its own folder named by a hash of
+# the raw input file, the handler source code and the preprocessing arguments
+
+CACHE_INDEX_NAME = "cache_index.json"
+# Default size budget for all cached variants of one dataset in bytes
+DEFAULT_CACHE_BUDGET = 2 * 1024 ** 3
+
+def folder_size(path):
+    # Counts the size of the files in a folder
+    # Files hard linked from another variant are counted in both, so the budget is never exceeded
+    # In:
+    #   path:                           Path, folder
+    # Out:
+    #   size:                           int, size in bytes
+
+    return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+
+def handler_source_files(preprocessor_class):
+    # Lists the source files of the handler classes
+    # In:
+    #   preprocessor_class:             class, DataPreprocessor class of the handler
+    # Out:
+    #   files:                          list, Path objects of the source files (DataPreprocessor and its parents)
+
+    files = []
+    for cls in preprocessor_class.__mro__:
+        if cls is object:
+            continue
+        source = getsourcefile(cls)
+        if source is not None and Path(source).exists() and Path(source) not in files:
+            files.append(Path(source))
+
+    return files
+
+class PreprocessCache:
+    # Handles the preprocessed variants of a dataset
+
+    def __init__(self, cache_folder, budget=DEFAULT_CACHE_BUDGET):
+        # In:
+        #   cache_folder:               Path, folder where the variants are stored
+        #   budget:                     int, maximum size of all variants in bytes
+
+        self.cache_folder = cache_folder
+        self.budget = budget
+        self.index_path = cache_folder.joinpath(CACHE_INDEX_NAME)
+        # File hashes computed by variant_key, stored with the next index write
+        self.new_files = {}
+
+    def read_index(self):
+        if self.index_path.exists():
+            with self.index_path.open('r', encoding='utf-8') as f:
+                return jsonload(f)
+
+        return {'files': {}, 'variants': {}}
+
+    def write_index(self, index):
+        index['files'].update(self.new_files)
+        self.new_files = {}
+        if not self.cache_folder.exists():
+            self.cache_folder.mkdir(parents=True)
+
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with tmp_path.open('w', encoding='utf-8') as f:
+            jsondump(index, f)
+        tmp_path.replace(self.index_path)
+
+    def file_hash(self, path, index):
+        # Hashes the content of a file
+        # Hash is reused while the size and modification time of the file stay the same
+        # In:
+        #   path:                       Path, file to hash or None
+        #   index:                      dict, cache index
+        # Out:
+        #   hash:                       str, hex digest
+
+        if path is None or not path.exists():
+            return sha256(b'').hexdigest()
+
+        stat = path.stat()
+        known = self.new_files.get(str(path), index['files'].get(str(path)))
+        if known is not None and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            return known['hash']
+
+        digest = sha256()
+        with path.open('rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+
+        self.new_files[str(path)] = {
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'hash': digest.hexdigest()
+                }
+
+        return digest.hexdigest()
+
+    def variant_key(self, raw_path, preprocessor_class, params):
+        # Creates the key of a preprocessed variant
+        # In:
+        #   raw_path:                   Path, raw input file of the handler
+        #   preprocessor_class:         class, DataPreprocessor class of the handler
+        #   params:                     dict, preprocessing arguments
+        # Out:
+        #   key:                        str, hex digest
+
+        index = self.read_index()
+
+        digest = sha256()
+        digest.update(self.file_hash(raw_path, index).encode())
+        for source in handler_source_files(preprocessor_class):
+            digest.update(source.read_bytes())
+        digest.update(repr(sorted(params.items())).encode())
+
+        # Lookups do not write the index, new file hashes are stored when a variant is registered or touched
+        return digest.hexdigest()[:16]
+
+    def variant_path(self, key):
+        return self.cache_folder.joinpath(key)
+
+    def contains(self, key):
+        return store_exists(self.variant_path(key))
+
+    def find_variant(self, **params):
+        # Finds the most recently used stored variant with the given preprocessing arguments
+        # In:
+        #   params:                     preprocessing arguments the variant must have
+        # Out:
+        #   key:                        str, variant key or None if not found
+
+        variants = self.read_index()['variants']
+        found = [
+            (variant['last_used'], key) for key, variant in variants.items()
+            if all(variant['params'].get(name) == value for name, value in params.items()) and self.contains(key)
+            ]
+
+        return max(found)[1] if found else None
+
+    def touch(self, key):
+        # Marks the variant as used
+        index = self.read_index()
+        if key in index['variants']:
+            index['variants'][key]['last_used'] = time()
+            self.write_index(index)
+
+    def register(self, key, params):
+        # Adds a created variant to the index and evicts old variants if the budget is exceeded
+        # In:
+        #   key:                        str, variant key
+        #   params:                     dict, preprocessing arguments used for the variant
+
+        index = self.read_index()
+        index['variants'][key] = {
+                'params': params,
+                'size': folder_size(self.variant_path(key)),
+                'last_used': time()
+                }
+
+        self.evict(index, keep=key)
+        self.write_index(index)
+
+    def evict(self, index, keep=None):
+        # Removes least recently used variants until the cache fits in the budget
+        # In:
+        #   index:                      dict, cache index
+        #   keep:                       str, key of the variant which is never removed
+
+        variants = index['variants']
+        total = sum(v['size'] for v in variants.values())
+
+        for key, variant in sorted(variants.items(), key=lambda kv: kv[1]['last_used']):
+            if total <= self.budget:
+                break
+            if key == keep:
+                continue
+
+            path = self.variant_path(key)
+            if path.exists():
+                rmtree(path)
+
+            total -= variant['size']
+            del variants[key]
+            print("Removed cached variant ", key, variant['params'])
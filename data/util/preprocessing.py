@@ -1,4 +1,8 @@
 from tensorflow import cast as tfcast, float32 as tffloat32
+from numpy import array as nparray, asarray as npasarray, empty as npempty, zeros as npzeros, arange as nparange, digitize as npdigitize, char as npchar, ascontiguousarray, flatnonzero as npflatnonzero, void as npvoid, dtype as npdtype, ones as npones, argmax as npargmax, argsort as npargsort, unique as npunique, abs as npabs, \
+    floor as npfloor, cumprod as npcumprod, cumsum as npcumsum, repeat as nprepeat, searchsorted as npsearchsorted
+from itertools import product
+from sys import exit
 
 def normalize_image(data, label=None):
     return tfcast(data, tffloat32) / 255., label
@@ -16,3 +20,182 @@ def preprocess_spotify_features(data, label=None):
 def preprocess_billboard(data, label=None):
     print(data, label)
     exit()
+
+# Popularity bucket edges, bucket i contains values from POPULARITY_BINS[i-1] to POPULARITY_BINS[i]
+POPULARITY_BINS = nparange(10, 100, 10)
+
+def bucket_popularity(popularities):
+    # Buckets popularities (0-100) into sets of tens (0-9)
+    # In:
+    #   popularities:                   list or numpy array, popularity values
+    # Out:
+    #   buckets:                        numpy array, bucket index for every value
+
+    return npdigitize(popularities, POPULARITY_BINS).astype("int32")
+
+def parse_release_decades(dates):
+    # Takes the decade part of the release year from release dates
+    # Dates are in formats YYYY-MM-DD, YYYY-MM or YYYY
+    # In:
+    #   dates:                          list, release date strings
+    # Out:
+    #   decades:                        numpy array, last two digits of the years
+
+    # First four characters are the year in every format
+    years = nparray(dates, dtype="U4")
+    valid = npchar.isdigit(years) & (npchar.str_len(years) == 4)
+    if not valid.all():
+        print("Release dates not in a known format: ", nparray(dates)[~valid][:10])
+        exit()
+
+    # Use only the decade
+    return years.astype("int32") % 100
+
+def extract_track_features(records, label_key, default_label=None):
+    # Creates the feature matrix and labels from a chunk of track records
+    # Release year of the track (only the decade part) is added as the last feature
+    # In:
+    #   records:                        list, track dicts created by SpotifyAPI.make_feature_dataset
+    #   label_key:                      str, key of the label value in the records
+    #   default_label:                  value used if the record has no label
+    # Out:
+    #   (features, labels):             tuple, (float32 numpy array, int32 numpy array)
+
+    # Build every column at once
+    n_records = len(records)
+    track_features = nparray([d['features'] for d in records], dtype="float32")
+    decades = parse_release_decades([d['release_date'] for d in records])
+    labels = nparray([d.get(label_key, default_label) for d in records], dtype="int32")
+
+    features = npempty((n_records, track_features.shape[1]+1), dtype="float32")
+    features[:, :-1] = track_features
+    features[:, -1] = decades
+
+    return (features, labels)
+
+def duplicate_mask(features, tolerance=None):
+    # Marks the first occurrence of every distinct row
+    # Rows are hashed by their bytes so the check is linear in the number of rows
+    # In:
+    #   features:                       numpy array, 2d feature matrix
+    #   tolerance:                      float, if given a row is a duplicate when every value is within tolerance
+    #                                   of an earlier kept row
+    # Out:
+    #   mask:                           numpy array, True for the rows that are kept
+
+    keys = npasarray(features)
+    if tolerance is not None:
+        # Exact duplicates are dropped first so a cell of the near duplicate grid has no repeated rows,
+        # a repeated row is close to the same kept rows as its first occurrence
+        keys = keys.reshape(keys.shape[0], -1)
+        mask = duplicate_mask(keys)
+        kept = npflatnonzero(mask)
+        mask[kept] = near_duplicate_mask(keys[kept], tolerance)
+        return mask
+
+    # Adding zero turns -0.0 into 0.0 so they hash the same
+    keys = ascontiguousarray((keys + 0).reshape(keys.shape[0], -1))
+    rows = keys.view(npdtype((npvoid, keys.dtype.itemsize * keys.shape[1]))).ravel().tolist()
+
+    # Reversed order leaves the index of the first occurrence to the dict
+    first = dict(zip(reversed(rows), range(len(rows)-1, -1, -1)))
+
+    mask = npzeros(len(rows), dtype=bool)
+    mask[list(first.values())] = True
+    return mask
+
+# Largest grid code of the near duplicate buckets
+MAX_GRID_CODE = 2 ** 62
+
+def near_duplicate_mask(features, tolerance):
+    # Marks the rows that are not within tolerance of an earlier kept row
+    # Rows are bucketed by a grid of tolerance sized cells and a row is compared only with the rows
+    # of its own and the adjacent cells, so the check is linear in the number of rows when the rows are spread out
+    # The grid is built from the columns with the most distinct cells until there are more cells than rows,
+    # clustered columns (for example mode or time signature) would put every row in the same few cells
+    # In:
+    #   features:                       numpy array, 2d feature matrix
+    #   tolerance:                      float, largest difference of equal values
+    # Out:
+    #   mask:                           numpy array, True for the rows that are kept
+
+    n_rows = features.shape[0]
+    mask = npones(n_rows, dtype=bool)
+    if n_rows < 2:
+        return mask
+
+    # Close values are in the same or adjacent cells
+    cells = npfloor(features / tolerance).astype('int64')
+    cells -= cells.min(axis=0)
+    sizes = cells.max(axis=0) + 3
+
+    # Columns are added until there are more cells than rows, every column triples the adjacent cells
+    distinct = [npunique(c).size for c in cells.T]
+    columns = []
+    code_range = 1
+    n_cells = 1
+    for column in npargsort([-d for d in distinct], kind='stable'):
+        if columns and (n_cells >= n_rows or code_range * int(sizes[column]) > MAX_GRID_CODE):
+            break
+        columns.append(column)
+        code_range *= int(sizes[column])
+        n_cells *= distinct[column]
+
+    # Cell code of every row, cell coordinates start from 1 so the adjacent cells have valid codes
+    radix = npcumprod([1] + [int(sizes[c]) for c in columns[:-1]]).astype('int64')
+    codes = ((cells[:, columns] + 1) * radix).sum(axis=1)
+
+    order = npargsort(codes, kind='stable')
+    cell_codes, starts, counts = npunique(codes[order], return_index=True, return_counts=True)
+
+    # Earlier row index of every close pair by the later row index
+    earlier = {}
+    for offset in product([-1, 0, 1], repeat=len(columns)):
+        # Every pair of cells is visited once, the same cell with offset 0
+        if offset < (0,) * len(columns):
+            continue
+        targets = codes + (nparray(offset, dtype='int64') * radix).sum()
+        found = npsearchsorted(cell_codes, targets).clip(max=len(cell_codes) - 1)
+        rows = npflatnonzero(cell_codes[found] == targets)
+        if not rows.size:
+            continue
+
+        # Pairs of a row and every row of the target cell
+        found = found[rows]
+        first = nprepeat(rows, counts[found])
+        position = nparange(first.size) - nprepeat(npcumsum(counts[found]) - counts[found], counts[found])
+        second = order[nprepeat(starts[found], counts[found]) + position]
+        if not any(offset):
+            pair = first < second
+            first, second = first[pair], second[pair]
+
+        within = (npabs(features[first] - features[second]) <= tolerance).all(axis=1)
+        for a, b in zip(first[within].tolist(), second[within].tolist()):
+            earlier.setdefault(max(a, b), []).append(min(a, b))
+
+    # Rows in the original order, a row is dropped only if a kept row is close to it
+    for row in sorted(earlier):
+        if mask[earlier[row]].any():
+            mask[row] = False
+
+    return mask
+
+def drop_duplicates(features, labels, records=None, tolerance=None):
+    # Drops duplicate rows and keeps features, labels and records aligned
+    # In:
+    #   features:                       numpy array, 2d feature matrix
+    #   labels:                         list or numpy array, label for every row
+    #   records:                        list, raw records for every row or None
+    #   tolerance:                      float, tolerance for near duplicates or None for exact duplicates
+    # Out:
+    #   (features, labels, records, duplicate_indexes):     tuple, records is None if not given
+
+    mask = duplicate_mask(features, tolerance)
+    kept = npflatnonzero(mask)
+
+    features = features[kept]
+    labels = npasarray(labels)[kept]
+    if records is not None:
+        records = [records[i] for i in kept]
+
+    return (features, labels, records, npflatnonzero(~mask))
@@ -0,0 +1,42 @@
+from threading import Lock
+from time import monotonic, sleep
+
+# Token bucket rate limiter shared by the threads calling an API
+# Every call takes one token, tokens are refilled at a constant rate
+# and at most capacity tokens can be saved for bursts
+
+class TokenBucket:
+
+    def __init__(self, rate, capacity=None):
+        # In:
+        #   rate:                       float, tokens added per second
+        #   capacity:                   int, maximum number of saved tokens, defaults to rate
+
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, rate)
+        self.tokens = self.capacity
+        self.last = monotonic()
+        self.lock = Lock()
+
+    def refill(self):
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def acquire(self):
+        # Blocks until a token is available
+        while True:
+            with self.lock:
+                self.refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+
+            sleep(wait)
+
+    def pause(self, seconds):
+        # Stops all callers for the given time, used when the API asks to slow down
+        with self.lock:
+            self.refill()
+            self.tokens = min(self.tokens, 1 - seconds * self.rate)
@@ -0,0 +1,140 @@
+from .. import jsondumps, jsonloads
+from sqlite3 import connect as sqlite_connect
+from threading import Lock
+from time import time
+
+# Persistent cache for API responses
+# Responses are stored per endpoint and id in a sqlite database so that
+# overlapping samples and repeated crawls are served from the disk
+# Entries older than the ttl are fetched again and the least recently used
+# entries are removed when the stored payloads exceed the size budget
+
+# Default time to live of a response in seconds
+DEFAULT_RESPONSE_TTL = 30 * 24 * 60 * 60
+# Default size budget of the stored payloads in bytes
+DEFAULT_RESPONSE_BUDGET = 512 * 1024 ** 2
+
+class ResponseCache:
+
+    def __init__(self, path, ttl=DEFAULT_RESPONSE_TTL, budget=DEFAULT_RESPONSE_BUDGET):
+        # In:
+        #   path:                       Path, sqlite database file
+        #   ttl:                        float, seconds a response is valid, None = forever
+        #   budget:                     int, maximum size of the stored payloads in bytes
+
+        self.path = path
+        self.ttl = ttl
+        self.budget = budget
+        self.hits = 0
+        self.misses = 0
+        # Connection is shared by the fetching threads
+        self.lock = Lock()
+
+        if not path.parent.exists():
+            path.parent.mkdir(parents=True)
+
+        self.db = sqlite_connect(str(path), check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "endpoint TEXT, id TEXT, payload TEXT, size INTEGER, created REAL, last_used REAL, "
+            "PRIMARY KEY (endpoint, id))"
+            )
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+        self.db.commit()
+
+        # Running size of the stored payloads, the table is summed only when it is opened
+        self.total_size = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get_many(self, endpoint, ids):
+        # Reads the valid cached responses
+        # In:
+        #   endpoint:                   str, API endpoint name
+        #   ids:                        list, spotify ids
+        # Out:
+        #   responses:                  dict, key = id, value = response, ids not found are missing
+
+        now = time()
+        oldest = now - self.ttl if self.ttl is not None else None
+        ids = list(dict.fromkeys(ids))
+        responses = {}
+        with self.lock:
+            # sqlite limits the number of query parameters
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i+500]
+                rows = self.db.execute(
+                    "SELECT id, payload, created FROM responses WHERE endpoint = ? AND id IN (%s)" % ",".join("?" * len(chunk)),
+                    [endpoint] + chunk
+                    ).fetchall()
+                for response_id, payload, created in rows:
+                    if oldest is None or created >= oldest:
+                        responses[response_id] = jsonloads(payload)
+
+            self.db.executemany(
+                "UPDATE responses SET last_used = ? WHERE endpoint = ? AND id = ?",
+                [(now, endpoint, response_id) for response_id in responses]
+                )
+            self.db.commit()
+
+            self.hits += len(responses)
+            self.misses += len(ids) - len(responses)
+
+        return responses
+
+    def put_many(self, endpoint, responses):
+        # Stores responses and evicts old entries if the budget is exceeded
+        # In:
+        #   endpoint:                   str, API endpoint name
+        #   responses:                  dict, key = id, value = response (json serializable)
+
+        now = time()
+        rows = []
+        for response_id, response in responses.items():
+            payload = jsondumps(response, ensure_ascii=False)
+            rows.append((endpoint, response_id, payload, len(payload.encode('utf8')), now, now))
+
+        with self.lock:
+            # Replaced responses are removed from the running size
+            ids = list(responses.keys())
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i+500]
+                self.total_size -= self.db.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM responses WHERE endpoint = ? AND id IN (%s)" % ",".join("?" * len(chunk)),
+                    [endpoint] + chunk
+                    ).fetchone()[0]
+
+            self.db.executemany("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.total_size += sum(row[3] for row in rows)
+            self.evict()
+            self.db.commit()
+
+    def evict(self, batch_size=100):
+        # Removes expired and least recently used entries until the payloads fit in the budget
+        # In:
+        #   batch_size:                 int, least recently used entries read at once
+        if self.ttl is not None:
+            oldest = time() - self.ttl
+            self.total_size -= self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses WHERE created < ?", (oldest,)).fetchone()[0]
+            self.db.execute("DELETE FROM responses WHERE created < ?", (oldest,))
+
+        # Entries are removed one by one by rowid so entries used at the same time as the last removed one are kept
+        while self.total_size > self.budget:
+            rows = self.db.execute("SELECT rowid, size FROM responses ORDER BY last_used, rowid LIMIT ?", (batch_size,)).fetchall()
+            if not rows:
+                self.total_size = 0
+                break
+
+            removed = []
+            for rowid, size in rows:
+                if self.total_size <= self.budget:
+                    break
+                removed.append((rowid,))
+                self.total_size -= size
+            self.db.executemany("DELETE FROM responses WHERE rowid = ?", removed)
+
+    def report(self):
+        print("Response cache: %d hits, %d misses" % (self.hits, self.misses))
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,294 @@
+from .. import jsonloads
+from .streaming import iter_json_records, chunk_records
+from .dataset_store import store_exists, save_memmap_dataset, load_memmap_dataset
+from numpy import asarray, arange, empty as npempty, concatenate as npconcatenate, argpartition, lexsort, \
+    flatnonzero, unique as npunique, floor as npfloor, minimum, sort as npsort, bincount as npbincount, searchsorted, \
+    zeros, save as npsave, load as npload
+from numpy.random import default_rng
+from tensorflow import constant as tfconstant, gather as tfgather, minimum as tfminimum, cast as tfcast, int64 as tfint64
+from tensorflow.data.experimental import assert_cardinality
+from hashlib import sha256
+
+# Sampling of streams
+# Every element gets a random key from a seeded generator and the elements with the smallest keys are kept,
+# which gives a uniform sample without replacement (reservoir sampling) computed chunk by chunk with numpy
+# Stratified sampling keeps the smallest keys of every stratum and takes from every stratum in proportion to its size
+# Sampled ids are cached, so the same sample is used again without reading the whole dataset
+
+# Elements handled at once
+SAMPLE_CHUNK_SIZE = 65536
+DEFAULT_SAMPLE_SEED = 0
+
+def rank_by_key(keys, strata):
+    # Ranks the elements of every stratum by their keys
+    # Out:
+    #   (order, strata, rank):      tuple, positions sorted by stratum and key, strata in that order
+    #                               and the rank of the element in its stratum (0 = smallest key)
+
+    order = lexsort((keys, strata))
+    strata = strata[order]
+    starts = flatnonzero(npconcatenate([[True], strata[1:] != strata[:-1]]))
+    group_sizes = npconcatenate([starts[1:], [len(strata)]]) - starts
+    group = arange(len(starts)).repeat(group_sizes)
+    rank = arange(len(strata)) - starts[group]
+
+    return (order, strata, rank)
+
+class ReservoirSampler:
+
+    def __init__(self, k, seed=DEFAULT_SAMPLE_SEED, stratified=False):
+        # In:
+        #   k:                          int, sample size
+        #   seed:                       int, seed of the random keys, the same seed gives the same sample
+        #   stratified:                 bool, True = every stratum is sampled in proportion to its size
+
+        self.k = k
+        self.rng = default_rng(seed)
+        self.stratified = stratified
+        self.count = 0
+        self.ids = npempty(0, dtype='int64')
+        self.keys = npempty(0, dtype='float64')
+        self.strata = None
+        # Sizes of the strata
+        self.strata_values = None
+        self.strata_counts = None
+
+    def update(self, n=None, strata=None, ids=None):
+        # Adds a chunk of elements
+        # In:
+        #   n:                          int, number of elements, not needed if strata or ids is given
+        #   strata:                     array, stratum of every element, needed if stratified
+        #   ids:                        array, int ids of the elements, None = running index of the element
+
+        if strata is not None:
+            strata = asarray(strata).reshape(-1)
+            n = len(strata)
+        elif ids is not None:
+            n = len(ids)
+        if not n:
+            return self
+
+        ids = arange(self.count, self.count + n, dtype='int64') if ids is None else asarray(ids, dtype='int64')
+        keys = self.rng.random(n)
+        self.count += n
+
+        self.ids = npconcatenate([self.ids, ids])
+        self.keys = npconcatenate([self.keys, keys])
+        if self.stratified:
+            self.count_strata(strata)
+            self.strata = strata if self.strata is None else npconcatenate([self.strata, strata])
+            keep = self.smallest_per_stratum(self.k)
+        elif len(self.keys) > self.k:
+            keep = argpartition(self.keys, self.k - 1)[:self.k]
+        else:
+            return self
+
+        self.ids, self.keys = self.ids[keep], self.keys[keep]
+        if self.stratified:
+            self.strata = self.strata[keep]
+        return self
+
+    def count_strata(self, strata):
+        values, counts = npunique(strata, return_counts=True)
+        if self.strata_values is not None:
+            values, inverse = npunique(npconcatenate([self.strata_values, values]), return_inverse=True)
+            counts = npbincount(inverse.reshape(-1), weights=npconcatenate([self.strata_counts, counts])).astype('int64')
+        self.strata_values, self.strata_counts = values, counts
+
+    def smallest_per_stratum(self, quotas):
+        # Positions of the elements with the smallest keys in every stratum
+        # In:
+        #   quotas:                     int or array, number of elements kept from every stratum (in order of strata_values)
+        # Out:
+        #   keep:                       numpy array, positions in ids
+
+        order, strata, rank = rank_by_key(self.keys, self.strata)
+        if not isinstance(quotas, int):
+            # Quotas of the strata found in the reservoir
+            quotas = quotas[searchsorted(self.strata_values, strata)]
+        return order[rank < quotas]
+
+    def sample(self):
+        # Out:
+        #   ids:                        numpy array, sorted ids of the sampled elements
+
+        if not self.stratified or self.count <= self.k:
+            return npsort(self.ids)
+
+        # Largest remainder allocation of the sample to the strata
+        shares = self.k * self.strata_counts / self.count
+        quotas = npfloor(shares).astype('int64')
+        remainders = shares - quotas
+        quotas[remainders.argsort(kind='stable')[::-1][:self.k - quotas.sum()]] += 1
+        quotas = minimum(quotas, self.strata_counts)
+
+        return npsort(self.ids[self.smallest_per_stratum(quotas)])
+
+def sample_indexes(n, k, strata=None, seed=DEFAULT_SAMPLE_SEED):
+    # Samples k indexes of n elements, stratified if strata is given
+    # In:
+    #   n:                          int, number of elements
+    #   k:                          int, sample size
+    #   strata:                     array, stratum of every element
+    #   seed:                       int, random seed
+    # Out:
+    #   indexes:                    numpy array, sorted
+    sampler = ReservoirSampler(k, seed, strata is not None)
+    for start in range(0, n, SAMPLE_CHUNK_SIZE):
+        if strata is not None:
+            sampler.update(strata=strata[start:start+SAMPLE_CHUNK_SIZE])
+        else:
+            sampler.update(min(SAMPLE_CHUNK_SIZE, n - start))
+    return sampler.sample()
+
+def sample_key(source, k, seed, stratified):
+    # Name of a cached sample
+    # In:
+    #   source:                     Path or str, sampled file (identified by its name, size and modification time) or dataset name
+    # Out:
+    #   key:                        str
+    if hasattr(source, 'stat'):
+        stat = source.stat()
+        source = "%s:%d:%d" % (source.name, stat.st_size, stat.st_mtime_ns)
+    return sha256(("%s|%d|%s|%s" % (source, k, seed, stratified)).encode('utf8')).hexdigest()[:16]
+
+def cached_sample(cache_folder, key, sample_function):
+    # Loads sampled ids from the cache or samples and stores them
+    # In:
+    #   cache_folder:               Path, folder of the cached samples, None = no caching
+    #   key:                        str, sample_key of the sample
+    #   sample_function:            function, returns the sampled ids
+    # Out:
+    #   ids:                        numpy array
+
+    if cache_folder is None:
+        return sample_function()
+
+    path = cache_folder.joinpath(key + ".npy")
+    if path.exists():
+        return npload(path)
+
+    ids = sample_function()
+    if not cache_folder.exists():
+        cache_folder.mkdir(parents=True)
+    tmp_path = path.with_suffix(".tmp")
+    with tmp_path.open('wb') as f:
+        npsave(f, ids)
+    tmp_path.replace(path)
+
+    return ids
+
+def is_json_lines(path):
+    with path.open('rb') as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+    return first != b'['
+
+def iter_json_lines(path):
+    # Reads a JSON Lines file
+    # Out:
+    #   generator:                  yields (byte offset of the line, record)
+    with path.open('rb') as f:
+        offset = 0
+        for line in f:
+            if line.strip():
+                yield (offset, jsonloads(line))
+            offset += len(line)
+
+def read_json_lines_at(path, offsets):
+    # Reads the records starting at the given byte offsets of a JSON Lines file
+    with path.open('rb') as f:
+        for offset in offsets:
+            f.seek(int(offset))
+            yield jsonloads(f.readline())
+
+def sample_json_records(path, k, strata_function=None, seed=DEFAULT_SAMPLE_SEED, cache_folder=None):
+    # Takes a random sample of the records of a dataset file
+    # Records are read once to sample them, the sample of a JSON Lines file is stored as the byte offsets
+    # of the lines so a cached sample is read without reading the other records
+    # In:
+    #   path:                       Path, JSON Lines or json list file
+    #   k:                          int, sample size
+    #   strata_function:            function, takes a list of records and returns their strata, None = not stratified
+    #   seed:                       int, random seed
+    #   cache_folder:               Path, folder of the cached samples, None = no caching
+    # Out:
+    #   generator:                  yields the sampled records in the order of the file
+
+    lines = is_json_lines(path)
+
+    def sample():
+        sampler = ReservoirSampler(k, seed, strata_function is not None)
+        records = iter_json_lines(path) if lines else enumerate(iter_json_records(path))
+        for chunk in chunk_records(records, SAMPLE_CHUNK_SIZE):
+            ids, chunk = zip(*chunk)
+            strata = strata_function(list(chunk)) if strata_function is not None else None
+            sampler.update(strata=strata, ids=ids)
+        return sampler.sample()
+
+    ids = cached_sample(cache_folder, sample_key(path, k, seed, strata_function is not None), sample)
+
+    if lines:
+        yield from read_json_lines_at(path, ids)
+    else:
+        selected = set(ids.tolist())
+        for i, record in enumerate(iter_json_records(path)):
+            if i in selected:
+                yield record
+
+def sample_tf_dataset(dataset, k, name, stratified=True, seed=DEFAULT_SAMPLE_SEED, cache_folder=None):
+    # Takes a random sample of a Tensorflow dataset of (data, label) elements
+    # Labels are read in batches to sample the indexes and the elements are selected with a mask in the dataset pipeline
+    # With a cache folder the sampled elements are stored as a memory-mapped store, tfds datasets have no random access
+    # so later runs read only the stored sample instead of iterating the whole dataset
+    # In:
+    #   dataset:                    Tensorflow Dataset object
+    #   k:                          int, sample size
+    #   name:                       str, name of the dataset for the cache
+    #   stratified:                 bool, True = labels are sampled in proportion to their frequencies
+    #   cache_folder:               Path, folder of the cached samples, None = no caching
+    # Out:
+    #   dataset:                    Tensorflow Dataset object
+
+    def sample():
+        sampler = ReservoirSampler(k, seed, stratified)
+        for labels in dataset.map(lambda x, y: y).batch(SAMPLE_CHUNK_SIZE):
+            labels = labels.numpy()
+            sampler.update(len(labels), strata=labels if stratified else None)
+        return sampler.sample()
+
+    key = sample_key(name, k, seed, stratified)
+    if cache_folder is None:
+        return select_elements(dataset, sample())
+
+    store_path = cache_folder.joinpath(key)
+    if not store_exists(store_path):
+        selected = select_elements(dataset, cached_sample(cache_folder, key, sample))
+        # Sample is read in one pass and stored with the dtypes of the dataset
+        x_chunks, y_chunks = [], []
+        for x, y in selected.batch(SAMPLE_CHUNK_SIZE):
+            x_chunks.append(x.numpy())
+            y_chunks.append(y.numpy())
+        x, y = npconcatenate(x_chunks), npconcatenate(y_chunks)
+        save_memmap_dataset(store_path, {'sample': (x, y)}, x_dtype=x.dtype.name, y_dtype=y.dtype.name)
+
+    return load_memmap_dataset(store_path)['sample']
+
+def select_elements(dataset, indexes):
+    # Keeps the elements of a Tensorflow dataset at the given indexes
+    # Elements are selected with a mask in the dataset pipeline
+    # In:
+    #   dataset:                    Tensorflow Dataset object
+    #   indexes:                    numpy array, sorted indexes
+    # Out:
+    #   dataset:                    Tensorflow Dataset object with the known length
+
+    # Last value of the mask is used for the indexes after the selected ones
+    mask = zeros(int(indexes[-1]) + 2 if len(indexes) else 1, dtype=bool)
+    mask[indexes] = True
+    mask = tfconstant(mask)
+    last = tfcast(len(mask) - 1, tfint64)
+
+    dataset = dataset.enumerate().filter(lambda i, element: tfgather(mask, tfminimum(i, last))).map(lambda i, element: element)
+    return dataset.apply(assert_cardinality(len(indexes)))
@@ -0,0 +1,144 @@
+from .sampling import rank_by_key
+from .dataset_store import save_memmap_dataset, save_split_indexes, save_feature_scaling, read_manifest, write_manifest, open_memmap_arrays
+from .statistics import array_stats, fit_minmax_scaler
+from sklearn.preprocessing import MinMaxScaler
+from os import link as oslink
+from shutil import copy2, rmtree
+from numpy import asarray, zeros, rint, unique as npunique
+from numpy.random import default_rng
+
+# Index based dataset splits
+# Train, validate and test splits are computed as index arrays, the features are stored once
+# as the base split and the splits are read by gathering their rows from it
+# Splitting again with another seed writes only the index arrays
+# Base features are stored unscaled, a scaler is fitted with the train rows of the current split
+# and stored as the feature scaling of the store, so a new split never uses a scaler fitted with its test rows
+# A store split with another seed can be derived from a stored dataset, it shares the base arrays of the dataset
+
+BASE_SPLIT = "base"
+DEFAULT_SPLIT_SEED = 0
+
+def split_indexes(labels, test_size, validation=None, seed=DEFAULT_SPLIT_SEED, stratify=True):
+    # Computes stratified train, validate and test indexes
+    # Every class is split in the same proportions, the validation split is taken from the rest after the test split
+    # In:
+    #   labels:                     numpy array, label of every row
+    #   test_size:                  float, part of the rows in the test split
+    #   validation:                 float, part of the rest in the validate split, None = no validate split
+    #   seed:                       int, random seed, the same seed gives the same splits
+    #   stratify:                   bool, False = rows are split without looking at the labels
+    # Out:
+    #   indexes:                    dict, key = split name, value = int64 numpy array in random order
+
+    labels = asarray(labels).reshape(len(labels), -1)[:, 0] if stratify else zeros(len(labels), dtype='int8')
+    keys = default_rng(seed).random(len(labels))
+
+    order, strata, rank = rank_by_key(keys, labels)
+    _, inverse, counts = npunique(strata, return_inverse=True, return_counts=True)
+    size = counts[inverse.reshape(-1)]
+
+    n_test = rint(size * test_size).astype('int64')
+    n_validate = rint((size - n_test) * validation).astype('int64') if validation is not None else 0
+
+    masks = {
+        'train': rank >= n_test + n_validate,
+        'test': rank < n_test
+        }
+    if validation is not None:
+        masks['validate'] = (rank >= n_test) & (rank < n_test + n_validate)
+
+    indexes = {}
+    for split, mask in masks.items():
+        selected = order[mask]
+        # Classes are mixed by ordering the rows by their keys
+        indexes[split] = selected[keys[selected].argsort()].astype('int64')
+
+    return indexes
+
+def save_split_dataset(path, features, labels, indexes, split_params=None):
+    # Stores the features once and the splits as index arrays
+    # In:
+    #   path:                       Path, store folder
+    #   features:                   numpy array, all rows
+    #   labels:                     numpy array, all labels
+    #   indexes:                    dict, split indexes from split_indexes
+    #   split_params:               dict, test_size, validation and seed of the split
+
+    save_memmap_dataset(path, {BASE_SPLIT: (features, labels)})
+    save_split_indexes(path, BASE_SPLIT, indexes, split_params)
+
+def fit_split_scaler(path, scaler=None):
+    # Fits a MinMaxScaler with the train rows of a stored split and stores it as the feature scaling
+    # In:
+    #   path:                       Path, store folder created with save_split_dataset
+    #   scaler:                     MinMaxScaler, None = MinMaxScaler with the default feature range
+    # Out:
+    #   scaler:                     fitted MinMaxScaler
+
+    x, _, indexes = open_memmap_arrays(path)['train']
+    scaler = fit_minmax_scaler(scaler if scaler is not None else MinMaxScaler(), array_stats(x, indexes=indexes))
+    save_feature_scaling(path, scaler.scale_, scaler.min_)
+    return scaler
+
+def resplit_memmap_dataset(path, seed, scaler=None):
+    # Splits a stored dataset again with another seed, only the labels are read and the index arrays written
+    # If the store is scaled the scaler is fitted again with the rows of the new train split
+    # In:
+    #   path:                       Path, store folder created with save_split_dataset
+    #   seed:                       int, random seed
+    #   scaler:                     MinMaxScaler fitted for a scaled store, None = MinMaxScaler with the default feature range
+    # Out:
+    #   changed:                    bool, False if the store was already split with the seed or has no index splits
+
+    manifest = read_manifest(path)
+    params = manifest.get('split_params')
+    if params is None or params['seed'] == seed:
+        return False
+
+    labels = open_memmap_arrays(path)[BASE_SPLIT][1]
+    params = dict(params, seed=seed)
+    indexes = split_indexes(labels, params['test_size'], params['validation'], seed, params.get('stratify', True))
+    save_split_indexes(path, BASE_SPLIT, indexes, params)
+    if 'feature_scaling' in manifest:
+        fit_split_scaler(path, scaler)
+
+    return True
+
+def link_file(source, target):
+    # Hard links a file, the file is copied if the file system has no hard links
+    try:
+        oslink(source, target)
+    except OSError:
+        copy2(source, target)
+
+def derive_split_dataset(source_path, path, seed, scaler=None):
+    # Creates a store split with another seed from a store created with save_split_dataset
+    # Files of the base split are hard linked so the features are stored once, the source store is not changed
+    # The store is built in a temporary folder and moved to the path when it is complete
+    # In:
+    #   source_path:                Path, store folder created with save_split_dataset
+    #   path:                       Path, folder of the new store
+    #   seed:                       int, random seed of the new split
+    #   scaler:                     MinMaxScaler fitted for a scaled store, None = MinMaxScaler with the default feature range
+    # Out:
+    #   scaler:                     fitted MinMaxScaler, None if the store is not scaled
+
+    manifest = read_manifest(source_path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    if tmp_path.exists():
+        rmtree(tmp_path)
+    tmp_path.joinpath(BASE_SPLIT).mkdir(parents=True)
+    for f in source_path.joinpath(BASE_SPLIT).iterdir():
+        link_file(f, tmp_path.joinpath(BASE_SPLIT, f.name))
+
+    # Index splits of the source are not linked, the new index arrays are written by the resplit
+    manifest.pop('index_splits', None)
+    write_manifest(tmp_path, manifest)
+    scaler = scaler if scaler is not None else MinMaxScaler()
+    resplit_memmap_dataset(tmp_path, seed, scaler)
+
+    if path.exists():
+        rmtree(path)
+    tmp_path.rename(path)
+
+    return scaler if 'feature_scaling' in manifest else None
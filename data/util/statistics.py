@@ -0,0 +1,353 @@
+from numpy import asarray, zeros, full, arange, minimum, maximum, histogram as nphistogram, errstate, nan, where as npwhere, \
+    bincount as npbincount, unique as npunique, concatenate as npconcatenate, flatnonzero, argmax as npargmax, isfinite
+from tensorflow import random as tfrandom
+from collections import namedtuple
+from sys import exit
+
+# Streaming statistics
+# Count, min, max, mean and the central moments are updated chunk by chunk
+# with the pairwise update formulas so a dataset is described in one pass without loading it in memory
+# Results equal scipy.stats.describe (variance with ddof=1, biased skewness and Fisher kurtosis)
+
+Description = namedtuple('Description', ['nobs', 'minmax', 'mean', 'variance', 'skewness', 'kurtosis'])
+
+# Rows read at once from arrays
+STATS_CHUNK_SIZE = 65536
+# Distinct values counted before the frequencies are turned into a histogram
+MAX_FREQUENCY_VALUES = 4096
+
+class StreamingHistogram:
+    # Histogram with a fixed number of bins and a range which grows with the data
+    # When a value is outside the range the bin width is doubled and adjacent bins are merged,
+    # so the bin edges stay aligned and no counts are lost, bins has to be even
+    # NaN and infinite values can't be binned, they are counted in non_finite
+
+    def __init__(self, bins=64):
+        self.bins = bins
+        self.counts = zeros(bins, dtype='int64')
+        self.low = None
+        self.width = None
+        self.non_finite = 0
+
+    def expand(self, low, high):
+        # Doubles the range until low and high fit
+        while low < self.low or high > self.low + self.bins * self.width:
+            merged = self.counts.reshape((-1, 2)).sum(axis=1)
+            if low < self.low:
+                # Grow downwards, old bins are the upper half
+                self.counts = zeros(self.bins, dtype='int64')
+                self.counts[self.bins // 2:] = merged
+                self.low -= self.bins * self.width
+            else:
+                self.counts = zeros(self.bins, dtype='int64')
+                self.counts[:self.bins // 2] = merged
+            self.width *= 2
+
+    def update(self, values, weights=None):
+        # In:
+        #   values:                     1d numpy array
+        #   weights:                    1d numpy array, counts of the values, None = every value is counted once
+        found = isfinite(values)
+        if weights is not None:
+            self.non_finite += int(weights[~found].sum())
+            weights = weights[found]
+        else:
+            self.non_finite += int(len(values) - found.sum())
+        values = values[found]
+        if not len(values):
+            return
+
+        low, high = values.min(), values.max()
+        if self.low is None:
+            self.low = float(low)
+            self.width = float(high - low) / self.bins if high > low else 1.0
+        self.expand(low, high)
+
+        counts, _ = nphistogram(values, bins=self.bins, range=(self.low, self.low + self.bins * self.width), weights=weights)
+        self.counts += counts.astype('int64')
+
+    def merge(self, other):
+        # Adds the counts of another histogram
+        self.non_finite += other.non_finite
+        if other.low is None:
+            return self
+        if self.low is None:
+            self.low, self.width, self.counts = other.low, other.width, other.counts.copy()
+            return self
+
+        # Range has to cover the other histogram and the bins can't be narrower
+        self.expand(other.low, other.edges[-1])
+        while self.width < other.width:
+            self.expand(self.low, self.low + 2 * self.bins * self.width)
+
+        # Bins of the other histogram are added by their centers
+        centers = other.low + other.width * (arange(other.bins) + 0.5)
+        counts, _ = nphistogram(centers, bins=self.bins, range=(self.low, self.edges[-1]), weights=other.counts)
+        self.counts += counts.astype('int64')
+        return self
+
+    @property
+    def edges(self):
+        return self.low + self.width * arange(self.bins + 1)
+
+class StreamingStats:
+    # Per feature statistics of rows of data
+
+    def __init__(self, histogram_bins=None):
+        # In:
+        #   histogram_bins:             int, bins of the feature histograms, None = no histograms
+
+        self.histogram_bins = histogram_bins
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.mean = None
+        self.m2 = None
+        self.m3 = None
+        self.m4 = None
+        self.histograms = None
+
+    def update(self, chunk):
+        # Adds a chunk of rows
+        # In:
+        #   chunk:                      numpy array, rows of data, rows with more than one dimension are flattened
+
+        chunk = asarray(chunk, dtype='float64')
+        if chunk.ndim == 1:
+            chunk = chunk.reshape((-1, 1))
+        elif chunk.ndim > 2:
+            chunk = chunk.reshape((chunk.shape[0], -1))
+        if not len(chunk):
+            return self
+
+        n = len(chunk)
+        mean = chunk.mean(axis=0)
+        d = chunk - mean
+        d2 = d * d
+        other = (n, chunk.min(axis=0), chunk.max(axis=0), mean, d2.sum(axis=0), (d2 * d).sum(axis=0), (d2 * d2).sum(axis=0))
+        self.merge_moments(*other)
+
+        if self.histogram_bins is not None:
+            if self.histograms is None:
+                self.histograms = [StreamingHistogram(self.histogram_bins) for _ in range(chunk.shape[1])]
+            for i, hist in enumerate(self.histograms):
+                hist.update(chunk[:, i])
+
+        return self
+
+    def merge_moments(self, n_b, min_b, max_b, mean_b, m2_b, m3_b, m4_b):
+        if self.count == 0:
+            self.count, self.min, self.max = n_b, min_b, max_b
+            self.mean, self.m2, self.m3, self.m4 = mean_b, m2_b, m3_b, m4_b
+            return
+
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        delta2 = delta * delta
+
+        m4 = (self.m4 + m4_b
+                + delta2 * delta2 * n_a * n_b * (n_a * n_a - n_a * n_b + n_b * n_b) / n ** 3
+                + 6 * delta2 * (n_a * n_a * m2_b + n_b * n_b * self.m2) / n ** 2
+                + 4 * delta * (n_a * m3_b - n_b * self.m3) / n)
+        m3 = (self.m3 + m3_b
+                + delta2 * delta * n_a * n_b * (n_a - n_b) / n ** 2
+                + 3 * delta * (n_a * m2_b - n_b * self.m2) / n)
+        m2 = self.m2 + m2_b + delta2 * n_a * n_b / n
+
+        self.mean = self.mean + delta * n_b / n
+        self.m2, self.m3, self.m4 = m2, m3, m4
+        self.min = minimum(self.min, min_b)
+        self.max = maximum(self.max, max_b)
+        self.count = n
+
+    def merge(self, other):
+        # Combines statistics computed from different parts of a dataset
+        if other.count:
+            self.merge_moments(other.count, other.min, other.max, other.mean, other.m2, other.m3, other.m4)
+        if other.histograms is not None:
+            if self.histograms is None:
+                self.histograms = [StreamingHistogram(h.bins) for h in other.histograms]
+            for hist, other_hist in zip(self.histograms, other.histograms):
+                hist.merge(other_hist)
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else full(self.m2.shape, nan)
+
+    def describe(self):
+        # Out:
+        #   Description:                namedtuple in the format of scipy.stats.describe
+        with errstate(divide='ignore', invalid='ignore'):
+            m2 = self.m2 / self.count
+            skewness = npwhere(m2 > 0, (self.m3 / self.count) / m2 ** 1.5, 0.0)
+            kurtosis = npwhere(m2 > 0, (self.m4 / self.count) / (m2 * m2) - 3.0, -3.0)
+
+        return Description(self.count, (self.min, self.max), self.mean, self.variance, skewness, kurtosis)
+
+class StreamingFrequencies:
+    # Counts of the distinct values of a stream
+    # Small non negative integers (for example class labels) are counted with bincount and other values with unique,
+    # the counts of a chunk are merged into the sorted distinct values found so far
+    # When more than max_values distinct values are found the counts are moved into a histogram,
+    # so the memory used stays fixed for continuous features
+
+    def __init__(self, max_values=MAX_FREQUENCY_VALUES, histogram_bins=64):
+        # In:
+        #   max_values:                 int, maximum number of distinct values counted
+        #   histogram_bins:             int, bins of the histogram used after max_values, has to be even
+
+        self.max_values = max_values
+        self.histogram_bins = histogram_bins
+        self.bincounts = zeros(0, dtype='int64')
+        self.values = None
+        self.counts = None
+        self.histogram = None
+        self.count = 0
+
+    def update(self, values):
+        # Adds a chunk of values
+        # In:
+        #   values:                     numpy array, flattened
+
+        values = asarray(values).reshape(-1)
+        if not len(values):
+            return self
+        self.count += len(values)
+
+        if self.histogram is not None:
+            self.histogram.update(values.astype('float64'))
+            return self
+
+        if self.values is None and values.dtype.kind in 'iub':
+            low, high = values.min(), values.max()
+            if low >= 0 and high < self.max_values:
+                counts = npbincount(values.astype('int64'), minlength=len(self.bincounts))
+                counts[:len(self.bincounts)] += self.bincounts
+                self.bincounts = counts
+                return self
+
+        # Values can't be counted with bincount, switch to the distinct values
+        if self.values is None:
+            self.values = flatnonzero(self.bincounts)
+            self.counts = self.bincounts[self.values]
+            self.bincounts = zeros(0, dtype='int64')
+
+        chunk_values, chunk_counts = npunique(values, return_counts=True)
+        self.merge_counts(chunk_values, chunk_counts)
+        return self
+
+    def merge_counts(self, values, counts):
+        if self.values is not None and len(self.values):
+            values, inverse = npunique(npconcatenate([self.values, values]), return_inverse=True)
+            counts = npbincount(inverse.reshape(-1), weights=npconcatenate([self.counts, counts])).astype('int64')
+        self.values, self.counts = values, counts
+
+        if len(self.values) > self.max_values:
+            if self.values.dtype.kind not in 'iubf':
+                print("More than ", self.max_values, " distinct non numeric values, increase max_values...")
+                exit()
+            self.histogram = StreamingHistogram(self.histogram_bins)
+            self.histogram.update(self.values.astype('float64'), self.counts)
+            self.values, self.counts = None, None
+
+    def frequencies(self):
+        # Out:
+        #   (values, counts):           tuple, numpy arrays sorted by value,
+        #                               values are histogram bin ranges as str if too many distinct values were found
+        if self.histogram is not None:
+            edges = self.histogram.edges
+            values = asarray(['%.4g - %.4g' % (edges[i], edges[i+1]) for i in range(self.histogram.bins)])
+            found = self.histogram.counts > 0
+            values, counts = values[found], self.histogram.counts[found]
+            if self.histogram.non_finite:
+                values = npconcatenate([values, ['non finite']])
+                counts = npconcatenate([counts, [self.histogram.non_finite]])
+            return (values, counts)
+        if self.values is None:
+            values = flatnonzero(self.bincounts)
+            return (values, self.bincounts[values])
+        return (self.values, self.counts)
+
+    def most_common(self):
+        values, counts = self.frequencies()
+        order = counts.argsort(kind='stable')[::-1]
+        return [(values[i].item(), int(counts[i])) for i in order]
+
+def sample_dataset(dataset, fraction, seed=None):
+    # Keeps a random fraction of the elements of a Tensorflow dataset while it is read
+    # In:
+    #   dataset:                    Tensorflow Dataset object
+    #   fraction:                   float, 0-1, None = all elements
+    # Out:
+    #   dataset:                    Tensorflow Dataset object
+    if fraction is None or fraction >= 1:
+        return dataset
+
+    return dataset.filter(lambda *element: tfrandom.uniform((), seed=seed) < fraction)
+
+def element_values(values):
+    # Values counted per element, one hot rows are counted by their index
+    if values.ndim > 1 and values.shape[-1] > 1:
+        return npargmax(values.reshape((values.shape[0], -1)), axis=1)
+    return values.reshape(-1)
+
+def dataset_frequencies(dataset, feature=None, batch_size=STATS_CHUNK_SIZE, max_values=MAX_FREQUENCY_VALUES):
+    # Counts the label or feature values of a Tensorflow dataset batch by batch
+    # In:
+    #   dataset:                    Tensorflow Dataset object, (data, label) or (data, label, weight) elements
+    #   feature:                    int, index of the counted feature, None = labels are counted
+    #   batch_size:                 int, elements read at once
+    #   max_values:                 int, distinct values counted before a histogram is used
+    # Out:
+    #   frequencies:                StreamingFrequencies
+
+    frequencies = StreamingFrequencies(max_values)
+    for element in dataset.batch(batch_size):
+        if feature is None:
+            frequencies.update(element_values(element[1].numpy()))
+        else:
+            frequencies.update(element[0][:, feature].numpy())
+
+    return frequencies
+
+def array_stats(array, chunk_size=STATS_CHUNK_SIZE, histogram_bins=None, indexes=None):
+    # Computes the statistics of an array (for example a memmap) chunk by chunk
+    # If indexes are given only those rows are used, they are gathered chunk by chunk
+    length = len(array) if indexes is None else len(indexes)
+    stats = StreamingStats(histogram_bins)
+    for start in range(0, length, chunk_size):
+        rows = slice(start, start+chunk_size) if indexes is None else indexes[start:start+chunk_size]
+        stats.update(array[rows])
+    return stats
+
+def dataset_stats(dataset, batch_size=STATS_CHUNK_SIZE, histogram_bins=None):
+    # Computes the statistics of the data and labels of a Tensorflow dataset batch by batch
+    # In:
+    #   dataset:                    Tensorflow Dataset object, (data, label) or (data, label, weight) elements
+    #   batch_size:                 int, elements read at once
+    #   histogram_bins:             int, bins of the histograms, None = no histograms
+    # Out:
+    #   (data_stats, label_stats):  tuple, StreamingStats objects
+
+    data_stats = StreamingStats(histogram_bins)
+    label_stats = StreamingStats(histogram_bins)
+    for element in dataset.batch(batch_size):
+        data_stats.update(element[0].numpy())
+        label_stats.update(element[1].numpy())
+
+    return (data_stats, label_stats)
+
+def fit_minmax_scaler(scaler, stats):
+    # Fits a sklearn MinMaxScaler from streaming statistics
+    # The scaler is fitted with the feature minimums and maximums which gives the same scaling as fitting all rows
+    # In:
+    #   scaler:                     MinMaxScaler
+    #   stats:                      StreamingStats
+    # Out:
+    #   scaler:                     fitted MinMaxScaler
+
+    scaler.fit(asarray([stats.min, stats.max]))
+    scaler.n_samples_seen_ = stats.count
+    return scaler
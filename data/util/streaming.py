@@ -0,0 +1,116 @@
+from .. import jsonloads, exit
+from json import JSONDecoder, JSONDecodeError
+from numpy import concatenate as npconcatenate
+
+# Streaming readers for the feature datasets
+# Records are read one at a time so the memory used is bounded by the chunk size
+
+JSON_WHITESPACE = ' \t\r\n,'
+
+def iter_json_array(f, read_size=1024 * 1024):
+    # Incremental parser for a json file containing a list of objects
+    # In:
+    #   f:                              file object, positioned before the opening bracket
+    #   read_size:                      int, number of characters read from the file at once
+    # Out:
+    #   generator:                      yields the objects of the list one by one
+
+    decoder = JSONDecoder()
+    buffer = f.read(read_size)
+    # Whitespace before the opening bracket can be longer than one read
+    while '[' not in buffer:
+        more = f.read(read_size)
+        if not more:
+            raise JSONDecodeError("Expecting '['", buffer, len(buffer))
+        buffer += more
+    pos = buffer.index('[') + 1
+
+    while True:
+        # Skip separators between the objects
+        while pos < len(buffer) and buffer[pos] in JSON_WHITESPACE:
+            pos += 1
+
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+
+        try:
+            obj, end = decoder.raw_decode(buffer, pos)
+        except JSONDecodeError:
+            # Object continues after the buffer
+            more = f.read(read_size)
+            if not more:
+                if buffer[pos:].strip():
+                    raise
+                return
+            buffer = buffer[pos:] + more
+            pos = 0
+            continue
+
+        yield obj
+        pos = end
+
+        # Drop handled part of the buffer
+        if pos > read_size:
+            buffer = buffer[pos:]
+            pos = 0
+
+def iter_json_records(path):
+    # Reads records from a JSON Lines file or from a json file containing a list of records
+    # In:
+    #   path:                           Path, to the dataset file
+    # Out:
+    #   generator:                      yields the records (dicts) one by one
+
+    with path.open('r', encoding='utf-8') as f:
+        # Check the format from the first character
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        f.seek(0)
+
+        if first == '[':
+            yield from iter_json_array(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield jsonloads(line)
+
+def chunk_records(records, chunk_size):
+    # Groups records into lists of chunk_size records
+    # In:
+    #   records:                        iterable, records
+    #   chunk_size:                     int, records in one chunk
+    # Out:
+    #   generator:                      yields lists of records
+
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+def read_feature_chunks(records, extract_function, chunk_size=10000):
+    # Converts records into a feature matrix and a label array chunk by chunk
+    # In:
+    #   records:                        iterable, records
+    #   extract_function:               function, takes a list of records and returns (features, labels) numpy arrays
+    #   chunk_size:                     int, records converted at once
+    # Out:
+    #   (features, labels):             tuple, numpy arrays
+
+    feature_chunks = []
+    label_chunks = []
+    for chunk in chunk_records(records, chunk_size):
+        features, labels = extract_function(chunk)
+        feature_chunks.append(features)
+        label_chunks.append(labels)
+
+    if not feature_chunks:
+        print("No records found from the dataset...")
+        exit()
+
+    return (npconcatenate(feature_chunks), npconcatenate(label_chunks))
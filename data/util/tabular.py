@@ -0,0 +1,125 @@
+from numpy import array as nparray, asarray, char as npchar, concatenate as npconcatenate, column_stack, where as npwhere, mean as npmean
+from numpy.random import default_rng
+from zipfile import ZipFile
+from csv import reader as csv_reader
+from io import TextIOWrapper
+
+# Columnar preprocessing for tabular datasets (for example Kaggle competition csv files)
+# A table is a dict, key = column name, value = numpy array of the column values
+# Columns are typed once when they are read and encoders are applied to whole columns
+
+def resolve_column(values):
+    # Converts a column of strings into a typed numpy array
+    # Integer and decimal columns are converted, missing values of numeric columns are zeros
+    # In:
+    #   values:                         list or numpy array, str values of the column
+    # Out:
+    #   column:                         numpy array, int64, float64 or str
+
+    column = asarray(values, dtype=str)
+    digits = npchar.isdigit(column)
+    if not digits.any():
+        # No numeric values
+        return column
+
+    empty = column == ''
+    filled = npwhere(empty, '0', column)
+    if (digits | empty).all():
+        return filled.astype('int64')
+
+    # Decimal points and no spaces
+    if (npchar.find(column, '.') >= 0).any() and not (npchar.find(column, ' ') >= 0).any():
+        try:
+            return filled.astype('float64')
+        except ValueError:
+            pass
+
+    return filled
+
+def read_csv_table(f, encoding='utf-8'):
+    # Reads a csv file with a header row into a table
+    # In:
+    #   f:                              binary file object
+    #   encoding:                       str, file encoding
+    # Out:
+    #   table:                          dict, key = column name, value = typed numpy array
+
+    rows = list(csv_reader(TextIOWrapper(f, encoding=encoding)))
+    header, rows = rows[0], rows[1:]
+    columns = zip(*rows) if rows else [[] for _ in header]
+
+    return {name: resolve_column(list(values)) for name, values in zip(header, columns)}
+
+def read_zip_tables(zip_path, members):
+    # Reads csv files from a zip archive
+    # In:
+    #   zip_path:                       Path, zip archive
+    #   members:                        dict, key = table name, value = csv file name in the archive
+    # Out:
+    #   tables:                         dict, key = table name, value = table
+
+    tables = {}
+    with ZipFile(zip_path) as archive:
+        for name, member in members.items():
+            with archive.open(member, 'r') as f:
+                tables[name] = read_csv_table(f)
+
+    return tables
+
+def table_length(table):
+    return len(next(iter(table.values()))) if table else 0
+
+def sample_table(table, n, seed=None):
+    # Takes n random rows from a table
+    indexes = default_rng(seed).choice(table_length(table), size=min(n, table_length(table)), replace=False)
+    return {name: column[indexes] for name, column in table.items()}
+
+def fill_missing(column, missing=0, value=None):
+    # Replaces missing values of a numeric column
+    # In:
+    #   column:                         numpy array
+    #   missing:                        value marking a missing value
+    #   value:                          replacement, None = mean of the other values
+    # Out:
+    #   column:                         numpy array, float64
+
+    column = column.astype('float64')
+    found = column != missing
+    if value is None:
+        value = npmean(column[found])
+
+    return npwhere(found, column, value)
+
+def to_dense(array):
+    # Encoders can return sparse matrices
+    return array.toarray() if hasattr(array, 'toarray') else asarray(array)
+
+def encode_column(encoder, fit_columns, columns):
+    # Fits an encoder or a chain of encoders with the values of one column and transforms the columns
+    # In:
+    #   encoder:                        sklearn encoder or tuple of encoders applied in order
+    #   fit_columns:                    list, numpy arrays used to fit the encoder (for example the same column from train and test)
+    #   columns:                        list, numpy arrays to transform
+    # Out:
+    #   encoded:                        list, 2d numpy arrays in the order of columns
+
+    chain = encoder if isinstance(encoder, tuple) else (encoder,)
+    fit_values = npconcatenate([asarray(c) for c in fit_columns]).reshape((-1, 1))
+    encoded = [asarray(c).reshape((-1, 1)) for c in columns]
+    for step in chain:
+        step.fit(fit_values)
+        fit_values = to_dense(step.transform(fit_values))
+        encoded = [to_dense(step.transform(c)) for c in encoded]
+
+    return encoded
+
+def stack_columns(table, order, dtype='float32'):
+    # Creates a feature matrix from the columns of a table
+    # In:
+    #   table:                          dict, table
+    #   order:                          list, column names, a column can be 1d or 2d (encoded)
+    #   dtype:                          str, datatype of the matrix
+    # Out:
+    #   features:                       numpy array (rows, features)
+
+    return column_stack([table[name] for name in order]).astype(dtype)
@@ -0,0 +1,134 @@
+from .. import jsondump, jsonload, exit
+from tensorflow import io as tfio, data as tfdata, nest as tfnest, stack as tfstack, shape as tfshape, ensure_shape, as_dtype, string as tfstring
+
+# Sharded TFRecord store
+# Every split is written into N compressed TFRecord shards, records are given to the shards in turns
+# A record holds a batch of elements, it is the serialized vector of the serialized batched components
+# (for example data, label), so the per record overhead is paid once per batch
+# A manifest describes the splits
+# Shards are read in parallel with interleave so reading can use all cores and the disk bandwidth
+
+TFRECORD_VERSION = 1
+TFRECORD_MANIFEST_NAME = "tfrecords.json"
+DEFAULT_SHARDS = 8
+DEFAULT_COMPRESSION = "GZIP"
+# Elements in one record
+RECORD_SIZE = 1024
+
+def serialize_element(*components):
+    # Serializes the (batched) components of an element into one record
+    return tfio.serialize_tensor(tfstack([tfio.serialize_tensor(component) for component in components]))
+
+def export_tfrecords(path, datasets, shards=DEFAULT_SHARDS, compression=DEFAULT_COMPRESSION, record_size=RECORD_SIZE):
+    # Writes datasets into sharded TFRecord files
+    # In:
+    #   path:                           Path, store folder
+    #   datasets:                       dict, key = split name, value = Tensorflow Dataset object
+    #   shards:                         int, files written per split
+    #   compression:                    str, GZIP, ZLIB or '' for no compression
+    #   record_size:                    int, elements in one record
+    # Out:
+    #   manifest:                       dict, description of the stored splits
+
+    if not path.exists():
+        path.mkdir(parents=True)
+
+    # Remove old manifest so that a half written store is never read
+    manifest_path = path.joinpath(TFRECORD_MANIFEST_NAME)
+    if manifest_path.exists():
+        manifest_path.unlink()
+
+    options = tfio.TFRecordOptions(compression_type=compression)
+    manifest = {'version': TFRECORD_VERSION, 'compression': compression, 'splits': {}}
+    for split, dataset in datasets.items():
+        specs = tfnest.flatten(dataset.element_spec)
+        structure = 'tuple' if isinstance(dataset.element_spec, tuple) else 'single'
+
+        # Components are serialized in parallel in the dataset pipeline
+        # Number of elements of the record is returned for the manifest
+        serialized = dataset.batch(record_size).map(
+                        lambda *components: (serialize_element(*components), tfshape(tfnest.flatten(components)[0])[0]),
+                        num_parallel_calls=tfdata.experimental.AUTOTUNE
+                        )
+
+        files = ["%s-%05d-of-%05d.tfrecord" % (split, i, shards) for i in range(shards)]
+        writers = [tfio.TFRecordWriter(str(path.joinpath(f)), options) for f in files]
+        n_records = 0
+        length = 0
+        for record, rows in serialized.prefetch(tfdata.experimental.AUTOTUNE).as_numpy_iterator():
+            writers[n_records % shards].write(record)
+            n_records += 1
+            length += int(rows)
+        for writer in writers:
+            writer.close()
+
+        manifest['splits'][split] = {
+                'files': files,
+                'length': length,
+                'structure': structure,
+                'components': [{'dtype': spec.dtype.name, 'shape': spec.shape.as_list()} for spec in specs]
+                }
+
+    # Manifest is written last, it marks the store complete
+    tmp_path = path.joinpath(TFRECORD_MANIFEST_NAME+".tmp")
+    with tmp_path.open('w', encoding='utf-8') as f:
+        jsondump(manifest, f)
+    tmp_path.replace(manifest_path)
+
+    return manifest
+
+def parse_function(split_info):
+    # Creates the function parsing the records of a split
+    # Records hold batches of elements
+    components = [(as_dtype(c['dtype']), [None] + c['shape']) for c in split_info['components']]
+
+    def parse(record):
+        serialized = tfio.parse_tensor(record, tfstring)
+        parsed = tuple(
+            ensure_shape(tfio.parse_tensor(serialized[i], dtype), shape) for i, (dtype, shape) in enumerate(components)
+            )
+        return parsed if split_info['structure'] == 'tuple' else parsed[0]
+
+    return parse
+
+def tfrecords_exist(path):
+    return path.joinpath(TFRECORD_MANIFEST_NAME).exists()
+
+def load_tfrecords(path, deterministic=True, cycle_length=None, prefetch=tfdata.experimental.AUTOTUNE):
+    # Reads the sharded splits with parallel interleaved reads
+    # In:
+    #   path:                           Path, store folder
+    #   deterministic:                  bool, True = elements are read in the same order every time,
+    #                                   False = elements are given as soon as any shard has them (faster)
+    #   cycle_length:                   int, shards read at the same time, None = all shards of the split
+    #   prefetch:                       int, elements prefetched, None = no prefetching
+    # Out:
+    #   datasets:                       dict, key = split name, value = Tensorflow Dataset object
+
+    with path.joinpath(TFRECORD_MANIFEST_NAME).open('r', encoding='utf-8') as f:
+        manifest = jsonload(f)
+
+    if manifest.get('version') != TFRECORD_VERSION:
+        print("TFRecord store ", path, " version ", manifest.get('version'), " is not supported...")
+        exit()
+
+    datasets = {}
+    for split, split_info in manifest['splits'].items():
+        files = tfdata.Dataset.from_tensor_slices([str(path.joinpath(f)) for f in split_info['files']])
+        dataset = files.interleave(
+                        lambda f: tfdata.TFRecordDataset(f, compression_type=manifest['compression']),
+                        cycle_length=cycle_length or len(split_info['files']),
+                        num_parallel_calls=tfdata.experimental.AUTOTUNE,
+                        deterministic=deterministic
+                        )
+        dataset = dataset.map(
+                        parse_function(split_info), 
+                        num_parallel_calls=tfdata.experimental.AUTOTUNE, 
+                        deterministic=deterministic
+                        ).unbatch()
+        if prefetch is not None:
+            dataset = dataset.prefetch(prefetch)
+
+        datasets[split] = dataset.apply(tfdata.experimental.assert_cardinality(split_info['length']))
+
+    return datasets
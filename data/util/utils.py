@@ -3,6 +3,8 @@ from .. import Path, input_check
 from tensorflow.data.experimental import save as tfsave, load as tfload
 from utils.utils import list_subfolder_in_folder
 from pickle import dump as pkldump, load as pklload
+from .encoders import EncoderPipeline
+from .tfrecord_store import export_tfrecords, load_tfrecords, tfrecords_exist, DEFAULT_COMPRESSION
 
 def kaggle_submit(competition, filepath, message=""):
     # In:
@@ -20,25 +22,36 @@ def kaggle_submit(competition, filepath, message=""):
         # Make download call
         print(sub_call(call))
 
-def save_tfdataset(path, datasets):
+def save_tfdataset(path, datasets, shards=None, compression=DEFAULT_COMPRESSION):
     # Saves datasets
     # In:
     #   path:                           Path, to save folder
-    #   datasets:                       tuple, datasets train, validate and test
+    #   datasets:                       dict, datasets train, validate and test
+    #   shards:                         int, if given splits are written into sharded TFRecord files
+    #   compression:                    str, compression of the TFRecord files
     
+    if shards is not None:
+        export_tfrecords(path, datasets, shards, compression)
+        return
+
     for key, ds in datasets.items():
         tfsave(ds, str(path.joinpath(key)))
         with path.joinpath(key, "spec.pkl").open('wb') as fs:
             pkldump(ds.element_spec, fs)
 
-def load_tfdataset(path, dtype="float32"):
+def load_tfdataset(path, dtype="float32", deterministic=True):
     # Reads datasets
     # In:
     #   path:                           Path, to records
     #   dtype:                          str, datatype
+    #   deterministic:                  bool, False = sharded TFRecords are read in the order they are ready
     # Out:
     #   tuple:                          datasets
     
+    if tfrecords_exist(path):
+        # Shards are read in parallel
+        return load_tfrecords(path, deterministic)
+
     datasets = {}
     for f in list_subfolder_in_folder(path):
         with path.joinpath(f ,"spec.pkl").open('rb') as fl:
@@ -54,14 +67,19 @@ def load_tfdataset(path, dtype="float32"):
     return datasets
 
 def save_encoders(path, encoders):
+    # Saves fitted encoders as a versioned EncoderPipeline
+    # In:
+    #   path:                           Path, folder or encoders.pkl file
+    #   encoders:                       EncoderPipeline or {'Input', 'Encoder'} dicts
     if path.name != "encoders.pkl":
         path = path.joinpath("encoders.pkl")
-    with path.open('wb') as fs:
-        pkldump(encoders, fs)
+    if not isinstance(encoders, EncoderPipeline):
+        encoders = EncoderPipeline(encoders)
+    encoders.save(path)
 
 def load_encoders(path):
+    # Loads the EncoderPipeline saved in the path, old encoder lists are converted
     if path.name != "encoders.pkl":
         path = path.joinpath("encoders.pkl")
-    with path.open('rb') as fl:
-        return pklload(fl)
+    return EncoderPipeline.load(path)
 
@@ -7,6 +7,19 @@ conf = {
         'loss_function':'cross_entropy',
         'optimization_function':'classifier'
         },
+    # Input pipeline, third_party/tensorflow/train/input_pipeline.py
+    'pipeline':{
+        'cache':'memory',
+        'shuffle':10000,
+        'prefetch':'auto'
+        },
+    # Training step, third_party/tensorflow/train/training_functions.py
+    'training':{
+        'compile':True,
+        'log_every':10,
+        'validate_every':'epoch',
+        'early_stopping':{'patience':2}
+        },
     
     'input_shape':[28, 28, 1],
     'data_type':'float32',
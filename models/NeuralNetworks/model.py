@@ -2,11 +2,13 @@ from . import configurations
 
 from .. import exit, Path, save_configuration, save_weights, load_weights, load_configuration, handle_init, npprod
 
-from tensorflow import data as tfdata, optimizers as tfoptimizers, reshape as tfreshape
+from tensorflow import data as tfdata, optimizers as tfoptimizers, reshape as tfreshape, cast as tfcast
 
 from third_party.tensorflow.building.handler import Layer_Handler 
-from third_party.tensorflow.train.training_functions import tf_training_loop 
+from third_party.tensorflow.train.training_functions import tf_training_loop, training_config
 from third_party.tensorflow.train import optimization, loss_functions
+from third_party.tensorflow.train.mixed_precision import mixed_precision_config, LossScale
+from third_party.tensorflow.train.input_pipeline import build_pipeline, map_dataset, pipeline_config, pipeline_timings, print_timings
 
 class Model:
 
@@ -65,6 +67,9 @@ class Model:
 
         #Define optimizer
         optimizer = tfoptimizers.Adam(learning_rate)
+        #Loss scale of the 'mixed_precision' configuration
+        loss_scale = mixed_precision_config(self.c.get('mixed_precision'))['loss_scale']
+        self.loss_scale = LossScale(loss_scale) if loss_scale is not None else None
         #Define loss function
         loss_function = getattr(loss_functions, loss_function)
         #Define optimization function
@@ -76,11 +81,16 @@ class Model:
         opt = getattr(optimization, optimization_function)
         
         #Dataset operations
-        #Batch
-        if batch_size != 0:
-            train = train.batch(batch_size, drop_remainder=False)
-        else:
-            train = train.batch(1)
+        #Map, cache, shuffle, batch and prefetch as defined in the 'pipeline' configuration
+        pipeline = pipeline_config(self.c.get('pipeline'))
+        if pipeline['timing']:
+            print_timings(pipeline_timings(train, pipeline, batch_size))
+        train = build_pipeline(train, pipeline, batch_size)
+        if validate is not None:
+            validate = map_dataset(validate, pipeline)
+
+        #Compiled step, logging, validation and early stopping as defined in the 'training' configuration
+        training = training_config(self.c.get('training'))
 
         #Start training
         tf_training_loop(
@@ -93,7 +103,13 @@ class Model:
                 epochs, 
                 True, 
                 autoencoder=autoencoder,
-                debug=False
+                debug=False,
+                compile=training['compile'],
+                jit_compile=training['jit_compile'],
+                log_every=training['log_every'],
+                validation_batch=training['validation_batch'],
+                validate_every=training['validate_every'],
+                early_stopping=training['early_stopping']
                 )
         
         if not debug:
@@ -121,6 +137,37 @@ class Model:
         
         return x
 
+    def build(self, x):
+        # Resolves the layer configurations once into a flat list of layer functions
+        # Weights are created and bound to the functions, activations are looked up and the shapes recorded
+        # In:
+        #   x:                          Tensor, example input, it is fed through the built layers
+        # Out:
+        #   x:                          Tensor, output of the example input
+        
+        # Layers compute in the 'mixed_precision' compute_dtype, weights stay in 'data_type'
+        compute_dtype = mixed_precision_config(self.c.get('mixed_precision'))['compute_dtype']
+        
+        layer_functions = []
+        for name, layer_conf in self.layer_confs.items():
+            name_specifier = '' if name == 'main' else name
+            for i, (layer_type, conf) in enumerate(layer_conf.items()):
+                layer_name = name_specifier+'_'+layer_type+'_'+str(i)
+                x, functions = self.layer_handler.build(
+                                    layer_type, 
+                                    x, 
+                                    self.weights, 
+                                    self.bias, 
+                                    conf, 
+                                    layer_name, 
+                                    self.c['data_type'],
+                                    compute_dtype
+                                    )
+                layer_functions += functions
+
+        self.layer_functions = layer_functions
+        return x
+
     def encoder(self, x, training=False):
         if 'encoder'in list(self.c.keys()):
             handle_layers(
@@ -169,13 +216,19 @@ class Model:
 
             self.layer_confs = layer_confs
         
-        # Handle layer building and feeding through the model
-        for name, layer_conf in self.layer_confs.items():
-            x = self.handle_layers(x, layer_conf, name, training)
+        # Build the layers on the first call, after that only the layer functions are called
+        if not hasattr(self, 'layer_functions'):
+            self.build(x)
+        for layer_function in self.layer_functions:
+            x = layer_function(x, training)
+        
+        # Mixed precision outputs are given in the weights datatype
+        if x.dtype != self.c['data_type']:
+            x = tfcast(x, self.c['data_type'])
         
         # Reshape output
         if x.shape != fed_input_shape:
             if npprod(x.shape[1:]) == npprod(fed_input_shape[1:]):
-                x = tfreshape(x, fed_input_shape)
+                x = tfreshape(x, [-1] + fed_input_shape[1:].as_list())
  
         return x
@@ -0,0 +1,76 @@
+# Benchmark for the training step
+# Compares eager training steps against the tf.function traced step (and XLA) with the MNIST configurations
+# Random MNIST shaped data is used so the dataset does not have to be downloaded
+# Run from the projects root folder:
+#   python -m tests.benchmarks.compiled_training
+#   python -m tests.benchmarks.compiled_training 100 mnist_basic
+
+from sys import argv
+from time import perf_counter
+from pathlib import Path
+from numpy.random import default_rng
+from tensorflow import optimizers as tfoptimizers, keras as tfkeras
+from tensorflow.data import Dataset as tfDataset
+
+from models.NeuralNetworks.model import Model
+from third_party.tensorflow.train import optimization, loss_functions
+from third_party.tensorflow.train.training_functions import train_step_function
+
+CONFIGURATIONS = {
+    'mnist_basic': Path("models", "NeuralNetworks", "configurations", "Classifier", "mnist", "NN", "mnist_basic.py"),
+    'mnist_conv': Path("models", "NeuralNetworks", "configurations", "Classifier", "mnist", "CONV", "mnist_conv.py")
+    }
+
+def make_dataset(n, seed=0):
+    rng = default_rng(seed)
+    x = rng.random((n, 28, 28, 1), dtype='float32')
+    y = rng.integers(0, 10, n).astype('int32')
+    return tfDataset.from_tensor_slices((x, y))
+
+def steps_per_second(configuration, steps, batch_size, compile=False, jit_compile=False):
+    # Trains a new model for a number of steps and returns the steps per second
+    # The first two steps are left out, they create the weights and trace the step
+    model = Model(configuration)
+    metrics = (tfkeras.metrics.Mean(), tfkeras.metrics.Accuracy())
+    optimizer = tfoptimizers.Adam(0.001)
+    batches = make_dataset(batch_size * 8).batch(batch_size).cache().repeat()
+    step_function = lambda compile: train_step_function(
+                                        model,
+                                        loss_functions.cross_entropy,
+                                        optimization.classifier,
+                                        optimizer,
+                                        model.c['output_shape'],
+                                        True,
+                                        False,
+                                        metrics,
+                                        compile,
+                                        jit_compile,
+                                        batches.element_spec
+                                        )
+
+    eager = step_function(False)
+    train_step = step_function(True) if compile else eager
+    for i, batch in enumerate(batches.take(steps + 2)):
+        if i == 0:
+            eager(batch)
+            continue
+        if i == 2:
+            metrics[0].result().numpy()
+            start = perf_counter()
+        train_step(batch)
+    # Wait for the last step
+    metrics[0].result().numpy()
+
+    return steps / (perf_counter() - start)
+
+if __name__ == '__main__':
+    steps = int(argv[1]) if len(argv) > 1 else 50
+    names = argv[2:] or list(CONFIGURATIONS.keys())
+    batch_size = 500
+
+    for name in names:
+        eager = steps_per_second(CONFIGURATIONS[name], steps, batch_size)
+        traced = steps_per_second(CONFIGURATIONS[name], steps, batch_size, compile=True)
+        xla = steps_per_second(CONFIGURATIONS[name], steps, batch_size, compile=True, jit_compile=True)
+        print("%s  eager: %.1f steps/s  tf.function: %.1f steps/s (x%.2f)  XLA: %.1f steps/s (x%.2f)" % (
+                name, eager, traced, traced / eager, xla, xla / eager))
@@ -0,0 +1,62 @@
+# Benchmark for reading numeric csv files in fetch_resource
+# Compares the chunked csv reader against the old per value loop
+# Run from the projects root folder:
+#   python -m tests.benchmarks.csv_ingestion
+#   python -m tests.benchmarks.csv_ingestion 1000000 4
+
+from sys import argv
+from time import perf_counter
+from tempfile import TemporaryDirectory
+from pathlib import Path
+from csv import reader as csv_reader
+from numpy import array as nparray, array_equal
+from numpy.random import default_rng
+
+from utils.csv_engine import read_csv
+
+def write_csv(path, n, columns=14, seed=0):
+    # Writes n rows of random values with a header row
+    rows = default_rng(seed).random((n, columns), dtype='float32')
+    with path.open('w', encoding='utf8') as f:
+        f.write(",".join("col%d" % i for i in range(columns)) + "\n")
+        for row in rows:
+            f.write(",".join("%.6f" % v for v in row) + "\n")
+
+def loop_read(path, dtype='float32'):
+    # Per value conversion used before the chunked reader
+    csv_file = csv_reader(path.open('r', encoding='utf8'), delimiter=',')
+    n_rows = []
+    for row_num, row in enumerate(csv_file):
+        for i, value in enumerate(row):
+            try:
+                value = float(value)
+            except ValueError:
+                row = None
+                break
+            row[i] = value
+        if row is not None:
+            n_rows.append(row)
+
+    return nparray(n_rows, dtype=dtype)
+
+def timed(function, *inputs, **kwargs):
+    start = perf_counter()
+    result = function(*inputs, **kwargs)
+    return (result, perf_counter() - start)
+
+if __name__ == '__main__':
+    n = int(argv[1]) if len(argv) > 1 else 500000
+    processes = int(argv[2]) if len(argv) > 2 else 4
+
+    with TemporaryDirectory() as tmp:
+        path = Path(tmp, "benchmark.csv")
+        print("Writing ", n, " rows...")
+        write_csv(path, n)
+
+        loop_data, loop_time = timed(loop_read, path)
+        (_, data), chunk_time = timed(read_csv, path)
+        (_, pool_data), pool_time = timed(read_csv, path, processes=processes)
+
+    print("Csv reading  loop: %.3fs  chunked: %.3fs  speedup: %.1fx" % (loop_time, chunk_time, loop_time / chunk_time))
+    print("Csv reading  loop: %.3fs  %d processes: %.3fs  speedup: %.1fx" % (loop_time, processes, pool_time, loop_time / pool_time))
+    print("Results equal: ", array_equal(loop_data, data) and array_equal(loop_data, pool_data))
@@ -0,0 +1,104 @@
+# Benchmark for the track feature extraction used by the spotify and billboard handlers
+# Compares the vectorized extraction against the old per record loop
+# Run from the projects root folder:
+#   python -m tests.benchmarks.feature_extraction
+#   python -m tests.benchmarks.feature_extraction 100000
+
+from sys import argv
+from time import perf_counter
+from random import Random
+from numpy import array as nparray, array_equal
+
+from data.util.preprocessing import extract_track_features, bucket_popularity
+from data.util.streaming import read_feature_chunks
+
+def synthetic_tracks(n, seed=0):
+    # Creates n track records in the format of SpotifyAPI.make_feature_dataset
+    rnd = Random(seed)
+    formats = ['%d-%02d-%02d', '%d-%02d', '%d']
+    tracks = []
+    for i in range(n):
+        year = rnd.randint(1950, 2020)
+        date_format = rnd.choice(formats)
+        date = date_format % (year, rnd.randint(1, 12), rnd.randint(1, 28))[:date_format.count('%')]
+        tracks.append({
+            'id': str(i),
+            'release_date': date,
+            'popularity': rnd.randint(0, 100),
+            'features': [rnd.randint(3, 5), rnd.randint(60000, 400000), rnd.randint(0, 11), rnd.randint(0, 1)] + [rnd.random() for _ in range(9)]
+            })
+
+    return tracks
+
+def loop_extraction(dataset):
+    # Per record extraction used before the vectorized version
+    features = []
+    popularities = []
+    for d in dataset:
+        feat = list(d['features'])
+        date = d['release_date']
+        if '-' in date:
+            split = date.split('-')
+            if len(split) == 3:
+                y, m, da = split
+            elif len(split) == 2:
+                y, m = split
+        elif len(date) == 4:
+            y = date
+        y = y[2:]
+        feat.append(y)
+        features.append(feat)
+        popularities.append(d['popularity'])
+
+    return (nparray(features, dtype="float32"), popularities)
+
+def loop_buckets(sample):
+    # Per element bucketing used before np.digitize
+    sample = list(sample)
+    for i, s in enumerate(sample):
+        if s < 10:
+            sample[i] = 0
+        elif s < 20:
+            sample[i] = 1
+        elif s < 30:
+            sample[i] = 2
+        elif s < 40:
+            sample[i] = 3
+        elif s < 50:
+            sample[i] = 4
+        elif s < 60:
+            sample[i] = 5
+        elif s < 70:
+            sample[i] = 6
+        elif s < 80:
+            sample[i] = 7
+        elif s < 90:
+            sample[i] = 8
+        else:
+            sample[i] = 9
+
+    return sample
+
+def timed(function, *inputs):
+    start = perf_counter()
+    result = function(*inputs)
+    return (result, perf_counter() - start)
+
+if __name__ == '__main__':
+    n = int(argv[1]) if len(argv) > 1 else 1000000
+    print("Creating ", n, " synthetic tracks...")
+    tracks = synthetic_tracks(n)
+
+    (loop_features, loop_popularities), loop_time = timed(loop_extraction, tracks)
+    (features, popularities), vector_time = timed(
+            read_feature_chunks,
+            tracks,
+            lambda records: extract_track_features(records, 'popularity')
+            )
+    print("Feature extraction  loop: %.3fs  vectorized: %.3fs  speedup: %.1fx" % (loop_time, vector_time, loop_time / vector_time))
+
+    loop_labels, loop_time = timed(loop_buckets, loop_popularities)
+    labels, vector_time = timed(bucket_popularity, popularities)
+    print("Popularity buckets  loop: %.3fs  vectorized: %.3fs  speedup: %.1fx" % (loop_time, vector_time, loop_time / vector_time))
+
+    print("Results equal: ", array_equal(loop_features, features) and array_equal(nparray(loop_labels), labels))
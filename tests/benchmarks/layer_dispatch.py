@@ -0,0 +1,53 @@
+# Benchmark for the forward pass
+# Compares the layer functions built once (Model.run) against resolving the configuration on every call
+# (Model.handle_layers) with the MNIST configurations, small batches show the dispatch overhead best
+# Run from the projects root folder:
+#   python -m tests.benchmarks.layer_dispatch
+#   python -m tests.benchmarks.layer_dispatch 200 1 32 256
+
+from sys import argv
+from time import perf_counter
+from pathlib import Path
+from numpy.random import default_rng
+from tensorflow import convert_to_tensor
+
+from models.NeuralNetworks.model import Model
+
+CONFIGURATIONS = {
+    'mnist_basic': Path("models", "NeuralNetworks", "configurations", "Classifier", "mnist", "NN", "mnist_basic.py"),
+    'mnist_conv': Path("models", "NeuralNetworks", "configurations", "Classifier", "mnist", "CONV", "mnist_conv.py")
+    }
+
+def per_call(function, x, calls, repeats=5):
+    # Milliseconds per call, the best of the repeats, the first call is left out
+    function(x).numpy()
+    times = []
+    for _ in range(repeats):
+        start = perf_counter()
+        for _ in range(calls):
+            out = function(x)
+        out.numpy()
+        times.append((perf_counter() - start) / calls * 1000)
+    return min(times)
+
+def resolved_every_call(model):
+    # The forward pass before the build step, the configuration is resolved on every call
+    def run(x):
+        for name, layer_conf in model.layer_confs.items():
+            x = model.handle_layers(x, layer_conf, name)
+        return x
+    return run
+
+if __name__ == '__main__':
+    calls = int(argv[1]) if len(argv) > 1 else 100
+    batch_sizes = [int(b) for b in argv[2:]] or [1, 32, 256]
+    rng = default_rng(0)
+
+    for name, configuration in CONFIGURATIONS.items():
+        model = Model(configuration)
+        for batch_size in batch_sizes:
+            x = convert_to_tensor(rng.random((batch_size, 28, 28, 1), dtype='float32'))
+            built = per_call(model.run, x, calls)
+            resolved = per_call(resolved_every_call(model), x, calls)
+            print("%s  batch %d  resolved every call: %.3fms  built: %.3fms (x%.2f)" % (
+                    name, batch_size, resolved, built, resolved / built))
@@ -0,0 +1,74 @@
+# Benchmark for the fused LSTM
+# Compares the MNIST RNN classifier configuration (mnist_LSTM_manual) against tf.keras.layers.LSTM with the same
+# units and a dense softmax output, training steps (forward and backward) and inference per second on the CPU
+# Run from the projects root folder:
+#   python -m tests.benchmarks.lstm
+#   python -m tests.benchmarks.lstm 5 128
+
+from sys import argv
+from time import perf_counter
+from pathlib import Path
+from numpy.random import default_rng
+from tensorflow import function as tffunction, GradientTape, one_hot, reshape, transpose, convert_to_tensor, keras as tfkeras, optimizers as tfoptimizers
+
+from models.NeuralNetworks.model import Model
+from third_party.tensorflow.train import optimization, loss_functions
+
+CONFIGURATION = Path("models", "NeuralNetworks", "configurations", "Classifier", "mnist", "RNN", "mnist_LSTM_manual.py")
+
+def per_second(function, steps):
+    start = perf_counter()
+    for _ in range(steps):
+        out = function()
+    out.numpy()
+    return steps / (perf_counter() - start)
+
+def compare(functions, steps, repeats=3):
+    # Best steps per second of every function, the functions are run in turns so they share the machine state
+    for function in functions:
+        function().numpy()
+    best = [0.] * len(functions)
+    for _ in range(repeats):
+        for i, function in enumerate(functions):
+            best[i] = max(best[i], per_second(function, steps))
+    return best
+
+def keras_model(units):
+    return tfkeras.Sequential([
+        tfkeras.layers.LSTM(units),
+        tfkeras.layers.Dense(10, activation='softmax')
+        ])
+
+if __name__ == '__main__':
+    steps = int(argv[1]) if len(argv) > 1 else 3
+    batch_size = int(argv[2]) if len(argv) > 2 else 64
+    rng = default_rng(0)
+    x = convert_to_tensor(rng.random((batch_size, 28, 28, 1), dtype='float32'))
+    y = one_hot(rng.integers(0, 10, batch_size), 10)
+
+    model = Model(CONFIGURATION)
+    units = model.c['layers']['LSTM']['units'][0]
+    optimizer = tfoptimizers.Adam(0.001)
+    optimization.classifier(model, x, y, loss_functions.cross_entropy, optimizer)
+    train_step = tffunction(lambda: optimization.classifier(model, x, y, loss_functions.cross_entropy, optimizer)[1])
+    inference = tffunction(lambda: model.run(x))
+
+    # Keras reads the same sequence (batch, width, height)
+    sequence = reshape(transpose(x, [0, 2, 1, 3]), [batch_size, 28, 28])
+    keras = keras_model(units)
+    keras_optimizer = tfoptimizers.Adam(0.001)
+    keras(sequence)
+
+    def keras_train():
+        with GradientTape() as g:
+            loss = loss_functions.cross_entropy(keras(sequence, training=True), y)
+        keras_optimizer.apply_gradients(zip(g.gradient(loss, keras.trainable_variables), keras.trainable_variables))
+        return loss
+    keras_train_step = tffunction(keras_train)
+    keras_inference = tffunction(lambda: keras(sequence))
+
+    fused_train, reference_train = compare([train_step, keras_train_step], steps)
+    fused_inference, reference_inference = compare([inference, keras_inference], steps)
+    print("LSTM %d units, batch %d" % (units, batch_size))
+    print("Training   fused: %.2f steps/s  keras: %.2f steps/s (fused x%.2f)" % (fused_train, reference_train, fused_train / reference_train))
+    print("Inference  fused: %.2f steps/s  keras: %.2f steps/s (fused x%.2f)" % (fused_inference, reference_inference, fused_inference / reference_inference))
@@ -0,0 +1,78 @@
+# Benchmark for mixed precision training
+# Trains the MNIST configurations in float32 and with bfloat16 computation (float32 master weights)
+# and compares the training throughput and the test accuracy
+# A learnable MNIST shaped dataset (noisy class prototypes) is used so the dataset does not have to be downloaded
+# Run from the projects root folder:
+#   python -m tests.benchmarks.mixed_precision
+#   python -m tests.benchmarks.mixed_precision 2 mnist_conv
+
+from sys import argv
+from time import perf_counter
+from pathlib import Path
+from copy import deepcopy
+from numpy import float32
+from numpy.random import default_rng
+from tensorflow import optimizers as tfoptimizers, keras as tfkeras, argmax as tfargmax
+from tensorflow.data import Dataset as tfDataset
+
+from models.NeuralNetworks.model import Model
+from third_party.tensorflow.train import optimization, loss_functions
+from third_party.tensorflow.train.training_functions import train_step_function
+from third_party.tensorflow.train.mixed_precision import LossScale
+
+CONFIGURATIONS = {
+    'mnist_basic': Path("models", "NeuralNetworks", "configurations", "Classifier", "mnist", "NN", "mnist_basic.py"),
+    'mnist_conv': Path("models", "NeuralNetworks", "configurations", "Classifier", "mnist", "CONV", "mnist_conv.py")
+    }
+
+def make_dataset(n, seed=0):
+    # Images are one of 10 random prototypes with noise, the label is the prototype
+    rng = default_rng(0)
+    prototypes = rng.random((10, 28, 28, 1), dtype='float32')
+    rng = default_rng(seed)
+    y = rng.integers(0, 10, n).astype('int32')
+    x = (0.2 * prototypes[y] + 0.8 * rng.random((n, 28, 28, 1), dtype='float32')).astype(float32)
+    return tfDataset.from_tensor_slices((x, y))
+
+def train_and_test(configuration, epochs, batch_size, compute_dtype=None):
+    # Trains a new model and returns (training examples per second, test accuracy)
+    model = Model(configuration)
+    model.c = deepcopy(model.c)
+    if compute_dtype is not None:
+        model.c['mixed_precision'] = {'compute_dtype': compute_dtype}
+    model.loss_scale = LossScale('dynamic') if compute_dtype == 'float16' else None
+
+    metrics = (tfkeras.metrics.Mean(), tfkeras.metrics.Accuracy())
+    optimizer = tfoptimizers.Adam(0.001)
+    train = make_dataset(20000).batch(batch_size).cache()
+    arguments = [model, loss_functions.cross_entropy, optimization.classifier, optimizer, [10], True, False, metrics]
+
+    batches = iter(train)
+    train_step_function(*arguments)(next(batches))
+    step = train_step_function(*arguments, True, False, train.element_spec)
+    step(next(batches))
+
+    start = perf_counter()
+    examples = 0
+    for epoch in range(epochs):
+        for batch in train:
+            step(batch)
+            examples += batch[0].shape[0]
+    metrics[0].result().numpy()
+    throughput = examples / (perf_counter() - start)
+
+    accuracy = tfkeras.metrics.Accuracy()
+    for x, y in make_dataset(5000, seed=1).batch(1000):
+        accuracy.update_state(y, tfargmax(model.run(x), 1))
+
+    return (throughput, float(accuracy.result().numpy()))
+
+if __name__ == '__main__':
+    epochs = int(argv[1]) if len(argv) > 1 else 1
+    names = argv[2:] or list(CONFIGURATIONS.keys())
+
+    for name in names:
+        f32_speed, f32_accuracy = train_and_test(CONFIGURATIONS[name], epochs, 500)
+        bf16_speed, bf16_accuracy = train_and_test(CONFIGURATIONS[name], epochs, 500, 'bfloat16')
+        print("%s  float32: %.0f examples/s accuracy %.3f  bfloat16: %.0f examples/s (x%.2f) accuracy %.3f" % (
+                name, f32_speed, f32_accuracy, bf16_speed, bf16_speed / f32_speed, bf16_accuracy))
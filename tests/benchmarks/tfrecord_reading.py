@@ -0,0 +1,54 @@
+# Benchmark for reading exported datasets
+# Compares the single stream tf.data.experimental.save directory against sharded TFRecords read with interleave
+# Run from the projects root folder:
+#   python -m tests.benchmarks.tfrecord_reading
+#   python -m tests.benchmarks.tfrecord_reading 500000 8
+
+from sys import argv
+from time import perf_counter
+from tempfile import TemporaryDirectory
+from pathlib import Path
+from numpy.random import default_rng
+from tensorflow.data import Dataset as tfDataset
+
+from data.util.utils import save_tfdataset, load_tfdataset
+
+def make_dataset(n, features=14, seed=0):
+    rng = default_rng(seed)
+    x = rng.random((n, features), dtype='float32')
+    y = rng.integers(0, 10, n).astype('int32')
+    return tfDataset.from_tensor_slices((x, y))
+
+def read_all(dataset, batch_size=1024):
+    # Reads every element, batched like in training
+    rows = 0
+    for x, _ in dataset.batch(batch_size):
+        rows += x.shape[0]
+    return rows
+
+def timed(function, *inputs, **kwargs):
+    start = perf_counter()
+    result = function(*inputs, **kwargs)
+    return (result, perf_counter() - start)
+
+if __name__ == '__main__':
+    n = int(argv[1]) if len(argv) > 1 else 200000
+    shards = int(argv[2]) if len(argv) > 2 else 8
+
+    with TemporaryDirectory() as tmp:
+        datasets = {'train': make_dataset(n)}
+        single_path = Path(tmp, "single")
+        sharded_path = Path(tmp, "sharded")
+        single_path.mkdir()
+
+        print("Writing ", n, " rows...")
+        _, single_write = timed(save_tfdataset, single_path, datasets)
+        _, sharded_write = timed(save_tfdataset, sharded_path, datasets, shards)
+
+        single_rows, single_time = timed(read_all, load_tfdataset(single_path)['train'])
+        sharded_rows, sharded_time = timed(read_all, load_tfdataset(sharded_path)['train'])
+        free_rows, free_time = timed(read_all, load_tfdataset(sharded_path, deterministic=False)['train'])
+
+    print("Writing  single: %.3fs  %d shards: %.3fs" % (single_write, shards, sharded_write))
+    print("Reading  single: %.3fs  sharded: %.3fs  sharded non deterministic: %.3fs" % (single_time, sharded_time, free_time))
+    print("Rows equal: ", single_rows == sharded_rows == free_rows == n)
@@ -0,0 +1,66 @@
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from numpy import array as nparray, array_equal
+
+from utils.csv_engine import read_csv
+
+class ChunkedCSV(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.path = Path(self.tmp.name, "data.csv")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_header_and_chunks(self):
+        rows = "\n".join("%d,%d.5,-%d" % (i, i, i) for i in range(1000))
+        self.path.write_text("ï»¿a;,b*,c\r\n" + rows + "\n", encoding='utf-8')
+
+        # Small chunks so that the file is parsed in many blocks
+        header, data = read_csv(self.path, strip=('ï»¿', ';', '*'), chunk_size=100)
+
+        self.assertEqual(header, ['a', 'b', 'c'])
+        self.assertEqual(data.shape, (1000, 3))
+        self.assertEqual(data.dtype.name, 'float32')
+        self.assertTrue(array_equal(data[999], nparray([999, 999.5, -999], dtype='float32')))
+
+    def test_process_pool(self):
+        self.path.write_text("".join("%d,%d\n" % (i, 2 * i) for i in range(500)))
+
+        header, data = read_csv(self.path, 'float64', chunk_size=64, processes=2)
+
+        self.assertIsNone(header)
+        self.assertEqual(data[:, 1].sum(), 2 * sum(range(500)))
+
+    def test_non_numeric(self):
+        self.path.write_text("a,b\n1,2\n3,x\n")
+
+        with self.assertRaises(ValueError):
+            read_csv(self.path)
+        self.assertEqual(read_csv(self.path, str)[1][2].tolist(), ['3', 'x'])
+
+    def test_underscores_quotes_and_blank_lines(self):
+        # Lines numpy can't parse are read like float() and csv.reader read them
+        self.path.write_text('a,b\n1_0,2\n"3","4.5"\n\n  \n5,6\n')
+
+        header, data = read_csv(self.path, chunk_size=8)
+        self.assertEqual(header, ['a', 'b'])
+        self.assertTrue(array_equal(data, nparray([[10, 2], [3, 4.5], [5, 6]], dtype='float32')))
+
+        header, data = read_csv(self.path)
+        self.assertTrue(array_equal(data, nparray([[10, 2], [3, 4.5], [5, 6]], dtype='float32')))
+
+    def test_ragged_lines(self):
+        # Value counts add up to whole lines, the values must not be shifted to the next line
+        self.path.write_text("a,b,c\n1,2,3\n4,5\n6,7,8,9\n")
+        with self.assertRaises(ValueError):
+            read_csv(self.path)
+
+        self.path.write_text("1,2\n3,4,5\n6\n")
+        with self.assertRaises(ValueError):
+            read_csv(self.path, chunk_size=4)
+
+if __name__ == '__main__':
+    unittest.main()
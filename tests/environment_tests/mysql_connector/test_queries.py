@@ -0,0 +1,61 @@
+import unittest
+
+from data.util.MySql import MySQL_Connector, build_join_query, build_select_query, quote_identifier
+
+class FakeCursor:
+
+    def __init__(self):
+        self.executed = []
+        self.description = [('data',)]
+
+    def execute(self, sql, params=()):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return [('a',), ('b',)]
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    # Records the created prepared cursors
+
+    def __init__(self):
+        self.cursors = []
+
+    def cursor(self, prepared=False):
+        self.cursors.append(FakeCursor())
+        return self.cursors[-1]
+
+class Queries(unittest.TestCase):
+
+    def test_identifiers_are_validated(self):
+        self.assertEqual(quote_identifier("track_id"), "`track_id`")
+        with self.assertRaises(SystemExit):
+            quote_identifier("track_id; DROP TABLE tracks")
+
+    def test_join_query_is_cached(self):
+        first = build_join_query("tracks", "track_id", "charts", "position", ("id", "track"))
+        second = build_join_query("tracks", "track_id", "charts", "position", ("id", "track"))
+
+        self.assertIs(first, second)
+        self.assertIn("JOIN `charts` B ON (A.`id` = B.`track`)", first)
+        self.assertEqual(
+                build_select_query("tracks", (("track_id", "data"),)), 
+                "SELECT `track_id` AS `data` FROM `tracks`"
+                )
+
+    def test_prepared_cursor_is_reused(self):
+        connector = MySQL_Connector.__new__(MySQL_Connector)
+        connector.db = FakeConnection()
+        connector.prepared = {}
+
+        connector.get_data("*", "tracks", 10)
+        _, data = connector.get_data("*", "tracks", 20)
+
+        self.assertEqual(len(connector.db.cursors), 1)
+        self.assertEqual(connector.db.cursors[0].executed[1], ("SELECT * FROM `tracks` LIMIT %s", (20,)))
+        self.assertEqual(data, [('a',), ('b',)])
+
+if __name__ == '__main__':
+    unittest.main()
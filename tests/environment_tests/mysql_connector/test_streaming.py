@@ -0,0 +1,76 @@
+import unittest
+from pathlib import Path
+from sqlite3 import connect as sqlite_connect
+from tempfile import TemporaryDirectory
+
+from data.util.MySql import iter_query_chunks
+from data.util.data_fetching import mysqldb_fetch, mysqldb_fetch_chunks
+
+class SQLiteConnector:
+    # Stand-in for MySQL_Connector, implements the cursor interface with sqlite
+
+    def __init__(self, n_rows):
+        self.db = sqlite_connect(":memory:")
+        self.db.execute("CREATE TABLE popularities (track_id TEXT, popularity INTEGER)")
+        self.db.executemany(
+                "INSERT INTO popularities VALUES (?, ?)", 
+                [("track%d" % i, i % 100) for i in range(n_rows)]
+                )
+        self.closed_cursors = 0
+
+    def cursor(self, streaming=False):
+        connector = self
+        class Cursor(type(self.db.cursor())):
+            def close(self):
+                connector.closed_cursors += 1
+                super().close()
+        return self.db.cursor(Cursor)
+
+    def close_connection(self):
+        self.db.close()
+
+class MySQLStreaming(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.sql_path = Path(self.tmp.name, "popularities.sql")
+        self.sql_path.write_text("SELECT track_id AS data, popularity AS label\nFROM popularities")
+        self.connector = SQLiteConnector(2500)
+
+    def tearDown(self):
+        self.connector.close_connection()
+        self.tmp.cleanup()
+
+    def test_typed_chunks(self):
+        chunks = list(iter_query_chunks(
+                        self.connector, 
+                        "SELECT track_id, popularity FROM popularities", 
+                        chunk_size=1000, 
+                        dtypes={'popularity': 'int8'}
+                        ))
+
+        self.assertEqual([len(c['track_id']) for c in chunks], [1000, 1000, 500])
+        self.assertEqual(chunks[0]['popularity'].dtype.name, 'int8')
+        self.assertEqual(chunks[2]['track_id'][-1], "track2499")
+        self.assertEqual(self.connector.closed_cursors, 1)
+
+    def test_cursor_closed_when_stopped_early(self):
+        chunks = iter_query_chunks(self.connector, "SELECT * FROM popularities", chunk_size=100)
+        next(chunks)
+        chunks.close()
+
+        self.assertEqual(self.connector.closed_cursors, 1)
+
+    def test_mysqldb_fetch(self):
+        data, labels = mysqldb_fetch(self.sql_path, self.connector, chunk_size=1000)
+
+        self.assertEqual(len(data), 2500)
+        self.assertEqual(data[123], "track123")
+        self.assertEqual(labels[123], 23)
+        self.assertEqual(
+                sum(len(d) for d, _ in mysqldb_fetch_chunks(self.sql_path, self.connector, 700)), 
+                2500
+                )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from numpy import arange, bincount, allclose
+from numpy.random import default_rng
+from tensorflow.data import Dataset as tfDataset
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+
+from data.util.balancing import balance_dataset
+from data.dataset_handler import DatasetHandler
+
+class Balancing(unittest.TestCase):
+
+    def setUp(self):
+        self.labels = default_rng(0).choice(3, 3000, p=[0.6, 0.3, 0.1]).astype('int32')
+        self.dataset = tfDataset.from_tensor_slices((arange(len(self.labels)), self.labels))
+        self.counts = bincount(self.labels)
+
+    def read(self, dataset):
+        return list(dataset.as_numpy_iterator())
+
+    def test_undersample(self):
+        dataset = balance_dataset(self.dataset, 'under', labels=self.labels, seed=1)
+        elements = self.read(dataset)
+        self.assertEqual(dataset.cardinality().numpy(), 3 * self.counts.min())
+        self.assertTrue((bincount([y for _, y in elements]) == self.counts.min()).all())
+        # Elements keep their labels
+        self.assertTrue(all(self.labels[x] == y for x, y in elements))
+
+        # Rejection resampling without the labels array
+        elements = self.read(balance_dataset(self.dataset, 'under', seed=1))
+        self.assertTrue((abs(bincount([y for _, y in elements]) - self.counts.min()) < 0.25 * self.counts.min()).all())
+        # Same seed selects the same elements
+        self.assertEqual([x for x, _ in elements], [x for x, _ in self.read(balance_dataset(self.dataset, 'under', seed=1))])
+
+    def test_oversample(self):
+        dataset = balance_dataset(self.dataset, 'over', seed=1)
+        elements = self.read(dataset)
+        self.assertEqual(dataset.cardinality().numpy(), 3 * self.counts.max())
+        self.assertTrue((bincount([y for _, y in elements]) == self.counts.max()).all())
+        self.assertTrue(all(self.labels[x] == y for x, y in elements))
+        # Every element of a class is used, repeats differ by at most one
+        for c in range(3):
+            repeats = bincount([x for x, y in elements if y == c], minlength=len(self.labels))[self.labels == c]
+            self.assertTrue(repeats.min() >= 1 and repeats.max() - repeats.min() <= 1)
+
+    def test_class_weights(self):
+        elements = self.read(balance_dataset(self.dataset, 'weight'))
+        weights = [w for _, _, w in elements]
+        self.assertEqual(len(elements), len(self.labels))
+        self.assertTrue(allclose(sum(weights) / len(weights), 1.0))
+        self.assertTrue(allclose(weights[0] * self.counts[self.labels[0]], len(self.labels) / 3))
+    def test_missing_store_is_not_balanced(self):
+        handler = DatasetHandler.__new__(DatasetHandler)
+        with TemporaryDirectory() as folder:
+            handler.data_preprocessor = SimpleNamespace(balance_mode='under', processed_path=Path(folder))
+            datasets = (self.dataset, self.dataset, self.dataset)
+            self.assertIs(handler.balance_splits(datasets, True), datasets)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from numpy import arange, array_equal, memmap
+
+from data.util.dataset_store import save_memmap_dataset, save_split_indexes, read_manifest, open_memmap_arrays, load_memmap_dataset, store_exists
+
+class MemmapStore(unittest.TestCase):
+
+    def setUp(self):
+        self.x = arange(50 * 3, dtype='float64').reshape((50, 3))
+        self.y = arange(50, dtype='int64') % 5
+
+    def test_round_trip(self):
+        with TemporaryDirectory() as folder:
+            path = Path(folder)
+            save_memmap_dataset(path, {'train': (self.x[:40], self.y[:40]), 'test': (self.x[40:], None)})
+            self.assertTrue(store_exists(path))
+
+            manifest = read_manifest(path)
+            train = manifest['splits']['train']
+            self.assertEqual(train['length'], 40)
+            self.assertEqual(train['arrays']['x'], {'file': "train/x.npy", 'dtype': 'float32', 'shape': [40, 3]})
+            self.assertEqual(train['arrays']['y']['dtype'], 'int32')
+            self.assertNotIn('y', manifest['splits']['test']['arrays'])
+
+            arrays = open_memmap_arrays(path)
+            x, y, indexes = arrays['train']
+            self.assertIsInstance(x, memmap)
+            self.assertEqual((x.dtype.name, x.shape), ('float32', (40, 3)))
+            self.assertEqual((y.dtype.name, y.shape), ('int32', (40,)))
+            self.assertIsNone(indexes)
+            self.assertTrue(array_equal(x, self.x[:40]))
+            self.assertIsNone(arrays['test'][1])
+
+            datasets = load_memmap_dataset(path, chunk_size=7)
+            self.assertEqual(datasets['train'].cardinality().numpy(), 40)
+            rows = list(datasets['train'].as_numpy_iterator())
+            self.assertTrue(array_equal(rows[13][0], self.x[13]))
+            self.assertEqual(rows[13][1], self.y[13])
+            self.assertEqual(len(list(datasets['test'].as_numpy_iterator())), 10)
+
+    def test_index_splits(self):
+        with TemporaryDirectory() as folder:
+            path = Path(folder)
+            save_memmap_dataset(path, {'base': (self.x, self.y)})
+            save_split_indexes(path, 'base', {'train': arange(10, 50), 'test': arange(10)[::-1]}, {'seed': 3})
+
+            manifest = read_manifest(path)
+            self.assertEqual(manifest['index_splits']['test'], {'base': 'base', 'file': "indexes/test.npy", 'length': 10})
+            self.assertEqual(manifest['split_params'], {'seed': 3})
+
+            x, y, indexes = open_memmap_arrays(path)['test']
+            self.assertEqual(indexes.dtype.name, 'int64')
+            self.assertTrue(array_equal(indexes, arange(10)[::-1]))
+
+            # Rows are gathered from the base split in the index order
+            rows = list(load_memmap_dataset(path, chunk_size=3)['test'].as_numpy_iterator())
+            self.assertTrue(array_equal([r[0] for r in rows], self.x[9::-1].astype('float32')))
+            self.assertEqual([int(r[1]) for r in rows], list(self.y[9::-1]))
+
+    def test_broken_store(self):
+        with TemporaryDirectory() as folder:
+            path = Path(folder)
+            save_memmap_dataset(path, {'train': (self.x, self.y)})
+            # Array replaced with another shape
+            save_memmap_dataset(path.joinpath("other"), {'train': (self.x[:5], self.y[:5])})
+            path.joinpath("other", "train", "x.npy").replace(path.joinpath("train", "x.npy"))
+            self.assertIsNone(open_memmap_arrays(path))
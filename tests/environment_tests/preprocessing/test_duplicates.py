@@ -0,0 +1,76 @@
+import unittest
+from numpy import array as nparray, array_equal, column_stack as npcolumn_stack
+from numpy.random import default_rng
+from time import perf_counter
+
+from data.util.preprocessing import duplicate_mask, drop_duplicates
+
+class DuplicateRemoval(unittest.TestCase):
+
+    def setUp(self):
+        self.features = nparray([
+            [1.0, 2.0],
+            [3.0, 4.0],
+            [1.0, 2.0],
+            [-0.0, 5.0],
+            [0.0, 5.0],
+            [3.001, 4.0]
+            ], dtype="float32")
+        self.labels = [0, 1, 2, 3, 4, 5]
+        self.records = ['a', 'b', 'c', 'd', 'e', 'f']
+
+    def test_exact_duplicates(self):
+        mask = duplicate_mask(self.features)
+        self.assertTrue(array_equal(mask, [True, True, False, True, False, True]))
+
+    def test_aligned_outputs(self):
+        features, labels, records, duplicates = drop_duplicates(self.features, self.labels, self.records)
+        # First occurrences are kept in the original order
+        self.assertTrue(array_equal(labels, [0, 1, 3, 5]))
+        self.assertEqual(records, ['a', 'b', 'd', 'f'])
+        self.assertTrue(array_equal(features, self.features[[0, 1, 3, 5]]))
+        self.assertTrue(array_equal(duplicates, [2, 4]))
+
+    def test_near_duplicates(self):
+        features, labels, records, duplicates = drop_duplicates(self.features, self.labels, tolerance=0.01)
+        self.assertTrue(array_equal(labels, [0, 1, 3]))
+        self.assertIsNone(records)
+        self.assertTrue(array_equal(duplicates, [2, 4, 5]))
+
+    def test_tolerance_is_not_a_grid(self):
+        # 0.004 and 0.006 are rounded to different multiples of 0.01 but are within the tolerance
+        features = nparray([[0.004, 1.0], [0.006, 1.0], [0.0139, 1.0]], dtype="float32")
+        self.assertTrue(array_equal(duplicate_mask(features, tolerance=0.01), [True, False, False]))
+        features = nparray([[0.0, 1.0], [0.0149, 1.0], [0.006, 1.02]], dtype="float32")
+        self.assertTrue(array_equal(duplicate_mask(features, tolerance=0.01), [True, True, True]))
+
+    def test_tolerance_chain(self):
+        # Middle row is dropped, the last one is not close to any kept row
+        features = nparray([[0.0], [0.008], [0.016], [0.003]])
+        self.assertTrue(array_equal(duplicate_mask(features, tolerance=0.01), [True, False, True, False]))
+
+    def test_tolerance_equals_pairwise_check(self):
+        # Greedy check of every pair in the original order
+        rng = default_rng(0)
+        features = nparray(rng.integers(0, 6, (300, 3)) * 0.004 + rng.random((300, 3)) * 0.002)
+        expected = []
+        for i, row in enumerate(features):
+            kept = [j for j in range(i) if expected[j]]
+            expected.append(not any((abs(features[j] - row) <= 0.005).all() for j in kept))
+        self.assertTrue(array_equal(duplicate_mask(features, tolerance=0.005), expected))
+
+    def test_tolerance_scales_with_clustered_columns(self):
+        # Every column has only a few values (like mode or time signature), the rows are distinct by their combination
+        def make(n):
+            rng = default_rng(1)
+            return rng.integers(0, 20, (n, 4)) * 0.1
+
+        times = []
+        for n in (10000, 40000):
+            features = make(n)
+            start = perf_counter()
+            mask = duplicate_mask(features, tolerance=0.01)
+            times.append(perf_counter() - start)
+            self.assertTrue(array_equal(mask, duplicate_mask(features)))
+        # Four times the rows, a pairwise check would take 16 times longer
+        self.assertLess(times[1], 8 * times[0] + 0.5)
@@ -0,0 +1,50 @@
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from pickle import dump as pkldump
+from numpy import array as nparray, allclose
+from sklearn.preprocessing import OrdinalEncoder, OneHotEncoder, MinMaxScaler
+
+from data.util.encoders import EncoderPipeline
+from data.util.utils import save_encoders, load_encoders
+
+class EncoderPipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        # Pclass, Sex, Age
+        self.data = nparray([
+            [1, 'male', 22.0],
+            [3, 'female', 38.0],
+            [2, 'female', 26.0],
+            [3, 'male', 35.0]
+            ], dtype=object)
+        self.pipeline = EncoderPipeline((
+                {'Input': 0, 'Encoder': OneHotEncoder()},
+                {'Input': 1, 'Encoder': (OrdinalEncoder(), OneHotEncoder())},
+                {'Input': 'All', 'Encoder': MinMaxScaler()}
+                )).fit(self.data)
+
+    def test_transform_and_inverse(self):
+        features = self.pipeline.transform(self.data)
+
+        self.assertEqual(features.shape, (4, 6))
+        self.assertEqual(features[0].tolist(), [1, 0, 0, 0, 1, 0])
+        self.assertEqual(self.pipeline.inverse_transform(features).tolist(), self.data.tolist())
+        # Single input is a batch of one
+        self.assertTrue(allclose(self.pipeline.transform(self.data[1]), features[1:2]))
+
+    def test_save_and_load(self):
+        with TemporaryDirectory() as tmp:
+            save_encoders(Path(tmp), self.pipeline)
+            loaded = load_encoders(Path(tmp))
+
+            # Encoder lists saved before the pipeline can still be loaded
+            with Path(tmp, "encoders.pkl").open('wb') as f:
+                pkldump(self.pipeline.steps, f)
+            legacy = load_encoders(Path(tmp))
+
+        self.assertTrue(allclose(loaded.transform(self.data), self.pipeline.transform(self.data)))
+        self.assertTrue(allclose(legacy.transform(self.data), self.pipeline.transform(self.data)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from numpy import zeros
+
+from data.util.dataset_store import save_memmap_dataset
+from data.util.preprocess_cache import PreprocessCache, CACHE_INDEX_NAME
+
+class Preprocessor:
+    pass
+
+class PreprocessCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = TemporaryDirectory()
+        self.path = Path(self.folder.name)
+        self.raw = self.path.joinpath("raw.jsonl")
+        self.raw.write_text('{"a": 1}\n')
+        self.cache = PreprocessCache(self.path.joinpath("processed"), budget=10 ** 9)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def create(self, key, params, rows=100):
+        save_memmap_dataset(self.cache.variant_path(key), {'train': (zeros((rows, 4)), None)})
+        self.cache.register(key, params)
+
+    def test_variant_key(self):
+        key = self.cache.variant_key(self.raw, Preprocessor, {'scale': True})
+        self.assertEqual(key, self.cache.variant_key(self.raw, Preprocessor, {'scale': True}))
+        self.assertNotEqual(key, self.cache.variant_key(self.raw, Preprocessor, {'scale': False}))
+        # Lookups do not write the index
+        self.assertFalse(self.cache.index_path.exists())
+
+        self.raw.write_text('{"a": 2}\n')
+        self.assertNotEqual(key, self.cache.variant_key(self.raw, Preprocessor, {'scale': True}))
+
+    def test_hit_and_miss(self):
+        key = self.cache.variant_key(self.raw, Preprocessor, {'scale': True})
+        self.assertFalse(self.cache.contains(key))
+        self.create(key, {'scale': True})
+        self.assertTrue(self.cache.contains(key))
+        # File hashes are stored with the registered variant
+        index = self.cache.read_index()
+        self.assertIn(str(self.raw), index['files'])
+        self.assertIn(key, index['variants'])
+
+    def test_lru_eviction(self):
+        self.create('a', {'n': 1})
+        size = self.cache.read_index()['variants']['a']['size']
+        self.cache.budget = 2 * size
+        self.create('b', {'n': 2})
+        # 'a' is used after 'b', 'b' is the least recently used
+        self.cache.touch('a')
+        self.create('c', {'n': 3})
+
+        variants = self.cache.read_index()['variants']
+        self.assertEqual(sorted(variants.keys()), ['a', 'c'])
+        self.assertFalse(self.cache.variant_path('b').exists())
+        self.assertTrue(self.cache.contains('a'))
+
+    def test_find_variant(self):
+        self.create('a', {'scale': True, 'split_seed': 1, 'base': 'x'})
+        self.create('b', {'scale': True, 'split_seed': 2, 'base': 'x'})
+        self.create('c', {'scale': True, 'split_seed': 1, 'base': 'y'})
+        self.cache.touch('a')
+
+        # Most recently used stored variant with the arguments
+        self.assertEqual(self.cache.find_variant(base='x'), 'a')
+        self.assertEqual(self.cache.find_variant(base='x', split_seed=2), 'b')
+        self.assertIsNone(self.cache.find_variant(base='z'))
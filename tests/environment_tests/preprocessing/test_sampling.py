@@ -0,0 +1,64 @@
+import unittest
+from json import dumps as jsondumps
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+from numpy import arange, array_equal, bincount
+from numpy.random import default_rng
+from tensorflow.data import Dataset as tfDataset
+
+from data.util import sampling
+from data.util.sampling import sample_indexes, sample_json_records, sample_tf_dataset
+
+class Sampling(unittest.TestCase):
+
+    def setUp(self):
+        self.labels = default_rng(0).choice(4, 20000, p=[0.55, 0.25, 0.15, 0.05])
+
+    def test_reservoir(self):
+        indexes = sample_indexes(100000, 500, seed=1)
+        self.assertEqual(len(set(indexes.tolist())), 500)
+        self.assertTrue(array_equal(indexes, sample_indexes(100000, 500, seed=1)))
+        self.assertFalse(array_equal(indexes, sample_indexes(100000, 500, seed=2)))
+
+    def test_stratified(self):
+        indexes = sample_indexes(len(self.labels), 400, strata=self.labels)
+        self.assertEqual(len(indexes), 400)
+        expected = bincount(self.labels) * 400 / len(self.labels)
+        self.assertTrue((abs(bincount(self.labels[indexes]) - expected) < 1).all())
+
+    def test_cached_json_lines(self):
+        with TemporaryDirectory() as folder:
+            path = Path(folder, "dataset.jsonl")
+            with path.open('w') as f:
+                for i, label in enumerate(self.labels[:5000]):
+                    f.write(jsondumps({'id': i, 'labels': int(label)}) + "\n")
+
+            strata = lambda records: [r['labels'] for r in records]
+            cache = Path(folder, "samples")
+            first = [r['id'] for r in sample_json_records(path, 100, strata, cache_folder=cache)]
+
+            # Cached sample is read from the line offsets without parsing the other records
+            with mock.patch.object(sampling, 'iter_json_lines', side_effect=AssertionError):
+                second = [r['id'] for r in sample_json_records(path, 100, strata, cache_folder=cache)]
+
+            self.assertEqual(first, second)
+            self.assertEqual(len(first), 100)
+            self.assertEqual(first, sorted(first))
+
+    def test_tf_dataset(self):
+        dataset = tfDataset.from_tensor_slices((arange(len(self.labels)), self.labels))
+        with TemporaryDirectory() as folder:
+            sampled = list(sample_tf_dataset(dataset, 200, "test", cache_folder=Path(folder)).as_numpy_iterator())
+
+            # Cached sample is read from the stored elements without iterating the dataset
+            with mock.patch.object(sampling, 'select_elements', side_effect=AssertionError):
+                cached = list(sample_tf_dataset(dataset, 200, "test", cache_folder=Path(folder)).as_numpy_iterator())
+            self.assertEqual([(int(x), int(y)) for x, y in cached], [(int(x), int(y)) for x, y in sampled])
+
+        x = [int(e[0]) for e in sampled]
+        self.assertEqual(len(x), 200)
+        self.assertTrue(array_equal(x, sample_indexes(len(self.labels), 200, strata=self.labels)))
+
+if __name__ == '__main__':
+    unittest.main()
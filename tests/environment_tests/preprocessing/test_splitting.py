@@ -0,0 +1,97 @@
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from numpy import arange, array_equal, allclose, bincount, concatenate as npconcatenate, sort as npsort
+from sklearn.preprocessing import MinMaxScaler
+from numpy.random import default_rng
+
+from data.util.dataset_store import load_memmap_dataset
+from data.util.splitting import split_indexes, save_split_dataset, resplit_memmap_dataset, fit_split_scaler, derive_split_dataset
+from data.util.dataset_store import read_manifest
+
+class IndexSplits(unittest.TestCase):
+
+    def setUp(self):
+        self.labels = default_rng(0).choice(4, 10000, p=[0.5, 0.3, 0.15, 0.05]).astype('int32')
+        self.features = default_rng(1).random((len(self.labels), 3)).astype('float32')
+
+    def test_stratified_partition(self):
+        indexes = split_indexes(self.labels, 0.33, 0.15, seed=1)
+        # Every row is in exactly one split
+        self.assertTrue(array_equal(npsort(npconcatenate(list(indexes.values()))), arange(len(self.labels))))
+
+        for split, size in (('test', 0.33), ('validate', 0.67 * 0.15)):
+            counts = bincount(self.labels[indexes[split]], minlength=4)
+            self.assertTrue((abs(counts - bincount(self.labels) * size) <= 1).all())
+
+        self.assertTrue(array_equal(indexes['train'], split_indexes(self.labels, 0.33, 0.15, seed=1)['train']))
+        self.assertFalse(array_equal(indexes['train'], split_indexes(self.labels, 0.33, 0.15, seed=2)['train']))
+
+    def test_store_and_resplit(self):
+        params = {'test_size': 0.33, 'validation': 0.15, 'seed': 0}
+        indexes = split_indexes(self.labels, **params)
+        with TemporaryDirectory() as folder:
+            path = Path(folder)
+            save_split_dataset(path, self.features, self.labels, indexes, params)
+            base = path.joinpath("base", "x.npy").stat().st_mtime_ns
+
+            train = list(load_memmap_dataset(path)['train'].take(5).as_numpy_iterator())
+            for (x, y), i in zip(train, indexes['train']):
+                self.assertTrue(array_equal(x, self.features[i]) and y == self.labels[i])
+
+            self.assertFalse(resplit_memmap_dataset(path, 0))
+            start = perf_counter()
+            self.assertTrue(resplit_memmap_dataset(path, 5))
+            self.assertLess(perf_counter() - start, 1.0)
+
+            # Only the index arrays are written
+            self.assertEqual(base, path.joinpath("base", "x.npy").stat().st_mtime_ns)
+            datasets = load_memmap_dataset(path)
+            x, y = next(datasets['test'].as_numpy_iterator())
+            i = split_indexes(self.labels, 0.33, 0.15, seed=5)['test'][0]
+            self.assertTrue(array_equal(x, self.features[i]) and y == self.labels[i])
+
+    def test_scaler_follows_the_train_split(self):
+        params = {'test_size': 0.33, 'validation': 0.15, 'seed': 0}
+        with TemporaryDirectory() as folder:
+            path = Path(folder)
+            save_split_dataset(path, self.features, self.labels, split_indexes(self.labels, **params), params)
+            fit_split_scaler(path)
+            self.assertTrue(resplit_memmap_dataset(path, 5, MinMaxScaler()))
+
+            # Scaler is fitted only with the new train rows, the stored features stay unscaled
+            indexes = split_indexes(self.labels, 0.33, 0.15, seed=5)
+            expected = MinMaxScaler().fit(self.features[indexes['train']])
+            datasets = load_memmap_dataset(path)
+            x = next(datasets['test'].batch(100).as_numpy_iterator())[0]
+            self.assertTrue(allclose(x, expected.transform(self.features[indexes['test'][:100]]), atol=1e-6))
+            x = next(datasets['base'].batch(100).as_numpy_iterator())[0]
+            self.assertTrue(allclose(x, expected.transform(self.features[:100]), atol=1e-6))
+    def test_derived_split_leaves_the_source(self):
+        params = {'test_size': 0.33, 'validation': 0.15, 'seed': 0}
+        indexes = split_indexes(self.labels, **params)
+        with TemporaryDirectory() as folder:
+            source, path = Path(folder, "source"), Path(folder, "derived")
+            save_split_dataset(source, self.features, self.labels, indexes, params)
+            fit_split_scaler(source)
+            manifest = read_manifest(source)
+            train = source.joinpath("indexes", "train.npy").read_bytes()
+
+            scaler = derive_split_dataset(source, path, 5)
+            expected = MinMaxScaler().fit(self.features[split_indexes(self.labels, 0.33, 0.15, seed=5)['train']])
+            self.assertTrue(allclose(scaler.scale_, expected.scale_))
+
+            # Source store keeps its split and scaling, the base arrays are shared
+            self.assertEqual(manifest, read_manifest(source))
+            self.assertEqual(train, source.joinpath("indexes", "train.npy").read_bytes())
+            self.assertEqual(read_manifest(path)['split_params']['seed'], 5)
+            self.assertTrue(path.joinpath("base", "x.npy").samefile(source.joinpath("base", "x.npy")))
+            self.assertFalse(Path(folder, "derived.tmp").exists())
+
+            x = next(load_memmap_dataset(source)['test'].batch(100).as_numpy_iterator())[0]
+            original = MinMaxScaler().fit(self.features[indexes['train']])
+            self.assertTrue(allclose(x, original.transform(self.features[indexes['test'][:100]]), atol=1e-6))
+
+if __name__ == '__main__':
+    unittest.main()
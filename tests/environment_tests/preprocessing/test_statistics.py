@@ -0,0 +1,78 @@
+import unittest
+from numpy import allclose, asarray, unique, inf, nan, isfinite
+from numpy.random import default_rng
+from scipy.stats import describe
+from sklearn.preprocessing import MinMaxScaler
+from tensorflow.data import Dataset as tfDataset
+
+from data.util.statistics import array_stats, dataset_stats, dataset_frequencies, fit_minmax_scaler, StreamingHistogram
+
+class StreamingStatistics(unittest.TestCase):
+
+    def setUp(self):
+        self.x = default_rng(0).gamma(2.0, 3.0, (10001, 4)).astype('float32')
+
+    def test_equals_scipy_describe(self):
+        stats = array_stats(self.x, chunk_size=777)
+        merged = array_stats(self.x[:5000], chunk_size=1000).merge(array_stats(self.x[5000:], chunk_size=999))
+
+        for result in (stats.describe(), merged.describe()):
+            for value, expected in zip(result, describe(self.x.astype('float64'))):
+                self.assertTrue(allclose(asarray(value, dtype='float64'), asarray(expected, dtype='float64')))
+
+    def test_dataset_and_scaler(self):
+        labels = default_rng(1).integers(0, 10, len(self.x))
+        data_stats, label_stats = dataset_stats(tfDataset.from_tensor_slices((self.x, labels)), batch_size=1000)
+        scaler = fit_minmax_scaler(MinMaxScaler(), data_stats)
+
+        self.assertTrue(allclose(scaler.transform(self.x), MinMaxScaler().fit(self.x).transform(self.x)))
+        self.assertTrue(allclose(label_stats.mean, labels.mean()))
+
+    def test_histogram_grows(self):
+        hist = StreamingHistogram(16)
+        for chunk in (self.x[:10, 0], self.x[10:, 0], -self.x[:100, 0]):
+            hist.update(chunk)
+
+        self.assertEqual(hist.counts.sum(), len(self.x) + 100)
+        self.assertLessEqual(hist.low, -self.x[:100, 0].max())
+        self.assertGreaterEqual(hist.edges[-1], self.x[:, 0].max())
+
+    def test_histogram_non_finite(self):
+        hist = StreamingHistogram(16)
+        hist.update(asarray([1., 2., inf]))
+        # inf after the range is set does not grow the range
+        hist.update(asarray([-inf, nan, 3.]))
+        self.assertEqual(hist.counts.sum(), 3)
+        self.assertEqual(hist.non_finite, 3)
+        self.assertTrue(isfinite(hist.edges).all())
+
+        frequencies = dataset_frequencies(tfDataset.from_tensor_slices((asarray([[1.], [2.5], [inf]]), asarray([0, 1, 0]))), feature=0, max_values=1)
+        values, counts = frequencies.frequencies()
+        self.assertEqual((values[-1], counts[-1], counts.sum()), ('non finite', 1, 3))
+
+    def test_frequencies(self):
+        labels = default_rng(1).integers(0, 10, len(self.x))
+        dataset = tfDataset.from_tensor_slices((self.x, labels))
+
+        values, counts = dataset_frequencies(dataset, batch_size=999).frequencies()
+        expected_values, expected_counts = unique(labels, return_counts=True)
+        self.assertTrue((values == expected_values).all() and (counts == expected_counts).all())
+
+        # Continuous feature is counted as a histogram
+        frequencies = dataset_frequencies(dataset, feature=0, batch_size=999, max_values=100)
+        self.assertIsNotNone(frequencies.histogram)
+        self.assertEqual(frequencies.frequencies()[1].sum(), len(self.x))
+
+    def test_weighted_elements(self):
+        # Class weighted datasets have (data, label, weight) elements
+        labels = default_rng(1).integers(0, 10, len(self.x))
+        weighted = tfDataset.from_tensor_slices((self.x, labels, self.x[:, 0]))
+
+        values, counts = dataset_frequencies(weighted, batch_size=999).frequencies()
+        expected_values, expected_counts = unique(labels, return_counts=True)
+        self.assertTrue((values == expected_values).all() and (counts == expected_counts).all())
+        data_stats, label_stats = dataset_stats(weighted, batch_size=999)
+        self.assertEqual(label_stats.count, len(labels))
+
+if __name__ == '__main__':
+    unittest.main()
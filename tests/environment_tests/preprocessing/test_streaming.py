@@ -0,0 +1,56 @@
+import unittest
+from io import StringIO
+from json import load, dumps
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from numpy import array as nparray
+
+from data.util.streaming import iter_json_array, iter_json_records, chunk_records, read_feature_chunks
+
+def make_records(n):
+    return [{'id': i, 'name': "record \"%d\" [x], {y}" % i, 'values': [i * 0.5, -i], 'nested': {'a': [i]}} for i in range(n)]
+
+def extract(chunk):
+    return (nparray([r['values'] for r in chunk]), nparray([r['id'] for r in chunk]))
+
+class StreamingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = TemporaryDirectory()
+        self.path = Path(self.folder.name)
+        self.records = make_records(250)
+
+        self.array_path = self.path.joinpath("records.json")
+        self.array_path.write_text(dumps(self.records, indent=2))
+        self.lines_path = self.path.joinpath("records.jsonl")
+        self.lines_path.write_text("\n".join(dumps(r) for r in self.records) + "\n\n")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_json_array(self):
+        with self.array_path.open('r') as f:
+            expected = load(f)
+        # Read size much smaller than one object, objects are split over many reads
+        for read_size in (7, 64, 1000, 10 ** 6):
+            with self.array_path.open('r') as f:
+                self.assertEqual(list(iter_json_array(f, read_size)), expected)
+
+        self.assertEqual(list(iter_json_array(StringIO("  [ ]  "), 2)), [])
+        with self.assertRaises(ValueError):
+            list(iter_json_array(StringIO('[{"a": 1}, {"b": '), 4))
+
+    def test_json_records(self):
+        with self.array_path.open('r') as f:
+            expected = load(f)
+        self.assertEqual(list(iter_json_records(self.array_path)), expected)
+        self.assertEqual(list(iter_json_records(self.lines_path)), expected)
+
+    def test_feature_chunks(self):
+        self.assertEqual([len(c) for c in chunk_records(range(25), 10)], [10, 10, 5])
+
+        features, labels = read_feature_chunks(iter_json_records(self.lines_path), extract, chunk_size=32)
+        expected_features, expected_labels = extract(self.records)
+        self.assertEqual(features.shape, (250, 2))
+        self.assertTrue((features == expected_features).all())
+        self.assertTrue((labels == expected_labels).all())
@@ -0,0 +1,31 @@
+import unittest
+from numpy import array as nparray, array_equal
+from sklearn.preprocessing import OrdinalEncoder, OneHotEncoder
+
+from data.util.tabular import resolve_column, encode_column, fill_missing, stack_columns
+
+class ColumnarTables(unittest.TestCase):
+
+    def test_column_types(self):
+        self.assertEqual(resolve_column(['1', '', '3']).tolist(), [1, 0, 3])
+        self.assertEqual(resolve_column(['22', '', '0.42']).dtype.name, 'float64')
+        self.assertEqual(resolve_column(['113803', '', 'A/5 21171']).tolist(), ['113803', '0', 'A/5 21171'])
+        self.assertEqual(resolve_column(['C85', '']).tolist(), ['C85', ''])
+
+    def test_encoder_chain_and_stack(self):
+        train = {'Sex': nparray(['male', 'female', 'male']), 'Age': nparray([20.0, 0.0, 40.0])}
+        test = {'Sex': nparray(['female']), 'Age': nparray([10.0])}
+
+        train['Sex'], test['Sex'] = encode_column(
+                                        (OrdinalEncoder(), OneHotEncoder()), 
+                                        [train['Sex'], test['Sex']], 
+                                        [train['Sex'], test['Sex']]
+                                        )
+        train['Age'] = fill_missing(train['Age'], 0.0)
+        features = stack_columns(train, ['Sex', 'Age'])
+
+        self.assertEqual(test['Sex'].tolist(), [[1.0, 0.0]])
+        self.assertTrue(array_equal(features, nparray([[0, 1, 20], [1, 0, 30], [0, 1, 40]], dtype='float32')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from numpy import arange, array_equal
+from tensorflow.data import Dataset as tfDataset
+
+from data.util.utils import load_tfdataset
+from data.util.tfrecord_store import export_tfrecords
+
+class ShardedTFRecords(unittest.TestCase):
+
+    def setUp(self):
+        x = arange(300 * 4, dtype='float32').reshape((300, 4))
+        self.datasets = {
+            'train': tfDataset.from_tensor_slices((x, arange(300, dtype='int32'))),
+            'test': tfDataset.from_tensor_slices(x[:10])
+            }
+
+    def test_round_trip(self):
+        with TemporaryDirectory() as folder:
+            path = Path(folder)
+            # Small records so every shard gets many records
+            export_tfrecords(path, self.datasets, shards=4, record_size=16)
+            self.assertEqual(len(list(path.glob("train-*.tfrecord"))), 4)
+
+            loaded = load_tfdataset(path)
+            self.assertEqual(loaded['train'].cardinality().numpy(), 300)
+            self.assertEqual(loaded['train'].element_spec[0].shape.as_list(), [4])
+
+            # Deterministic interleave gives the elements in the original order
+            for name, dataset in self.datasets.items():
+                for original, read in zip(dataset.as_numpy_iterator(), loaded[name].as_numpy_iterator()):
+                    if isinstance(original, tuple):
+                        self.assertTrue(all(array_equal(a, b) for a, b in zip(original, read)))
+                    else:
+                        self.assertTrue(array_equal(original, read))
+
+            labels = sorted(int(y) for _, y in load_tfdataset(path, deterministic=False)['train'].as_numpy_iterator())
+            self.assertEqual(labels, list(range(300)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+from numpy import array as nparray, array_equal, arange as nparange
+
+from data.util.preprocessing import bucket_popularity, parse_release_decades, extract_track_features
+
+def baseline_bucket(s):
+    # Branches of the preprocess_labels before np.digitize
+    for i, edge in enumerate(range(10, 100, 10)):
+        if s < edge:
+            return i
+    return 9
+
+def baseline_decade(date):
+    # Year parsing of the per record extraction before parse_release_decades
+    if '-' in date:
+        y = date.split('-')[0]
+    else:
+        y = date
+    return float(y[2:])
+
+class TrackFeatures(unittest.TestCase):
+
+    def test_bucket_edges(self):
+        values = [0, 9, 9.99, 10, 19, 20, 49.5, 50, 89, 90, 99, 100, -1, 150]
+        expected = [baseline_bucket(v) for v in values]
+        self.assertEqual(expected, [0, 0, 0, 1, 1, 2, 4, 5, 8, 9, 9, 9, 0, 9])
+        buckets = bucket_popularity(values)
+        self.assertEqual(buckets.dtype.name, 'int32')
+        self.assertTrue(array_equal(buckets, expected))
+
+        values = nparange(0, 101)
+        self.assertTrue(array_equal(bucket_popularity(values), [baseline_bucket(v) for v in values]))
+
+    def test_release_decades(self):
+        dates = ['1999-12-31', '2000-01', '2005', '1901-02-03', '2010-06', '1960']
+        decades = parse_release_decades(dates)
+        # Last two digits of the year, the century is dropped (% 100)
+        self.assertTrue(array_equal(decades, [99, 0, 5, 1, 10, 60]))
+        self.assertTrue(array_equal(decades, [baseline_decade(d) for d in dates]))
+
+    def test_extract_track_features(self):
+        records = [
+            {'features': [1., 2.], 'release_date': '1987-05-01', 'popularity': 42},
+            {'features': [3., 4.], 'release_date': '2003', 'popularity': 7},
+            {'features': [5., 6.], 'release_date': '2019-11'}
+            ]
+        features, labels = extract_track_features(records, 'popularity', default_label=-1)
+        self.assertEqual(features.dtype.name, 'float32')
+        self.assertTrue(array_equal(features, nparray([[1., 2., 87.], [3., 4., 3.], [5., 6., 19.]])))
+        self.assertTrue(array_equal(labels, [42, 7, -1]))
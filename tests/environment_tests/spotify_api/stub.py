@@ -0,0 +1,61 @@
+from threading import Lock
+from spotipy.exceptions import SpotifyException
+
+class StubSpotify:
+    # Local stand-in for the spotipy client
+    # Implements the client methods used by SpotifyAPI and records the requests
+    # In:
+    #   n_albums:                   int, number of albums, every album has 10 tracks
+    #   rate_limited:               int, number of first requests answered with 429
+    #   fail_after:                 int, requests after this many calls raise a server error without retries left, None = never
+
+    def __init__(self, n_albums=5, rate_limited=0, fail_after=None):
+        self.albums_data = {
+                "album%d" % a: ["track%d_%d" % (a, t) for t in range(10)] 
+                for a in range(n_albums)
+                }
+        self.rate_limited = rate_limited
+        self.fail_after = fail_after
+        self.calls = []
+        self.lock = Lock()
+
+    def call(self, method, ids):
+        with self.lock:
+            if self.rate_limited > 0:
+                self.rate_limited -= 1
+                raise SpotifyException(429, -1, "rate limited", headers={'Retry-After': '0'})
+            if self.fail_after is not None and len(self.calls) >= self.fail_after:
+                raise SpotifyException(400, -1, "stub failure")
+            self.calls.append((method, ids))
+
+    def track(self, track_id):
+        album = "album" + track_id[5:].split('_')[0]
+        return {
+                'name': track_id,
+                'id': track_id,
+                'artists': [{'id': 'artist', 'name': 'Artist'}],
+                'popularity': 50,
+                'duration_ms': 200000,
+                'album': {'id': album, 'release_date': '1999-01-01'}
+                }
+
+    def audio_features(self, ids):
+        self.call('audio_features', ids)
+        return [{
+                'time_signature': 4, 'duration_ms': 200000, 'key': 1, 'mode': 1,
+                'acousticness': 0.1, 'danceability': 0.2, 'energy': 0.3,
+                'instrumentalness': 0.4, 'liveness': 0.5, 'loudness': -5.0,
+                'speechiness': 0.6, 'valence': 0.7, 'tempo': 120.0
+                } for i in ids]
+
+    def tracks(self, ids):
+        self.call('tracks', ids)
+        return {'tracks': [self.track(i) for i in ids]}
+
+    def albums(self, ids):
+        self.call('albums', ids)
+        return {'albums': [{'id': a, 'tracks': {'items': [{'id': t} for t in self.albums_data[a]]}} for a in ids]}
+
+    def album_tracks(self, album_id):
+        self.call('album_tracks', album_id)
+        return {'items': [{'id': t} for t in self.albums_data[album_id]]}
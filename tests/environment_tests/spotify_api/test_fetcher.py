@@ -0,0 +1,114 @@
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from spotipy.exceptions import SpotifyException
+
+from data.util.Spotify_functions import SpotifyAPI
+# Hack so that tests are importable in different levels
+try:
+    from .stub import StubSpotify
+except:
+    from stub import StubSpotify
+
+class ConcurrentFetcher(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.save_path = Path(self.tmp.name, "stub", "stub_dataset.jsonl")
+        self.track_ids = {"track%d_%d" % (a, t): a for a in range(20) for t in range(10)}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_rate_limited_requests_are_retried(self):
+        stub = StubSpotify(rate_limited=3)
+        api = SpotifyAPI(client=stub, cache_path=None, requests_per_second=1000)
+        dataset = api.fetch_track_features(self.track_ids, batch_size=7)
+
+        self.assertEqual(sorted(d['id'] for d in dataset), sorted(self.track_ids))
+        self.assertTrue(all(d['labels'] == self.track_ids[d['id']] for d in dataset))
+
+    def test_resume_from_checkpoint(self):
+        # First run crashes after a few batches
+        stub = StubSpotify(fail_after=3)
+        api = SpotifyAPI(client=stub, cache_path=None, workers=1, requests_per_second=1000)
+        with self.assertRaises(SpotifyException):
+            api.make_feature_dataset(self.track_ids, self.save_path)
+        fetched = {i for method, ids in stub.calls if method == 'tracks' for i in ids}
+
+        # Second run fetches only the missing tracks
+        stub = StubSpotify()
+        api = SpotifyAPI(client=stub, cache_path=None, requests_per_second=1000)
+        dataset, _ = api.make_feature_dataset(self.track_ids, self.save_path)
+        refetched = {i for method, ids in stub.calls if method == 'tracks' for i in ids}
+
+        self.assertTrue(fetched)
+        self.assertFalse(fetched & refetched)
+        self.assertEqual(sorted(d['id'] for d in dataset), sorted(self.track_ids))
+        self.assertEqual(list(self.save_path.parent.glob("*.ckpt")), [])
+
+    def test_crawl_albums(self):
+        stub = StubSpotify()
+        api = SpotifyAPI(client=stub, cache_path=None, requests_per_second=1000)
+        track_ids = {"track%d_0" % a: 1 for a in range(5)}
+        dataset, _ = api.make_feature_dataset(track_ids, self.save_path, crawl_albums=True)
+
+        ids = [d['id'] for d in dataset]
+        self.assertTrue(set(track_ids) <= set(ids))
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(len(ids), len(track_ids) + 5 * 5)
+
+    def test_crawl_plan_requests_albums_once(self):
+        stub = StubSpotify()
+        api = SpotifyAPI(client=stub, cache_path=None, requests_per_second=1000)
+        # Every album appears 3 times in the dataset
+        track_ids = {"track%d_%d" % (a, t): 1 for a in range(5) for t in range(3)}
+        dataset = api.fetch_track_features(track_ids)
+        stub.calls = []
+
+        crawled = api.crawl_albums(dataset, track_ids, 5)
+
+        album_calls = [ids for method, ids in stub.calls if method == 'albums']
+        requested = [i for method, ids in stub.calls if method == 'tracks' for i in ids]
+        self.assertEqual(len(album_calls), 1)
+        self.assertEqual(sorted(album_calls[0]), ["album%d" % a for a in range(5)])
+        self.assertFalse(set(requested) & set(track_ids))
+        self.assertEqual(len(crawled), 5 * 5)
+
+    def test_cached_responses_are_not_requested(self):
+        cache_path = Path(self.tmp.name, "responses.sqlite")
+        stub = StubSpotify()
+        api = SpotifyAPI(client=stub, cache_path=cache_path, requests_per_second=1000)
+        first = api.fetch_track_features(self.track_ids)
+        api.cache.close()
+
+        # Overlapping sample from a new API object is served from the cache
+        stub = StubSpotify()
+        api = SpotifyAPI(client=stub, cache_path=cache_path, requests_per_second=1000)
+        sample = dict(list(self.track_ids.items())[:120])
+        second = api.fetch_track_features(sample)
+
+        self.assertEqual(stub.calls, [])
+        self.assertEqual(api.cache.misses, 0)
+        self.assertEqual(api.cache.hits, 2 * len(sample))
+        self.assertEqual(
+                sorted(d['id'] for d in second), 
+                sorted(d['id'] for d in first if d['id'] in sample)
+                )
+        api.cache.close()
+
+    def test_not_found_items_are_requested_again(self):
+        cache_path = Path(self.tmp.name, "responses.sqlite")
+        stub = StubSpotify()
+        stub.audio_features = lambda ids: [None if i == 'missing' else {'tempo': 1.} for i in ids]
+        api = SpotifyAPI(client=stub, cache_path=cache_path, requests_per_second=1000)
+
+        self.assertEqual(api.request_items('audio_features', ['a', 'missing']), [{'tempo': 1.}, None])
+        requested = []
+        stub.audio_features = lambda ids: requested.extend(ids) or [{'tempo': 2.} for i in ids]
+        self.assertEqual(api.request_items('audio_features', ['a', 'missing']), [{'tempo': 1.}, {'tempo': 2.}])
+        self.assertEqual(requested, ['missing'])
+        api.cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import sleep
+
+from data.util.response_cache import ResponseCache
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.path = Path(self.tmp.name, "responses.sqlite")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_missing_and_none_responses(self):
+        cache = ResponseCache(self.path)
+        cache.put_many('audio_features', {'a': {'tempo': 120}, 'b': None})
+
+        self.assertEqual(cache.get_many('audio_features', ['a', 'b', 'c']), {'a': {'tempo': 120}, 'b': None})
+        self.assertEqual(cache.get_many('tracks', ['a']), {})
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+        cache.close()
+
+    def test_expired_responses(self):
+        cache = ResponseCache(self.path, ttl=0.05)
+        cache.put_many('tracks', {'a': 1})
+        sleep(0.1)
+
+        self.assertEqual(cache.get_many('tracks', ['a']), {})
+        cache.close()
+
+    def test_least_recently_used_are_evicted(self):
+        # Every payload is 1 byte
+        cache = ResponseCache(self.path, budget=3)
+        cache.put_many('tracks', {'a': 1, 'b': 2})
+        sleep(0.01)
+        cache.put_many('tracks', {'c': 3})
+        sleep(0.01)
+        cache.get_many('tracks', ['a'])
+        sleep(0.01)
+        cache.put_many('tracks', {'d': 4})
+
+        self.assertEqual(sorted(cache.get_many('tracks', ['a', 'b', 'c', 'd'])), ['a', 'c', 'd'])
+        cache.close()
+
+    def test_ties_are_not_over_evicted(self):
+        # Responses stored together have the same last_used, only as many as needed are removed
+        cache = ResponseCache(self.path, budget=3)
+        cache.put_many('tracks', {'a': 1, 'b': 2, 'c': 3, 'd': 4})
+
+        self.assertEqual(len(cache.get_many('tracks', ['a', 'b', 'c', 'd'])), 3)
+        self.assertEqual(cache.total_size, 3)
+        cache.close()
+
+    def test_running_size(self):
+        cache = ResponseCache(self.path, budget=100)
+        cache.put_many('tracks', {'a': 1, 'b': 22})
+        # Replacing a response does not count the old payload
+        cache.put_many('tracks', {'b': 333})
+        self.assertEqual(cache.total_size, 4)
+        cache.close()
+
+        cache = ResponseCache(self.path, budget=100)
+        self.assertEqual(cache.total_size, 4)
+        cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
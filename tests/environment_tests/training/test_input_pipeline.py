@@ -0,0 +1,43 @@
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from numpy import arange
+from tensorflow.data import Dataset as tfDataset
+
+from third_party.tensorflow.train.input_pipeline import build_pipeline, pipeline_timings
+
+class InputPipeline(unittest.TestCase):
+
+    def setUp(self):
+        x = arange(100 * 4, dtype='uint8').reshape((100, 4))
+        self.dataset = tfDataset.from_tensor_slices((x, arange(100, dtype='int32')))
+
+    def test_default_batches(self):
+        batches = list(build_pipeline(self.dataset, None, 32).as_numpy_iterator())
+        self.assertEqual([len(y) for _, y in batches], [32, 32, 32, 4])
+        # No shuffling by default
+        self.assertEqual(list(batches[0][1][:3]), [0, 1, 2])
+
+    def test_stages(self):
+        with TemporaryDirectory() as folder:
+            config = {
+                'map': 'normalize_image',
+                'cache': str(Path(folder, "cache", "train")),
+                'shuffle': 100,
+                'seed': 1
+                }
+            dataset = build_pipeline(self.dataset, config, 10)
+            x, y = next(iter(dataset))
+            self.assertEqual(x.dtype.name, 'float32')
+            self.assertLessEqual(float(x.numpy().max()), 1.)
+
+            # Every element once per epoch, a new order every epoch
+            first = sorted(int(v) for _, y in dataset for v in y)
+            self.assertEqual(first, list(range(100)))
+            orders = [[int(v) for _, y in dataset for v in y] for _ in range(2)]
+            self.assertNotEqual(orders[0], orders[1])
+            self.assertTrue(any(Path(folder, "cache").iterdir()))
+
+    def test_timings(self):
+        timings = pipeline_timings(self.dataset, {'map': 'cast_float32', 'cache': 'memory'}, 10, steps=3)
+        self.assertEqual(list(timings.keys()), ['source', 'map', 'cache', 'batch', 'prefetch'])
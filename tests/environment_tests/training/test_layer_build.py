@@ -0,0 +1,32 @@
+import unittest
+from pathlib import Path
+from numpy import allclose
+from numpy.random import default_rng
+
+from models.NeuralNetworks.model import Model
+
+CONFIGURATIONS = Path("models", "NeuralNetworks", "configurations", "Classifier", "mnist")
+
+class LayerBuild(unittest.TestCase):
+
+    def check_same_output(self, configuration):
+        model = Model(configuration)
+        x = default_rng(0).random((5, 28, 28, 1), dtype='float32')
+        built = model.run(x).numpy()
+        confs = repr(model.layer_confs)
+
+        # Resolving the configuration on every call gives the same output
+        resolved = x
+        for name, layer_conf in model.layer_confs.items():
+            resolved = model.handle_layers(resolved, layer_conf, name)
+        self.assertTrue(allclose(built, resolved.numpy(), atol=1e-5))
+
+        # Built layers do not change the configuration and work with other batch sizes
+        self.assertEqual(model.run(x[:2]).shape, (2, 10))
+        self.assertEqual(repr(model.layer_confs), confs)
+
+    def test_dense(self):
+        self.check_same_output(CONFIGURATIONS.joinpath("NN", "mnist_basic.py"))
+
+    def test_conv(self):
+        self.check_same_output(CONFIGURATIONS.joinpath("CONV", "mnist_conv.py"))
@@ -0,0 +1,31 @@
+import unittest
+from numpy.random import default_rng
+from tensorflow import constant, one_hot, nn as tfnn
+
+from third_party.tensorflow.train import loss_functions
+
+class WeightedLoss(unittest.TestCase):
+
+    def setUp(self):
+        rng = default_rng(0)
+        self.prediction = tfnn.softmax(constant(rng.normal(size=(16, 10)), dtype='float32'))
+        self.y = one_hot(rng.integers(0, 10, 16), 10)
+        self.weights = constant(rng.random(16) * 2, dtype='float32')
+
+    def test_unit_weights_match_the_loss(self):
+        ones = constant([1.] * 16)
+        for loss_function in (loss_functions.cross_entropy, loss_functions.mean_squared_error):
+            self.assertAlmostEqual(
+                float(loss_functions.weighted_loss(loss_function, self.prediction, self.y, ones)),
+                float(loss_function(self.prediction, self.y)),
+                places=3
+                )
+
+    def test_weighted_sum(self):
+        # Cross entropy is a sum over the batch, the weighted loss is a weighted sum
+        weighted = loss_functions.weighted_loss(loss_functions.cross_entropy, self.prediction, self.y, self.weights)
+        expected = sum(
+            float(w) * float(loss_functions.cross_entropy(self.prediction[i:i+1], self.y[i:i+1]))
+            for i, w in enumerate(self.weights)
+            )
+        self.assertAlmostEqual(float(weighted), expected, places=3)
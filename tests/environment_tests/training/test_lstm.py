@@ -0,0 +1,51 @@
+import unittest
+from pathlib import Path
+from copy import deepcopy
+from numpy import allclose
+from numpy.random import default_rng
+from tensorflow import constant, one_hot, reshape, transpose, keras as tfkeras, optimizers as tfoptimizers
+
+from models.NeuralNetworks.model import Model
+from third_party.tensorflow.train import optimization, loss_functions
+
+class FusedLSTM(unittest.TestCase):
+
+    def setUp(self):
+        self.model = Model(Path("models", "NeuralNetworks", "configurations", "Classifier", "mnist", "RNN", "mnist_LSTM_manual.py"))
+        self.model.c = deepcopy(self.model.c)
+        self.x = constant(default_rng(0).random((6, 28, 28, 1), dtype='float32'))
+
+    def keras_lstm(self, layer, units, x, return_sequences=False):
+        # Keras LSTM with the same weights
+        lstm = tfkeras.layers.LSTM(units, return_sequences=return_sequences)
+        lstm(x)
+        w = self.model.weights['_LSTM_0'][1][layer]
+        b = self.model.bias['_LSTM_0'][1][layer]
+        lstm.set_weights([w['ih'].numpy(), w['hh'].numpy(), b['b'].numpy()])
+        return lstm(x)
+
+    def test_same_as_keras(self):
+        conf = self.model.c['layers']['LSTM']
+        conf['units'] = [32, 16]
+        conf['stack'] = True
+        self.model.c['layers']['Dense']['weights'] = [16 * 28, 10]
+        self.assertEqual(self.model.run(self.x).shape, (6, 10))
+
+        # Stacked layers, inputs are read along the width
+        sequence = reshape(transpose(self.x, [0, 2, 1, 3]), [6, 28, 28])
+        expected = self.keras_lstm(1, 16, self.keras_lstm(0, 32, sequence, True), True)
+        outputs = self.x
+        # Sequence input, two LSTM layers and the sequence output
+        for function in self.model.layer_functions[:4]:
+            outputs = function(outputs)
+        # Stacked outputs are (batch, units, sequence)
+        self.assertTrue(allclose(transpose(outputs, [0, 2, 1]).numpy(), expected.numpy(), atol=1e-5))
+
+    def test_training(self):
+        self.model.c['layers']['LSTM']['units'] = [32]
+        self.model.c['layers']['Dense']['weights'] = [32, 10]
+        self.model.run(self.x)
+        before = self.model.weights['_LSTM_0'][1][0]['hh'].numpy()
+        y = one_hot(default_rng(1).integers(0, 10, 6), 10)
+        optimization.classifier(self.model, self.x, y, loss_functions.cross_entropy, tfoptimizers.Adam(0.01))
+        self.assertTrue((self.model.weights['_LSTM_0'][1][0]['hh'].numpy() != before).any())
@@ -0,0 +1,51 @@
+import unittest
+from pathlib import Path
+from copy import deepcopy
+from numpy.random import default_rng
+from tensorflow import constant, one_hot, optimizers as tfoptimizers
+
+from models.NeuralNetworks.model import Model
+from third_party.tensorflow.train import optimization, loss_functions
+from third_party.tensorflow.train.mixed_precision import LossScale
+
+class MixedPrecision(unittest.TestCase):
+
+    def setUp(self):
+        self.model = Model(Path("models", "NeuralNetworks", "configurations", "Classifier", "mnist", "NN", "mnist_basic.py"))
+        self.model.c = deepcopy(self.model.c)
+        self.model.c['mixed_precision'] = {'compute_dtype': 'bfloat16'}
+        # Last layer computes in float32
+        self.model.c['layers']['Dense']['compute_dtype'] = ['bfloat16', 'bfloat16', 'float32']
+        self.x = constant(default_rng(0).random((8, 28, 28, 1), dtype='float32'))
+
+    def test_compute_dtypes(self):
+        self.assertEqual(self.model.run(self.x).dtype.name, 'float32')
+
+        # Layer functions after the flattening
+        x = self.model.layer_functions[0](self.x)
+        dtypes = []
+        for function in self.model.layer_functions[1:]:
+            x = function(x)
+            dtypes.append(x.dtype.name)
+        self.assertEqual(dtypes, ['bfloat16', 'bfloat16', 'float32'])
+
+    def test_float32_weights_are_trained(self):
+        self.model.loss_scale = LossScale('dynamic', initial_scale=2.**10)
+        self.model.run(self.x)
+        weights = [w.numpy() for w in self.model.weights['_Dense_0'][1]]
+
+        y = one_hot(default_rng(1).integers(0, 10, 8), 10)
+        optimization.classifier(self.model, self.x, y, loss_functions.cross_entropy, tfoptimizers.Adam(0.01))
+        for old, w in zip(weights, self.model.weights['_Dense_0'][1]):
+            self.assertEqual(w.dtype.name, 'float32')
+            self.assertTrue((w.numpy() != old).any())
+
+    def test_dynamic_loss_scale(self):
+        scale = LossScale('dynamic', initial_scale=8., growth_interval=2)
+        self.assertFalse(bool(scale.update([constant([1., float('inf')])]).numpy()))
+        self.assertEqual(float(scale.scale.numpy()), 4.)
+
+        finite = [constant([1., 2.])]
+        scale.update(finite)
+        scale.update(finite)
+        self.assertEqual(float(scale.scale.numpy()), 8.)
@@ -0,0 +1,70 @@
+import unittest
+from copy import deepcopy
+from pathlib import Path
+from numpy.random import default_rng
+from tensorflow import optimizers as tfoptimizers, keras as tfkeras
+from tensorflow.data import Dataset as tfDataset
+
+from models.NeuralNetworks.model import Model
+from third_party.tensorflow.train import optimization, loss_functions
+from third_party.tensorflow.train.training_functions import train_step_function, parse_sample
+from third_party.tensorflow.train.validation import validation_pipeline, validation_step_function, evaluate
+
+class CompiledTrainingStep(unittest.TestCase):
+
+    def setUp(self):
+        rng = default_rng(0)
+        x = rng.random((70, 28, 28, 1), dtype='float32')
+        y = rng.integers(0, 10, 70).astype('int32')
+        self.dataset = tfDataset.from_tensor_slices((x, y))
+        self.model = Model(Path("models", "NeuralNetworks", "configurations", "Classifier", "mnist", "NN", "mnist_basic.py"))
+        self.metrics = (tfkeras.metrics.Mean(), tfkeras.metrics.Accuracy())
+        self.optimizer = tfoptimizers.Adam(0.001)
+
+    def step(self, compile, element_spec=None):
+        return train_step_function(
+                    self.model, 
+                    loss_functions.cross_entropy, 
+                    optimization.classifier, 
+                    self.optimizer, 
+                    [10], 
+                    True, 
+                    False, 
+                    self.metrics, 
+                    compile,
+                    element_spec=element_spec
+                    )
+
+    def test_compiled_step(self):
+        batched = self.dataset.batch(32)
+        batches = iter(batched)
+        # Weights are created eagerly
+        self.step(False)(next(batches))
+        weights = [w.numpy() for w in self.model.trainable_vars]
+
+        compiled = self.step(True, batched.element_spec)
+        # The last smaller batch uses the same trace
+        for batch in batches:
+            compiled(batch)
+        self.assertEqual(compiled.experimental_get_tracing_count(), 1)
+        self.assertTrue(any((w.numpy() != old).any() for w, old in zip(self.model.trainable_vars, weights)))
+        # Metrics are accumulated over all the steps
+        self.assertEqual(int(self.metrics[1].count.numpy()), 70)
+
+    def test_training_loss_is_on_the_validation_scale(self):
+        # Without weight updates and dropout the logged training loss equals the validation loss for any batch size
+        self.model.c = deepcopy(self.model.c)
+        self.model.c['layers']['Dense']['dropouts'] = [None, None, None]
+        self.optimizer = tfoptimizers.SGD(0.)
+        validation = validation_pipeline(self.dataset, 16)
+        validation_metrics = (tfkeras.metrics.Mean(), tfkeras.metrics.Accuracy())
+        validation_step = validation_step_function(
+                    self.model, loss_functions.cross_entropy, lambda b: parse_sample(b, [10], True), False, validation_metrics)
+
+        for batch_size in [7, 70]:
+            self.metrics[0].reset_state()
+            step = self.step(False)
+            for batch in self.dataset.batch(batch_size):
+                step(batch)
+            validation_loss, _ = evaluate(validation, validation_step, validation_metrics)
+            self.assertAlmostEqual(float(self.metrics[0].result().numpy()), validation_loss, places=4)
@@ -0,0 +1,57 @@
+import unittest
+from numpy import arange, eye
+from numpy.random import default_rng
+from tensorflow import Variable, reduce_mean, keras as tfkeras
+from tensorflow.data import Dataset as tfDataset
+
+from third_party.tensorflow.train.validation import validation_pipeline, validation_step_function, evaluate, EarlyStopping
+from third_party.tensorflow.train import loss_functions
+
+class ConstantModel:
+    # Model with one output for every element: the element itself
+    def run(self, x, training=False):
+        return x
+
+class Validation(unittest.TestCase):
+
+    def test_streaming_mean_loss(self):
+        x = arange(10, dtype='float32').reshape((10, 1))
+        # Batches of 4, 4 and 2, the loss is the mean of all the elements
+        dataset = validation_pipeline(tfDataset.from_tensor_slices((x, x)), 4)
+        metrics = (tfkeras.metrics.Mean(), None)
+        loss_function = lambda output, y: reduce_mean(output)
+        for compile in [False, True]:
+            step = validation_step_function(ConstantModel(), loss_function, lambda b: b, False, metrics, compile, dataset.element_spec)
+            loss, accuracy = evaluate(dataset, step, metrics)
+            self.assertAlmostEqual(loss, 4.5, places=5)
+            self.assertIsNone(accuracy)
+
+    def test_loss_does_not_depend_on_batch_size(self):
+        # Cross entropy sums the batch, the validation loss is the mean loss of an element
+        rng = default_rng(0)
+        output = rng.dirichlet([1.] * 5, 50).astype('float32')
+        y = eye(5, dtype='float32')[rng.integers(0, 5, 50)]
+        expected = float(loss_functions.cross_entropy(output, y)) / 50
+
+        for batch_size in [7, 50]:
+            dataset = validation_pipeline(tfDataset.from_tensor_slices((output, y)), batch_size)
+            metrics = (tfkeras.metrics.Mean(), tfkeras.metrics.Accuracy())
+            step = validation_step_function(ConstantModel(), loss_functions.cross_entropy, lambda b: b, False, metrics)
+            loss, _ = evaluate(dataset, step, metrics)
+            self.assertAlmostEqual(loss, expected, places=4)
+
+    def test_early_stopping(self):
+        weight = Variable(0.)
+        stopper = EarlyStopping(patience=2)
+        stops = []
+        for i, loss in enumerate([3., 2., 2.5, 2.1, 1.]):
+            weight.assign(float(i))
+            stops.append(stopper.update(loss, [weight]))
+        self.assertEqual(stops, [False, False, False, True, False])
+        # Best weights are restored
+        stopper = EarlyStopping(patience=1)
+        for i, loss in enumerate([2., 1., 3.]):
+            weight.assign(float(i))
+            stopper.update(loss, [weight])
+        stopper.restore([weight])
+        self.assertEqual(float(weight.numpy()), 1.)
@@ -4,10 +4,17 @@ set_printoptions(suppress=True)
 
 def print_description(x):
     desc_x = describe(x)
+    print_statistics(desc_x, isinstance(x[0], ndarr))
+
+def print_statistics(desc_x, by_feature=True):
+    # Prints a description in the format of scipy.stats.describe
+    # In:
+    #   desc_x:                     DescribeResult or data.util.statistics.Description
+    #   by_feature:                 bool, if True values are arrays with a value for every feature
     
-    if isinstance(x[0], ndarr):
+    if by_feature:
     # Loop every "feature" and print its description
-        for i in range(len(x[0])):
+        for i in range(len(desc_x.mean)):
             f = i+1
             print("Feature %d "% f)
             print("Min: ", desc_x.minmax[0][i])
@@ -1,5 +1,5 @@
 from ... import tf
-from ..util import check_dtypes_match
+from ..util import check_dtypes_match, activation_function, compute_cast
 
 # Convolutional
 
@@ -22,7 +22,7 @@ def conv_layer(
     #   x:                          tensorflow Tensor, input data
     #   weight:                     tensorflow Variable, weight
     #   bias:                       tensorflow Variable, bias or None if not used
-    #   activation:                 str, name of the class tf.nn function or None if not used
+    #   activation:                 str, name of the class tf.nn function, function or None if not used
     #   dropout:                    float, value to dropout function or None if not used
     #   training:                   bool
     #   transpose_shape:            tuple, output shape of the transpose layer
@@ -64,10 +64,59 @@ def conv_layer(
         x = tf.nn.max_pool(x, ksize=ksize, strides=strides, padding=padding)
 
     if activation is not None:
-        x = getattr(tf.nn, activation)(x)
+        x = activation_function(activation)(x)
 
     if training and dropout is not None:
         x = getattr(tf.nn, 'dropout')(x, rate=dropout)
     
     return x
 
+
+def reshape_function(shape):
+    # Reshapes inputs to shape, the batch dimension is taken from the input
+    shape = [-1] + list(shape[1:])
+    def layer(x, training=False):
+        return tf.reshape(x, shape)
+    return layer
+
+def conv_function(
+        weight,
+        strides,
+        padding,
+        pooling=None,
+        bias=None,
+        activation=None,
+        batch_norm=None,
+        dropout=None,
+        transpose_shape=(),
+        compute_dtype=None
+        ):
+
+    # Binds the weights, the activation and the options of a convolutional layer
+    # In:
+    #   weight, strides, padding, pooling, bias, activation, batch_norm, dropout: as in conv_layer
+    #   transpose_shape:            list, output shape of the transpose layer,
+    #                               the batch dimension is taken from the input when the layer is called
+    #   compute_dtype:              tf.DType, datatype of the computation, None = datatype of the weights
+    # Out:
+    #   layer:                      function, (x, training) -> layer output
+    
+    activation = activation_function(activation)
+    out_shape = list(transpose_shape[1:]) if transpose_shape else None
+    
+    def layer(x, training=False):
+        shape = [tf.shape(x)[0]] + out_shape if out_shape is not None else ()
+        return conv_layer(
+                    x, 
+                    compute_cast(weight, compute_dtype), 
+                    strides, 
+                    padding, 
+                    pooling, 
+                    compute_cast(bias, compute_dtype), 
+                    activation, 
+                    batch_norm, 
+                    dropout, 
+                    training, 
+                    shape
+                    )
+    return layer
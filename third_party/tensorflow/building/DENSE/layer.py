@@ -1,5 +1,5 @@
 from ... import tf
-from ..util import check_dtypes_match
+from ..util import check_dtypes_match, activation_function, compute_cast
 
 # Dense layer
 
@@ -9,7 +9,7 @@ def dense_layer(x, weight, bias=None, activation=None, dropout=None, training=Fa
     #   x:                          tensorflow Tensor, input data
     #   weight:                     tensorflow Variable, weight
     #   bias:                       tensorflow Variable, bias or None if not used
-    #   activation:                 str, name of the class tf.nn function or None if not used
+    #   activation:                 str, name of the class tf.nn function, function or None if not used
     #   dropout:                    float, value to dropout function or None if not used
     #   training:                   bool
     # Out:
@@ -28,10 +28,38 @@ def dense_layer(x, weight, bias=None, activation=None, dropout=None, training=Fa
         x = tf.matmul(x, weight)
     
     if activation is not None:
-        x = getattr(tf.nn, activation)(x)
+        x = activation_function(activation)(x)
 
     if training and dropout is not None:
         x = getattr(tf.nn, 'dropout')(x, rate=dropout)
     
     return x
 
+
+def flatten_function(features):
+    # Flattens inputs to (batch, features)
+    def layer(x, training=False):
+        return tf.reshape(x, (-1, features))
+    return layer
+
+def dense_function(weight, bias=None, activation=None, dropout=None, transpose=False, compute_dtype=None):
+    # Binds the weights, the activation and the dropout of a dense layer
+    # In:
+    #   weight, bias, activation, dropout, transpose: as in dense_layer
+    #   compute_dtype:              tf.DType, datatype of the computation, None = datatype of the weights
+    # Out:
+    #   layer:                      function, (x, training) -> layer output
+    
+    activation = activation_function(activation)
+    
+    def layer(x, training=False):
+        return dense_layer(
+                    x, 
+                    compute_cast(weight, compute_dtype), 
+                    compute_cast(bias, compute_dtype), 
+                    activation, 
+                    dropout, 
+                    training, 
+                    transpose
+                    )
+    return layer
@@ -1,5 +1,5 @@
 from ... import tf
-from ..util import check_dtypes_match
+from ..util import check_dtypes_match, compute_cast
 
 # Recurrent cells
 
@@ -64,7 +64,7 @@ def optimized_LSTM_cell(new_input, output_state, weights, biases, transpose=Fals
             tf.matmul(last_output, weights['hh'])
             )
     
-    if 'b' in biases.keys():
+    if biases is not None:
         all_gates = tf.add(all_gates, biases['b'])
 
     input_gate, forget_gate, update_gate, output_gate = tf.split(all_gates, 4, 1)
@@ -89,3 +89,82 @@ def symmetric_LSTM_cell(new_input, last_output, weights, biases, transpose=False
 
     return (cell_output, cell_state)
 
+
+# Fused LSTM
+# Sequences are handled time major (sequence, batch, features)
+# The input projection of all the timesteps is computed with one matmul before the recurrence,
+# only the recurrent matmul is done inside the loop over the timesteps
+# Weights are the 'optimized' cell weights, gates are in the order input, forget, update, output
+
+def sequence_input_function():
+    # Converts LSTM inputs to time major sequences
+    # 4D inputs (batch, height, width, channels) are read along the width: (width, batch, height * channels)
+    # 3D inputs (batch, features, sequence): (sequence, batch, features)
+    def layer(x, training=False):
+        if len(x.shape) == 4:
+            x = tf.transpose(x, [2, 0, 1, 3])
+            return tf.reshape(x, [tf.shape(x)[0], tf.shape(x)[1], x.shape[2] * x.shape[3]])
+        return tf.transpose(x, [2, 0, 1])
+    return layer
+
+def sequence_output_function(stack=False):
+    # Converts time major LSTM outputs to the layer output
+    # stack = True: all the outputs (batch, units, sequence) (the 3D input layout of the next LSTM)
+    # stack = False: the output of the last timestep (batch, units)
+    def layer(x, training=False):
+        if stack:
+            return tf.transpose(x, [1, 2, 0])
+        return x[-1]
+    return layer
+
+def lstm_function(weight, bias=None, parallel_iterations=32, compute_dtype=None):
+    # Binds the weights of a fused LSTM layer
+    # In:
+    #   weight:                     dict, 'ih' input weights (features, 4 * units) and 'hh' recurrent weights (units, 4 * units)
+    #   bias:                       dict, 'b' bias (4 * units) or None if not used
+    #   parallel_iterations:        int, parallel_iterations of the while loop
+    #   compute_dtype:              tf.DType, datatype of the computation, None = datatype of the weights
+    # Out:
+    #   layer:                      function, (x, training) -> all the outputs, time major (sequence, batch, units)
+
+    def recurrence(x):
+        w_ih = compute_cast(weight['ih'], compute_dtype)
+        w_hh = compute_cast(weight['hh'], compute_dtype)
+        x = check_dtypes_match(x, w_ih)
+        steps, batch, units = tf.shape(x)[0], tf.shape(x)[1], w_hh.shape[0]
+
+        # Input projection of all the timesteps
+        projection = tf.matmul(tf.reshape(x, [-1, x.shape[2]]), w_ih)
+        if bias is not None:
+            projection = tf.add(projection, compute_cast(bias['b'], compute_dtype))
+        projection = tf.reshape(projection, [steps, batch, 4 * units])
+
+        def step(state, projected):
+            last_output, last_state = state
+            input_gate, forget_gate, update_gate, output_gate = tf.split(projected + tf.matmul(last_output, w_hh), 4, 1)
+            cell_state = tf.sigmoid(forget_gate) * last_state + tf.sigmoid(input_gate) * tf.tanh(update_gate)
+            cell_output = tf.sigmoid(output_gate) * tf.tanh(cell_state)
+            return (cell_output, cell_state)
+
+        # Timesteps are read from a TensorArray, its gradient does not create a full size tensor for every timestep
+        projection = tf.TensorArray(projection.dtype, size=steps).unstack(projection)
+
+        def loop(timestep, last_output, last_state, outputs):
+            output, state = step((last_output, last_state), projection.read(timestep))
+            return (timestep + 1, output, state, outputs.write(timestep, output))
+
+        zeros = tf.zeros([batch, units], dtype=w_hh.dtype)
+        _, _, _, outputs = tf.while_loop(
+                                lambda timestep, *_: timestep < steps,
+                                loop,
+                                (0, zeros, zeros, tf.TensorArray(w_hh.dtype, size=steps)),
+                                parallel_iterations=parallel_iterations
+                                )
+        return outputs.stack()
+
+    # The recurrence is traced so the loop runs as a graph also when the model is run eagerly
+    recurrence = tf.function(recurrence, reduce_retracing=True)
+
+    def layer(x, training=False):
+        return recurrence(x)
+    return layer
@@ -1,10 +1,10 @@
-from .DENSE.layer import dense_layer
+from .DENSE.layer import dense_layer, dense_function, flatten_function
 from .DENSE.builder import initialize_dense_layer
 
-from .CONV.layer import conv_layer
+from .CONV.layer import conv_layer, conv_function, reshape_function
 from .CONV.builder import initialize_conv_layer
 
-from .LSTM.layer import Naive_LSTM_cell, optimized_LSTM_cell, symmetric_LSTM_cell
+from .LSTM.layer import Naive_LSTM_cell, optimized_LSTM_cell, symmetric_LSTM_cell, lstm_function, sequence_input_function, sequence_output_function
 from .LSTM.builder import initialize_LSTM_layer
 
 from .. import tf, npprod
@@ -63,7 +63,7 @@ class Layer_Handler:
             original_shape = get_numpy_shape(x)
             flatted_shape = npprod(x.shape[1:])
             # Flat input if needed
-            x = tf.reshape(x, (x.shape[0], flatted_shape))
+            x = tf.reshape(x, (-1, flatted_shape))
             # Add flatted layer to weights
             self.original = original_shape
             self.out_dense = flatted_shape
@@ -100,6 +100,161 @@ class Layer_Handler:
         
         return out_shape
 
+    def conv_transpose_shape(self, conf, transpose, layer, w_num):
+        # Output shape of a transposed convolutional layer, False if the layer is not transposed
+        if not transpose:
+            return False
+        
+        if 'transpose' in list(conf.keys()):
+            if isinstance(conf['transpose'], str):
+                return self.handle_transpose_shape_fetch(layer, conf['transpose'], w_num)
+            else: # isinstance(transpose, bool):
+                return self.original
+        else:
+            print("In convolutional transpose layers you must have 'transpose' key and its value is the layer name of which is to be transposed...")
+            exit()
+
+    def compute_dtypes(self, conf, layers, compute_dtype=None):
+        # Datatypes of the computation of every layer in a layer configuration
+        # The configuration 'compute_dtype' (one name or a list with a name for every layer) overrides the models compute_dtype
+        # In:
+        #   conf:                       dict, configuration
+        #   layers:                     int, number of layers in the configuration
+        #   compute_dtype:              str, models compute datatype or None
+        # Out:
+        #   dtypes:                     list, tf.DType or None (= datatype of the weights) for every layer
+        
+        dtypes = conf.get('compute_dtype', compute_dtype)
+        if not isinstance(dtypes, list):
+            dtypes = [dtypes] * layers
+        
+        return [tf.as_dtype(dtype) if dtype is not None else None for dtype in dtypes]
+
+    def build(self, layer_type, x, weights, bias, conf, layer_name, input_dtype, compute_dtype=None):
+        # Resolves a layer configuration into layer functions
+        # Weights are created, the configuration is completed and the shapes are recorded here once,
+        # the returned functions only do the tensor operations
+        # In:
+        #   layer_type:                 str, name of the layer method (Dense, Convo, LSTM)
+        #   x:                          Tensor, example input
+        #   weights, bias, conf, layer_name, input_dtype: as in the layer methods
+        #   compute_dtype:              str, datatype of the computation (mixed precision), None = datatype of the weights
+        # Out:
+        #   x:                          Tensor, output of the example input
+        #   functions:                  list, functions (x, training) -> x in the order they are called
+        
+        if hasattr(self, 'build_'+layer_type):
+            return getattr(self, 'build_'+layer_type)(x, weights, bias, conf, layer_name, input_dtype, compute_dtype)
+        elif layer_type in dir(self):
+            return self.build_layer_method(layer_type, x, weights, bias, conf, layer_name, input_dtype)
+        else:
+            print("Layer type: ", layer_type, " was not found...")
+            exit()
+
+    def build_layer_method(self, layer_type, x, weights, bias, conf, layer_name, input_dtype):
+        # Layers without a build step are run through their layer method
+        layer_method = getattr(self, layer_type)
+        def layer(x, training=False):
+            x = layer_method(x, weights, bias, conf, layer_name, input_dtype, training)
+            return x[0] if isinstance(x, tuple) else x
+        return (layer(x), [layer])
+
+    def build_Dense(self, x, weights, bias, conf, layer_name, input_dtype, compute_dtype=None):
+        # Builds the functions of a dense layer, see Dense
+        self.init_shapes(layer_name)
+        transpose = self.check_transpose(conf)
+        x, original_shape, flatted_shape = self.handle_dense_input_shape(x, conf)
+        weights, bias = initialize_dense_layer(layer_name, input_dtype, conf, weights, bias, transpose)
+
+        functions = []
+        if original_shape is not None:
+            functions.append(flatten_function(int(flatted_shape)))
+        
+        ws = weights[layer_name][1]
+        bs = bias[layer_name][1]
+        shapes = self.shapes[layer_name]
+        dtypes = self.compute_dtypes(conf, len(ws), compute_dtype)
+        for layer, w in enumerate(ws):
+            function = dense_function(
+                            w, 
+                            bs[layer], 
+                            conf['activations'][layer], 
+                            conf['dropouts'][layer], 
+                            transpose,
+                            dtypes[layer]
+                            )
+            shapes[layer] = {'IN':get_numpy_shape(x)}
+            x = function(x)
+            shapes[layer]['OUT'] = get_numpy_shape(x)
+            functions.append(function)
+
+        return (x, functions)
+
+    def build_Convo(self, x, weights, bias, conf, layer_name, input_dtype, compute_dtype=None):
+        # Builds the functions of a convolutional layer, see Convo
+        transpose = self.check_transpose(conf)
+        
+        functions = []
+        if len(x.shape) < 4 and hasattr(self, 'original'):
+            functions.append(reshape_function(self.original))
+            x = functions[-1](x)
+        
+        weights, bias = initialize_conv_layer(layer_name, input_dtype, conf, weights, bias, transpose)
+        self.init_shapes(layer_name)
+        
+        ws = weights[layer_name][1]
+        bs = bias[layer_name][1]
+        shapes = self.shapes[layer_name]
+        dtypes = self.compute_dtypes(conf, len(ws), compute_dtype)
+        for layer, w in enumerate(ws):
+            function = conv_function(
+                            w,
+                            conf['strides'][layer],
+                            conf['paddings'][layer],
+                            conf['poolings'][layer],
+                            bs[layer],
+                            conf['activations'][layer], 
+                            conf['batch_norms'][layer],
+                            conf['dropouts'][layer], 
+                            self.conv_transpose_shape(conf, transpose, layer, len(ws)),
+                            dtypes[layer]
+                            )
+            shapes[layer] = {'IN':get_numpy_shape(x)}
+            x = function(x)
+            shapes[layer]['OUT'] = get_numpy_shape(x)
+            functions.append(function)
+
+        return (x, functions)
+
+    def build_LSTM(self, x, weights, bias, conf, layer_name, input_dtype, compute_dtype=None):
+        # Builds the functions of a fused LSTM layer, see lstm_function
+        # Stacked layers ('units' list) read the outputs of the previous layer
+        # Only the 'optimized' cell has a fused kernel, other cells and transposed layers are run through LSTM
+        if conf['cell'] != 'optimized' or self.check_transpose(conf):
+            return self.build_layer_method('LSTM', x, weights, bias, conf, layer_name, input_dtype)
+
+        weights, bias = initialize_LSTM_layer(layer_name, input_dtype, conf, weights, bias, False)
+        self.init_shapes(layer_name)
+
+        functions = [sequence_input_function()]
+        x = functions[0](x)
+        
+        ws = weights[layer_name][1]
+        bs = bias[layer_name][1]
+        shapes = self.shapes[layer_name]
+        dtypes = self.compute_dtypes(conf, len(ws), compute_dtype)
+        for layer, w in enumerate(ws):
+            function = lstm_function(w, bs[layer], conf.get('parallel_iters', 32), dtypes[layer])
+            shapes[layer] = {'IN':get_numpy_shape(x)}
+            x = function(x)
+            shapes[layer]['OUT'] = get_numpy_shape(x)
+            functions.append(function)
+
+        functions.append(sequence_output_function(conf['stack']))
+        x = functions[-1](x)
+
+        return (x, functions)
+
     def Dense(  self,
                 x, 
                 weights, 
@@ -204,22 +359,7 @@ class Layer_Handler:
             else:
                 shapes[layer]['IN'] = get_numpy_shape(x)
             
-            if transpose:
-                if 'transpose' in list(conf.keys()):
-                    if isinstance(conf['transpose'], str):
-                        out_shape = self.handle_transpose_shape_fetch(
-                                            layer, 
-                                            conf['transpose'], 
-                                            len(ws)
-                                            )
-                    else: # isinstance(transpose, bool):
-                        out_shape = self.original
-
-                else:
-                    print("In convolutional transpose layers you must have 'transpose' key and its value is the layer name of which is to be transposed...")
-                    exit()
-            else:
-                out_shape = False
+            out_shape = self.conv_transpose_shape(conf, transpose, layer, len(ws))
             
             x = conv_layer(
                         x, 
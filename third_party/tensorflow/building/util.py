@@ -6,6 +6,24 @@ def check_dtypes_match(x, weight):
         x = tf.cast(x, weight.dtype)
     return x
 
+def activation_function(activation):
+    # Resolves the name of an activation function in tf.nn once
+    # In:
+    #   activation:                 str, name of the class tf.nn function, function or None
+    # Out:
+    #   return:                     function or None
+    
+    if activation is None or callable(activation):
+        return activation
+    return getattr(tf.nn, activation)
+
+def compute_cast(variable, compute_dtype=None):
+    # Casts a variable to the compute datatype, the variable itself stays in its own datatype (master weights)
+    # Gradients flow through the cast back to the variable
+    if variable is None or compute_dtype is None or variable.dtype == compute_dtype:
+        return variable
+    return tf.cast(variable, compute_dtype)
+
 # Weight creation
 
 def create_weights(inp, init_function='RandomNormal', dtype=tf.float32):
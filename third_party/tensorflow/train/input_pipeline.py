@@ -0,0 +1,182 @@
+from .. import tf
+from pathlib import Path
+from time import perf_counter
+
+# Training input pipeline
+# The pipeline is built from the 'pipeline' section of a model configuration, for example:
+#   'pipeline':{
+#       'map':'normalize_image',    # name from MAP_FUNCTIONS, None = no map
+#       'cache':'memory',           # 'memory', a file path or None
+#       'shuffle':10000,            # shuffle buffer size, None = no shuffling
+#       'prefetch':'auto',          # batches prefetched, 'auto' = AUTOTUNE, None = no prefetching
+#       'timing':True               # print per stage timings before the training
+#       }
+# Stages are applied in the order map, cache, shuffle, batch, prefetch
+# Map is done before cache so the mapped elements are cached, map functions must be deterministic
+
+AUTOTUNE = tf.data.experimental.AUTOTUNE
+
+DEFAULT_PIPELINE = {
+    'map': None,
+    'parallel_calls': 'auto',
+    'deterministic': True,
+    'cache': None,
+    'shuffle': None,
+    'reshuffle': True,
+    'seed': None,
+    'drop_remainder': False,
+    'prefetch': 'auto',
+    'timing': False,
+    'timing_steps': 50
+    }
+
+# Map functions take all the components of an element (data, label and sample weight)
+# and return them in the same order
+MAP_FUNCTIONS = {
+    'normalize_image': lambda x, *rest: (tf.cast(x, tf.float32) / 255., *rest),
+    'cast_float32': lambda x, *rest: (tf.cast(x, tf.float32), *rest),
+    'flatten': lambda x, *rest: (tf.reshape(x, [-1]), *rest)
+    }
+
+def pipeline_config(config=None):
+    # Fills the missing pipeline parameters with defaults
+    # In:
+    #   config:                     dict, 'pipeline' section of a configuration or None
+    # Out:
+    #   config:                     dict, all pipeline parameters
+
+    config = dict(DEFAULT_PIPELINE, **(config or {}))
+    unknown = set(config.keys()) - set(DEFAULT_PIPELINE.keys())
+    if unknown:
+        print("Unknown pipeline parameters: ", sorted(unknown), " available are: ", list(DEFAULT_PIPELINE.keys()))
+        exit()
+    if config['map'] is not None and config['map'] not in MAP_FUNCTIONS:
+        print("Pipeline map function ", config['map'], " was not found, available are: ", list(MAP_FUNCTIONS.keys()))
+        exit()
+
+    return config
+
+def autotune(value):
+    return AUTOTUNE if value == 'auto' else value
+
+def map_dataset(dataset, config):
+    # Applies the configured map function in parallel
+    # Also used for the validation split so that both splits get the same inputs
+    if config['map'] is None:
+        return dataset
+
+    function = MAP_FUNCTIONS[config['map']]
+    # Elements which are not tuples are given as one component
+    if isinstance(dataset.element_spec, tuple):
+        map_function = function
+    else:
+        map_function = lambda x: function(x)[0]
+
+    return dataset.map(
+                map_function,
+                num_parallel_calls=autotune(config['parallel_calls']),
+                deterministic=config['deterministic']
+                )
+
+def cache_dataset(dataset, cache):
+    # Caches the elements in memory or in a file after the first epoch
+    if cache is None:
+        return dataset
+    if cache == 'memory':
+        return dataset.cache()
+
+    path = Path(cache)
+    if not path.parent.exists():
+        path.parent.mkdir(parents=True)
+    return dataset.cache(str(path))
+
+def pipeline_stages(config, batch_size):
+    # Lists the stages of the pipeline
+    # In:
+    #   config:                     dict, pipeline parameters from pipeline_config
+    #   batch_size:                 int, elements in a batch, 0 = one element batches
+    # Out:
+    #   stages:                     list, (stage name, function from a dataset to a dataset) tuples in order
+
+    stages = []
+    if config['map'] is not None:
+        stages.append(('map', lambda ds: map_dataset(ds, config)))
+    if config['cache'] is not None:
+        stages.append(('cache', lambda ds: cache_dataset(ds, config['cache'])))
+    if config['shuffle']:
+        stages.append(('shuffle', lambda ds: ds.shuffle(
+                                                config['shuffle'],
+                                                seed=config['seed'],
+                                                reshuffle_each_iteration=config['reshuffle']
+                                                )))
+    stages.append(('batch', lambda ds: ds.batch(batch_size or 1, drop_remainder=config['drop_remainder'])))
+    if config['prefetch'] is not None:
+        stages.append(('prefetch', lambda ds: ds.prefetch(autotune(config['prefetch']))))
+
+    return stages
+
+def build_pipeline(dataset, config=None, batch_size=1):
+    # Builds the training input pipeline
+    # In:
+    #   dataset:                    Tensorflow Dataset object, unbatched elements
+    #   config:                     dict, 'pipeline' section of a configuration or None
+    #   batch_size:                 int, elements in a batch, 0 = one element batches
+    # Out:
+    #   dataset:                    Tensorflow Dataset object, batched elements
+
+    config = pipeline_config(config)
+    for _, stage in pipeline_stages(config, batch_size):
+        dataset = stage(dataset)
+
+    return dataset
+
+def time_batches(dataset, steps):
+    # Reads batches and returns the seconds per batch
+    # The first batch is left out, it includes the pipeline start up
+    iterator = iter(dataset)
+    next(iterator, None)
+    start = perf_counter()
+    n = 0
+    for _ in range(steps):
+        if next(iterator, None) is None:
+            break
+        n += 1
+
+    return (perf_counter() - start) / max(n, 1)
+
+def pipeline_timings(dataset, config=None, batch_size=1, steps=None):
+    # Measures how much every stage adds to the time of reading a batch
+    # The pipeline is built one stage at a time and every partial pipeline is read for a number of batches,
+    # stages before batching are read with a batch added so the times are comparable
+    # A file cache is measured as a memory cache so that no cache files are written
+    # In:
+    #   dataset:                    Tensorflow Dataset object, unbatched elements
+    #   config:                     dict, 'pipeline' section of a configuration or None
+    #   batch_size:                 int, elements in a batch
+    #   steps:                      int, batches read per stage, None = 'timing_steps' from the config
+    # Out:
+    #   timings:                    dict, key = stage name, value = change in seconds per batch after the stage is added
+    #                               'source' is the time to read and batch the unchanged dataset
+
+    config = pipeline_config(config)
+    config['cache'] = 'memory' if config['cache'] is not None else None
+    steps = steps or config['timing_steps']
+    batch = lambda ds: ds.batch(batch_size or 1)
+
+    timings = {}
+    previous = time_batches(batch(dataset), steps)
+    timings['source'] = previous
+    batched = False
+    for name, stage in pipeline_stages(config, batch_size):
+        dataset = stage(dataset)
+        batched = batched or name == 'batch'
+        seconds = time_batches(dataset if batched else batch(dataset), steps)
+        timings[name] = seconds - previous
+        previous = seconds
+
+    return timings
+
+def print_timings(timings):
+    print("Input pipeline, milliseconds per batch:")
+    for name, seconds in timings.items():
+        print("    ", name, ": ", round(seconds * 1000, 3))
@@ -7,22 +7,69 @@ def check_dtypes_match(x, weight):
     return x
 
 def mean_squared_error(reconstructed_data, original_data):
-    original_data = check_dtypes_match(original_data, reconstructed_data)
-    return tf.reduce_mean(tf.pow(original_data - reconstructed_data, 2))
+    return tf.reduce_mean(squared_error_samples(reconstructed_data, original_data))
 
 def cross_entropy(prediction, true_label):
-    true_label = check_dtypes_match(true_label, prediction)
-    prediction = tf.clip_by_value(prediction, 1e-9, 1.)
-    return tf.reduce_mean(-tf.reduce_sum(true_label * tf.math.log(prediction)))
+    return tf.reduce_sum(cross_entropy_samples(prediction, true_label))
 
 def cross_entropy_w_sigmoid(prediction, true_label):
-    true_label = check_dtypes_match(true_label, prediction)
-    prediction = tf.nn.softmax(prediction)
-    return tf.reduce_mean(-tf.reduce_sum(true_label * tf.math.log(prediction)))
+    return tf.reduce_sum(cross_entropy_w_sigmoid_samples(prediction, true_label))
 
 def keras_sparse_categorical_cross(prediction, true_label):
     true_label = check_dtypes_match(true_label, prediction)
     return tf.keras.losses.sparse_categorical_crossentropy(true_label, prediction, from_logits=True)
 
 def kl_divergence(prediction, target):
-    return tf.reduce_mean(tf.reduce_sum(target*tf.math.log(target/(prediction)), axis=1))
+    return tf.reduce_mean(kl_divergence_samples(prediction, target))
+
+# Losses of every sample, the loss functions above reduce these over the batch
+
+def squared_error_samples(reconstructed_data, original_data):
+    original_data = check_dtypes_match(original_data, reconstructed_data)
+    squared = tf.pow(original_data - reconstructed_data, 2)
+    return tf.reduce_mean(tf.reshape(squared, [tf.shape(squared)[0], -1]), axis=1)
+
+def cross_entropy_samples(prediction, true_label):
+    true_label = check_dtypes_match(true_label, prediction)
+    prediction = tf.clip_by_value(prediction, 1e-9, 1.)
+    return -tf.reduce_sum(true_label * tf.math.log(prediction), axis=-1)
+
+def cross_entropy_w_sigmoid_samples(prediction, true_label):
+    true_label = check_dtypes_match(true_label, prediction)
+    prediction = tf.nn.softmax(prediction)
+    return -tf.reduce_sum(true_label * tf.math.log(prediction), axis=-1)
+
+def kl_divergence_samples(prediction, target):
+    return tf.reduce_sum(target*tf.math.log(target/(prediction)), axis=1)
+
+# Loss function: (loss of every sample, reduction of the batch)
+SAMPLE_LOSSES = {
+    mean_squared_error: (squared_error_samples, tf.reduce_mean),
+    cross_entropy: (cross_entropy_samples, tf.reduce_sum),
+    cross_entropy_w_sigmoid: (cross_entropy_w_sigmoid_samples, tf.reduce_sum),
+    keras_sparse_categorical_cross: (keras_sparse_categorical_cross, tf.reduce_sum),
+    kl_divergence: (kl_divergence_samples, tf.reduce_mean)
+    }
+
+def sample_losses(loss_function):
+    # Returns the per sample loss function and the batch reduction of a loss function
+    if loss_function not in SAMPLE_LOSSES:
+        print("Loss function ", loss_function.__name__, " has no per sample losses, available are: ", [f.__name__ for f in SAMPLE_LOSSES])
+        exit()
+    return SAMPLE_LOSSES[loss_function]
+
+def element_loss(loss_function, loss, batch_size):
+    # Batch loss as the mean loss of an element, the scale of the logged training and validation losses
+    # Out:
+    #   loss:                       Tensor, batch sums are divided by the batch size
+    if loss_function in SAMPLE_LOSSES and SAMPLE_LOSSES[loss_function][1] is tf.reduce_sum:
+        return tf.reduce_sum(loss) / tf.cast(batch_size, loss.dtype)
+    return loss
+
+def weighted_loss(loss_function, prediction, true_label, weights):
+    # Weights the loss of every sample, for example with class weights
+    # The weighted sample losses are reduced like the loss function reduces the batch (sum or mean)
+    # so the scale of the loss and the gradients does not change with the weights
+    samples, reduce = sample_losses(loss_function)
+    losses = samples(prediction, true_label)
+    return reduce(tf.cast(weights, losses.dtype) * losses)
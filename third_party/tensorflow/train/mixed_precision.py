@@ -0,0 +1,63 @@
+from .. import tf
+
+# Mixed precision
+# Weights are stored in the configurations 'data_type' (float32 master weights) and the layers compute in
+# 'compute_dtype' (for example bfloat16), the weights are cast when a layer is called so the gradients
+# update the float32 weights. Model outputs are cast back to 'data_type' so the loss is computed in float32
+# The 'mixed_precision' section of a configuration:
+#   compute_dtype:              str, datatype of the computation, None = 'data_type'
+#                               layer configurations can override it with their own 'compute_dtype'
+#                               (one name or a list with a name for every layer)
+#   loss_scale:                 None, float or 'dynamic', the loss is multiplied with the scale before the gradients
+#                               are computed so that small float16 gradients do not underflow, bfloat16 does not need it
+
+DEFAULT_MIXED_PRECISION = {
+    'compute_dtype': None,
+    'loss_scale': None
+    }
+
+def mixed_precision_config(config=None):
+    # Fills the missing mixed precision parameters with defaults
+    config = dict(DEFAULT_MIXED_PRECISION, **(config or {}))
+    unknown = set(config.keys()) - set(DEFAULT_MIXED_PRECISION.keys())
+    if unknown:
+        print("Unknown mixed precision parameters: ", sorted(unknown), " available are: ", list(DEFAULT_MIXED_PRECISION.keys()))
+        exit()
+
+    return config
+
+class LossScale:
+    # Static or dynamic loss scale
+    # Dynamic scale is halved when the gradients are not finite (the step is skipped)
+    # and doubled after growth_interval steps with finite gradients
+
+    def __init__(self, scale='dynamic', initial_scale=2.**15, growth_interval=2000):
+        # In:
+        #   scale:                      float or 'dynamic'
+        #   initial_scale:              float, first scale of a dynamic loss scale
+        #   growth_interval:            int, finite steps before a dynamic scale is doubled
+        self.dynamic = scale == 'dynamic'
+        self.growth_interval = growth_interval
+        self.scale = tf.Variable(float(initial_scale if self.dynamic else scale), trainable=False)
+        self.finite_steps = tf.Variable(0, trainable=False)
+
+    def scale_loss(self, loss):
+        return loss * tf.cast(self.scale, loss.dtype)
+
+    def unscale(self, gradients):
+        return [g / tf.cast(self.scale, g.dtype) if g is not None else None for g in gradients]
+
+    def update(self, gradients):
+        # Updates a dynamic scale
+        # In:
+        #   gradients:                  list, unscaled gradients
+        # Out:
+        #   finite:                     bool Tensor, True if all the gradients are finite and can be applied
+
+        finite = tf.reduce_all([tf.reduce_all(tf.math.is_finite(g)) for g in gradients if g is not None])
+        if self.dynamic:
+            grow = tf.logical_and(finite, self.finite_steps + 1 >= self.growth_interval)
+            self.scale.assign(tf.where(finite, tf.where(grow, self.scale * 2., self.scale), self.scale / 2.))
+            self.finite_steps.assign(tf.where(tf.logical_and(finite, tf.logical_not(grow)), self.finite_steps + 1, 0))
+
+        return finite
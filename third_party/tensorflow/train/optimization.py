@@ -1,12 +1,20 @@
 from .. import tf, get_weights
+from .loss_functions import weighted_loss
 
-def classifier(model_object, x, y, loss_function, optimizer, training=True):
+def classifier(model_object, x, y, loss_function, optimizer, training=True, sample_weight=None):
+
+    # Mixed precision models have a LossScale
+    loss_scale = getattr(model_object, 'loss_scale', None)
 
     with tf.GradientTape() as g:
         #Feed input to model
         output = model_object.run(x, training)
         #Calculate loss
-        loss = loss_function(output, y)
+        if sample_weight is None:
+            loss = loss_function(output, y)
+        else:
+            loss = weighted_loss(loss_function, output, y, sample_weight)
+        scaled_loss = loss_scale.scale_loss(loss) if loss_scale is not None else loss
     
     #Get models trainable variables
     if not hasattr(model_object, 'trainable_vars'):
@@ -20,8 +28,17 @@ def classifier(model_object, x, y, loss_function, optimizer, training=True):
                 if layer in bs.keys() and bs[layer][0]:
                     model_object.trainable_vars += get_weights(bs[layer][1])
     
-    gradients = g.gradient(loss, model_object.trainable_vars)
-    if training:
+    gradients = g.gradient(scaled_loss, model_object.trainable_vars)
+    if loss_scale is not None:
+        gradients = loss_scale.unscale(gradients)
+        finite = loss_scale.update(gradients)
+        if training:
+            # Steps with overflowed gradients are skipped
+            def apply():
+                optimizer.apply_gradients(zip(gradients, model_object.trainable_vars))
+                return tf.constant(True)
+            tf.cond(finite, apply, lambda: tf.constant(False))
+    elif training:
         optimizer.apply_gradients(zip(gradients, model_object.trainable_vars))
 
     return (output, loss)
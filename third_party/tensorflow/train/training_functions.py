@@ -1,12 +1,42 @@
 from .. import tf
+from .validation import validation_pipeline, validation_step_function, evaluate, EarlyStopping
+from .loss_functions import element_loss
 from numpy import set_printoptions
 
 # Training handling function
 
+# Parameters of the 'training' section of a model configuration
+#   compile:                    bool, run the training step as a tf.function traced once per input signature
+#   jit_compile:                bool, compile the traced step with XLA
+#   log_every:                  int, steps between printing the loss and accuracy,
+#                               metrics stay on the device between the prints
+#   validate_every:             int or 'epoch', training steps between validations or once at the end of every epoch
+#   validation_batch:           int, validation batch size, None = validation.DEFAULT_VALIDATION_BATCH
+#   early_stopping:             dict or None, parameters of validation.EarlyStopping
+#                               (patience, min_delta, restore_best), None = no early stopping
+DEFAULT_TRAINING = {
+    'compile': False,
+    'jit_compile': False,
+    'log_every': 1,
+    'validate_every': 'epoch',
+    'validation_batch': None,
+    'early_stopping': None
+    }
+
+def training_config(config=None):
+    # Fills the missing training parameters with defaults
+    config = dict(DEFAULT_TRAINING, **(config or {}))
+    unknown = set(config.keys()) - set(DEFAULT_TRAINING.keys())
+    if unknown:
+        print("Unknown training parameters: ", sorted(unknown), " available are: ", list(DEFAULT_TRAINING.keys()))
+        exit()
+
+    return config
+
 def parse_sample(batch, output_shape, onehot=True):
     # Parses tensorflow dataset object sample
     # In:
-    #   batch:                      tensorflow Dataset tensor, contains data - label pairs
+    #   batch:                      tensorflow Dataset tensor, contains data - label pairs (and sample weights)
     #   onehot:                     bool, if true convert labels to one_hot_labels
     # Out:
     #   (x, y)                      tuple, (tensorflow Tensor, tensroflow Tensor)
@@ -16,7 +46,7 @@ def parse_sample(batch, output_shape, onehot=True):
         x = batch['x']
         y = batch['y']
     elif isinstance(batch, tuple):
-        x, y = batch
+        x, y = batch[0], batch[1]
     else:
         print("Batch type not recognized... Check models/utils/util_functions.py parse_sample function")
         exit()
@@ -48,10 +78,69 @@ def parse_sample(batch, output_shape, onehot=True):
     if len(x.shape) == 1:
         x = tf.reshape(x, [-1, x.shape[0]])
     if len(y.shape) == 1:
-        y = tf.reshape(y, [y.shape[0], -1])
+        y = tf.reshape(y, [-1, 1])
     
     return (x, y)
 
+def train_step_function(
+        model, 
+        loss_function, 
+        optimization_function, 
+        optimizer, 
+        output_shape,
+        onehot,
+        autoencoder,
+        metrics,
+        compile=False,
+        jit_compile=False,
+        element_spec=None
+        ):
+
+    # Creates the function running one training step
+    # Loss and accuracy are accumulated into metrics so nothing is copied to the host
+    # In:
+    #   metrics:                    tuple, (loss Mean metric, Accuracy metric or None)
+    #   compile:                    bool, trace the step with tf.function
+    #   jit_compile:                bool, compile the traced step with XLA
+    #   element_spec:               element_spec of the batched dataset, the step is traced once for it
+    #                               (the batch dimension is unknown so the last smaller batch uses the same trace)
+    #                               None = traced again when the batch shape changes
+    # Out:
+    #   step:                       function, takes a batch and returns the batch loss
+    
+    loss_metric, accuracy_metric = metrics
+
+    def step(batch):
+        x, y = parse_sample(batch, output_shape, onehot)
+        if autoencoder:
+            y = x
+        # Class weighted datasets have (data, label, weight) elements
+        weights = batch[2] if isinstance(batch, tuple) and len(batch) == 3 else None
+    
+        output, loss = optimization_function(
+                model, 
+                x, 
+                y, 
+                loss_function, 
+                optimizer, 
+                training=True,
+                sample_weight=weights
+                )
+
+        # Logged loss is the mean loss of an element like the validation loss, the step returns the optimized loss
+        batch_size = tf.shape(x)[0]
+        loss_metric.update_state(element_loss(loss_function, loss, batch_size), sample_weight=tf.cast(batch_size, tf.float32))
+        if accuracy_metric is not None:
+            accuracy_metric.update_state(tf.argmax(y, 1), tf.argmax(output, 1))
+        return loss
+
+    if compile:
+        if element_spec is not None:
+            return tf.function(step, input_signature=[element_spec], jit_compile=jit_compile)
+        return tf.function(step, jit_compile=jit_compile, reduce_retracing=True)
+    
+    return step
+
 def tf_training_loop(
         train, 
         validation,
@@ -63,7 +152,12 @@ def tf_training_loop(
         onehot=False,
         autoencoder=False,
         debug=False,
-        validation_batch=None
+        validation_batch=None,
+        compile=False,
+        jit_compile=False,
+        log_every=1,
+        validate_every='epoch',
+        early_stopping=None
         ):
 
     # The training loop
@@ -75,6 +169,14 @@ def tf_training_loop(
     #   optimization_function:      Optimization function from train_operations/optimization.py
     #   optimizer:                  Tensorflow optimizer object
     #   epoch:                      int, how many times is the model trained with the whole dataset
+    #   compile:                    bool, run the training step as a tf.function, the first step is run eagerly
+    #                               so the weights and the optimizer variables are created outside the graph
+    #   jit_compile:                bool, compile the training step with XLA
+    #   log_every:                  int, steps between printing the training loss and accuracy
+    #   validation_batch:           int, validation batch size, None = validation.DEFAULT_VALIDATION_BATCH
+    #   validate_every:             int or 'epoch', training steps between validations or once at the end of every epoch
+    #   early_stopping:             dict or None, EarlyStopping parameters, training stops when the validation loss
+    #                               does not improve and the best weights are restored
     print("Training starts...")
     
     set_printoptions(precision=3)
@@ -94,54 +196,106 @@ def tf_training_loop(
         train_metric = tf.keras.metrics.Accuracy()
         validation_metric = tf.keras.metrics.Accuracy()
 
+    train_loss = tf.keras.metrics.Mean()
+    eager_step = train_step_function(
+                    model, 
+                    loss_function, 
+                    optimization_function, 
+                    optimizer, 
+                    output_shape, 
+                    onehot, 
+                    autoencoder, 
+                    (train_loss, train_metric)
+                    )
+    step_function = eager_step
+    
+    if validation is not None:
+        # Validation split is batched and cached once
+        validation = validation_pipeline(validation, validation_batch)
+        validation_metrics = (tf.keras.metrics.Mean(), validation_metric)
+        validation_step = validation_step_function(
+                            model, 
+                            loss_function, 
+                            lambda batch: parse_sample(batch, output_shape, onehot), 
+                            autoencoder, 
+                            validation_metrics
+                            )
+        stopper = EarlyStopping(**early_stopping) if early_stopping is not None else None
+    elif early_stopping is not None:
+        print("Early stopping needs a validation dataset...")
+        exit()
+
+    def validate():
+        # Evaluates the validation split, returns True if the training should stop
+        loss, accuracy = evaluate(validation, validation_step, validation_metrics)
+        if not autoencoder:
+            print("Validation accuracy", accuracy, " loss per element: ", loss)
+        else:
+            print("Validation loss per element: ", loss)
+        
+        if stopper is not None and stopper.update(loss, model.trainable_vars):
+            print("Validation loss has not improved in ", stopper.patience, " validations, training is stopped...")
+            return True
+        return False
+
+    global_step = 0
+    stop = False
     for epoch in range(epochs):
         # Reset the metric state
+        train_loss.reset_state()
         if train_metric is not None:
-            train_metric.reset_states()
+            train_metric.reset_state()
 
         for step, batch_x in enumerate(train):
-            print("Batch: ", step)
-            x, y = parse_sample(batch_x, output_shape, onehot)
-            if autoencoder:
-                y = x
-        
-            output, loss = optimization_function(
-                    model, 
-                    x, 
-                    y, 
-                    loss_function, 
-                    optimizer, 
-                    training=True
-                    )
+            step_function(batch_x)
+            global_step += 1
+            if compile and step_function is eager_step:
+                step_function = train_step_function(
+                                    model, 
+                                    loss_function, 
+                                    optimization_function, 
+                                    optimizer, 
+                                    output_shape, 
+                                    onehot, 
+                                    autoencoder, 
+                                    (train_loss, train_metric),
+                                    compile,
+                                    jit_compile,
+                                    train.element_spec
+                                    )
+                # Validation is traced after the weights are created
+                if validation is not None:
+                    validation_step = validation_step_function(
+                                        model, 
+                                        loss_function, 
+                                        lambda batch: parse_sample(batch, output_shape, onehot), 
+                                        autoencoder, 
+                                        validation_metrics,
+                                        compile,
+                                        validation.element_spec
+                                        )
             
-            if not autoencoder:
-                train_metric.update_state(tf.argmax(y, 1), tf.argmax(output, 1))
-                print("Overall training accuracy: ", train_metric.result().numpy(), " loss: ", loss.numpy())
-            else:
-                print("Training batch loss: ", loss.numpy())
-
-            if validation is not None:
-                total_val_loss = 0
-                if validation_metric is not None:
-                    validation_metric.reset_states()
-                if not validation_batch:
-                    validation_batch = validation.cardinality().numpy()
-                for batch in validation.batch(validation_batch):
-                    x, y = parse_sample(batch, output_shape, onehot)
-                    if autoencoder:
-                        y = x
-                    val_out = model.run(x, training=False)
-                    validation_loss = loss_function(val_out, y)
-                    total_val_loss =+ validation_loss.numpy()
-                    if validation_metric is not None:
-                        validation_metric.update_state(
-                                tf.argmax(y, 1), 
-                                tf.argmax(val_out, 1)
-                                )
-
+            if (step + 1) % log_every == 0:
+                print("Batch: ", step)
                 if not autoencoder:
-                    print("Validation accuracy", validation_metric.result().numpy(), " loss: ", total_val_loss)
+                    print("Overall training accuracy: ", train_metric.result().numpy(), " loss per element: ", train_loss.result().numpy())
                 else:
-                    print("Validation loss: ", total_val_loss)
+                    print("Training loss per element: ", train_loss.result().numpy())
+
+            if validation is not None and validate_every != 'epoch' and global_step % validate_every == 0:
+                stop = validate()
+                if stop:
+                    break
+
+        if stop:
+            break
+        print("Epoch ", epoch, " done...")
+        if validation is not None and validate_every == 'epoch':
+            stop = validate()
+            if stop:
+                break
+
+    if validation is not None and stopper is not None:
+        stopper.restore(model.trainable_vars)
 
     print("Training finished...")
@@ -0,0 +1,105 @@
+from .. import tf
+from .loss_functions import SAMPLE_LOSSES
+
+# Validation during the training
+# The validation split is batched, cached and prefetched once and evaluated on a schedule
+# ('validate_every' steps or once every epoch) instead of after every training step
+# Loss is a streaming mean of the per sample losses (loss_functions.SAMPLE_LOSSES) over the validation elements
+# so it does not depend on the batch size, batch losses of other loss functions are weighted by the batch size
+
+DEFAULT_VALIDATION_BATCH = 1024
+
+def validation_pipeline(validation, batch_size=None):
+    # Batches, caches and prefetches the validation split
+    # In:
+    #   validation:                 Tensorflow Dataset object, unbatched elements
+    #   batch_size:                 int, elements in a batch, None = DEFAULT_VALIDATION_BATCH
+    # Out:
+    #   validation:                 Tensorflow Dataset object, batched elements
+
+    return validation.batch(batch_size or DEFAULT_VALIDATION_BATCH).cache().prefetch(tf.data.experimental.AUTOTUNE)
+
+def validation_step_function(model, loss_function, parse, autoencoder, metrics, compile=False, element_spec=None):
+    # Creates the function evaluating one validation batch
+    # In:
+    #   parse:                      function, batch -> (x, y) (parse_sample with the models output shape)
+    #   metrics:                    tuple, (loss Mean metric, Accuracy metric or None)
+    #   compile:                    bool, trace the step with tf.function
+    #   element_spec:               element_spec of the batched validation dataset
+    # Out:
+    #   step:                       function, takes a batch
+
+    loss_metric, accuracy_metric = metrics
+    sample_loss = SAMPLE_LOSSES[loss_function][0] if loss_function in SAMPLE_LOSSES else None
+
+    def step(batch):
+        x, y = parse(batch)
+        if autoencoder:
+            y = x
+        output = model.run(x, training=False)
+        if sample_loss is not None:
+            loss_metric.update_state(sample_loss(output, y))
+        else:
+            loss_metric.update_state(loss_function(output, y), sample_weight=tf.cast(tf.shape(x)[0], tf.float32))
+        if accuracy_metric is not None:
+            accuracy_metric.update_state(tf.argmax(y, 1), tf.argmax(output, 1))
+
+    if compile:
+        return tf.function(step, input_signature=[element_spec] if element_spec is not None else None)
+    return step
+
+def evaluate(dataset, step, metrics):
+    # Evaluates the whole validation split
+    # Out:
+    #   (loss, accuracy):           tuple, (float, float or None)
+
+    for metric in metrics:
+        if metric is not None:
+            metric.reset_state()
+    for batch in dataset:
+        step(batch)
+
+    loss_metric, accuracy_metric = metrics
+    accuracy = float(accuracy_metric.result().numpy()) if accuracy_metric is not None else None
+    return (float(loss_metric.result().numpy()), accuracy)
+
+class EarlyStopping:
+    # Stops the training when the validation loss has not improved in 'patience' evaluations
+    # The weights of the best evaluation are kept in memory and restored when the training ends
+
+    def __init__(self, patience=3, min_delta=0., restore_best=True):
+        # In:
+        #   patience:                   int, evaluations without improvement before stopping
+        #   min_delta:                  float, smallest decrease of the loss counted as an improvement
+        #   restore_best:               bool, restore the weights of the best evaluation at the end
+        self.patience = patience
+        self.min_delta = min_delta
+        self.restore_best = restore_best
+        self.best_loss = None
+        self.best_weights = None
+        self.waited = 0
+
+    def update(self, loss, variables):
+        # Records an evaluation
+        # In:
+        #   loss:                       float, validation loss
+        #   variables:                  list, trainable tensorflow Variables
+        # Out:
+        #   stop:                       bool, True = training should stop
+
+        if self.best_loss is None or loss < self.best_loss - self.min_delta:
+            self.best_loss = loss
+            self.waited = 0
+            if self.restore_best:
+                self.best_weights = [v.numpy() for v in variables]
+            return False
+
+        self.waited += 1
+        return self.waited >= self.patience
+
+    def restore(self, variables):
+        # Assigns the best weights back to the variables
+        if self.restore_best and self.best_weights is not None:
+            for v, w in zip(variables, self.best_weights):
+                v.assign(w)
+            print("Weights restored from the best validation loss: ", self.best_loss)
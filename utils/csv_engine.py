@@ -0,0 +1,188 @@
+from . import nparray
+from numpy import fromstring as npfromstring, concatenate as npconcatenate, empty as npempty, frombuffer as npfrombuffer, \
+    cumsum as npcumsum, diff as npdiff, flatnonzero as npflatnonzero
+from concurrent.futures import ProcessPoolExecutor
+from csv import reader as csv_reader
+from io import StringIO
+from warnings import catch_warnings, simplefilter
+
+# Chunked CSV reader
+# The file is read in blocks of whole lines, unwanted characters are removed from a block at once
+# and numeric blocks are parsed by numpy instead of converting every value with float()
+# Blocks can be parsed in a process pool
+
+# Characters read from a file at once, the block is extended to the end of the line
+CSV_CHUNK_SIZE = 4 * 1024 * 1024
+
+def strip_characters(text, characters):
+    # Removes unwanted characters or strings from a text
+    # In:
+    #   text:                           str
+    #   characters:                     iterable, str, characters or strings to remove
+    # Out:
+    #   text:                           str
+
+    single = ''.join(c for c in characters if len(c) == 1)
+    if single:
+        text = text.translate({ord(c): None for c in single})
+    for c in characters:
+        if len(c) > 1:
+            text = text.replace(c, '')
+
+    return text
+
+def read_text_chunks(f, chunk_size=CSV_CHUNK_SIZE):
+    # Reads a text file in blocks which end at line ends
+    # In:
+    #   f:                              file object opened in text mode
+    #   chunk_size:                     int, characters in a block before it is extended to the line end
+    # Out:
+    #   generator:                      yields str blocks
+
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return
+        if not chunk.endswith('\n'):
+            chunk += f.readline()
+        yield chunk
+
+def parse_numeric_line(line, delimiter=',', dtype='float32'):
+    # Parses one line into a numeric array, quoted values are read like csv.reader reads them
+    # Out:
+    #   array:                          numpy array, None if the line is not numeric
+
+    values = next(csv_reader([line.strip()], delimiter=delimiter), [])
+    try:
+        return nparray([float(v) for v in values], dtype=dtype)
+    except ValueError:
+        return None
+
+def lines_aligned(text, n_columns, delimiter=','):
+    # Checks that every line of a block has n_columns - 1 delimiters
+    # The total count is not enough, a long and a short line add up to two lines of the right length
+    # In:
+    #   text:                           str, block of whole lines without empty lines
+    # Out:
+    #   aligned:                        bool
+
+    if len(delimiter) != 1 or not delimiter.isascii():
+        return all(line.count(delimiter) == n_columns - 1 for line in text.split('\n'))
+
+    # Delimiters before every line end, counted on the bytes of the block at once
+    characters = npfrombuffer(text.encode('utf-8'), dtype='uint8')
+    delimiters = npcumsum(characters == ord(delimiter))
+    line_ends = npflatnonzero(characters == ord('\n'))
+    counts = npdiff(npconcatenate(([0], delimiters[line_ends], delimiters[-1:])))
+    return bool((counts == n_columns - 1).all())
+
+def parse_numeric_chunk(text, n_columns, delimiter=',', dtype='float32', strip=()):
+    # Parses a block of lines into a 2d numeric array
+    # In:
+    #   text:                           str, block of whole lines
+    #   n_columns:                      int, values in every line
+    #   delimiter:                      str, value separator
+    #   dtype:                          str, datatype of the array
+    #   strip:                          tuple, characters removed before parsing
+    # Out:
+    #   array:                          numpy array, shape (lines, n_columns)
+
+    text = strip_characters(text, strip + ('\r',)).strip('\n')
+    if '\n\n' in text:
+        # Drop empty lines
+        text = '\n'.join(line for line in text.split('\n') if line.strip())
+    if not text.strip():
+        return npempty((0, n_columns), dtype=dtype)
+    n_lines = text.count('\n') + 1
+
+    values = None
+    # Every line must have its own n_columns values, a block with ragged lines is parsed line by line
+    aligned = lines_aligned(text, n_columns, delimiter)
+    with catch_warnings():
+        # Older numpy versions warn about unparsed data instead of raising
+        simplefilter('error', DeprecationWarning)
+        try:
+            if aligned:
+                values = npfromstring(text.replace('\n', delimiter), dtype=dtype, sep=delimiter)
+        except (ValueError, DeprecationWarning):
+            pass
+
+    if values is not None and values.size == n_lines * n_columns:
+        return values.reshape((n_lines, n_columns))
+
+    # Lines numpy can't parse (quoted values, underscores, blank lines) are parsed one by one
+    # so a ragged line raises instead of shifting the values of the following lines
+    rows = []
+    for line in text.split('\n'):
+        if not line.strip():
+            continue
+        parsed = parse_numeric_line(line, delimiter, dtype)
+        if parsed is None or parsed.size != n_columns:
+            raise ValueError("Line can't be converted to %d numeric values: %s" % (n_columns, line))
+        rows.append(parsed)
+
+    if not rows:
+        return npempty((0, n_columns), dtype=dtype)
+    return nparray(rows, dtype=dtype)
+
+def parse_string_chunk(text, delimiter=',', strip=()):
+    # Parses a block of lines into a 2d string array
+    text = strip_characters(text, strip)
+    return nparray([row for row in csv_reader(StringIO(text), delimiter=delimiter) if row], dtype=str)
+
+def read_csv(path, dtype='float32', delimiter=',', strip=(), chunk_size=CSV_CHUNK_SIZE, processes=None):
+    # Reads a csv file into a numpy array
+    # First line is used as a header if it is not numeric
+    # In:
+    #   path:                           Path, csv file
+    #   dtype:                          str, datatype of the values, str = values are not converted
+    #   delimiter:                      str, value separator
+    #   strip:                          tuple, characters or strings removed from the file
+    #   chunk_size:                     int, characters parsed at once
+    #   processes:                      int, processes parsing the blocks, None = parsed in this process
+    # Out:
+    #   (header, data):                 tuple, list of column names or None and numpy array (rows, columns)
+    #                                   ValueError is raised if a value can't be converted to dtype
+
+    strip = tuple(strip)
+    numeric = dtype is not str
+
+    with path.open('r', encoding='utf-8-sig') as f:
+        first = f.readline()
+        while first and not first.strip():
+            first = f.readline()
+        first = strip_characters(first, strip + ('\r', '\n'))
+
+        header = None
+        first_row = next(csv_reader([first], delimiter=delimiter), [])
+        if numeric and parse_numeric_line(first, delimiter, dtype) is None:
+            header = first_row
+        n_columns = len(first_row)
+
+        chunks = read_text_chunks(f, chunk_size)
+        if header is None:
+            chunks = prepend(first+'\n', chunks)
+
+        if numeric:
+            args = (n_columns, delimiter, dtype, strip)
+            parse = parse_numeric_chunk
+        else:
+            args = (delimiter, strip)
+            parse = parse_string_chunk
+
+        if processes is None:
+            arrays = [parse(chunk, *args) for chunk in chunks]
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                futures = [executor.submit(parse, chunk, *args) for chunk in chunks]
+                arrays = [future.result() for future in futures]
+
+    arrays = [a for a in arrays if len(a)]
+    if not arrays:
+        return (header, npempty((0, n_columns), dtype=dtype))
+
+    return (header, npconcatenate(arrays))
+
+def prepend(item, iterable):
+    yield item
+    yield from iterable
@@ -1,4 +1,6 @@
 
+from data.util.encoders import EncoderPipeline
+
 #TODO write comments
 
 def get_xy(instance):
@@ -58,25 +60,18 @@ def get_dataset_info(datasets, length=False):
     return ds_info
 
 def transform_features(data, encoders, inverse=False):
-    
-    def transform(d, enc):
-        if not inverse:
-            d = enc.transform(d)
-        else:
-            d = enc.inverse_transform(d)
-    
-    for encoder in encoders:
-        inp = encoder['Input']
-        ec = encoder['Encoder']
-        if inp != 'All':
-            if isinstance(ec, list):
-                for e in ec:
-                    transform(data[...,inp], e)
-            else:
-                transform(data[...,inp], ec)
-        else:
-            if isinstance(ec, list):
-                for e in ec:
-                    transform(data, e)
-            else:
-                transform(data, ec)
+    # Applies fitted encoders to a batch of data
+    # In:
+    #   data:                       array, rows of inputs (or features if inverse)
+    #   encoders:                   EncoderPipeline or {'Input', 'Encoder'} dicts
+    #   inverse:                    bool, if True features are transformed back into inputs
+    # Out:
+    #   data:                       numpy array, transformed data
+
+    if not isinstance(encoders, EncoderPipeline):
+        encoders = EncoderPipeline(encoders)
+
+    if inverse:
+        return encoders.inverse_transform(data)
+    else:
+        return encoders.transform(data)
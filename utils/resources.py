@@ -1,16 +1,18 @@
 from . import Path, nparray
 import cv2
-from csv import reader as csv_reader
+from .csv_engine import read_csv
+from sys import exit
 
 def take_image_screen(size=[]):
     pass
 
-def fetch_resource(path, desired_shape=None, desired_dtype=None):
+def fetch_resource(path, desired_shape=None, desired_dtype=None, csv_processes=None):
     # Handle resource fetching
     # In:
     #   path:                       Path Object
     #   desired_shape:              ?
     #   desired_dtype:              ?
+    #   csv_processes:              int, processes parsing a csv file, None = parsed in this process
 
     if path.exists():
         suf = path.suffix
@@ -52,37 +54,15 @@ def fetch_resource(path, desired_shape=None, desired_dtype=None):
 
         elif suf in ['.csv']:
             
-            def error(value):
-                print("Input must be numeric...  your input ", value ," can't be converted to a float...")
+            # Read csv file in chunks, a non numeric first row is taken as headers
+            try:
+                header, n_rows = read_csv(path, dtype=dtype, processes=csv_processes)
+            except ValueError as e:
+                print("Input must be numeric... ", e)
                 exit()
-            
-            # Read csv file
-            csv_file = csv_reader(path.open('r', encoding='utf8'), delimiter=',')
-            # Loop through rows
-            n_rows = []
-            for row_num, row in enumerate(csv_file):
-                # Loop through instances in a row
-                for i, value in enumerate(row):
-                    # Convert instance to float and replace the old value with converted
-                    if isinstance(value, str) or isinstance(value, int):
-                        try:
-                            value = float(value)
-                        except ValueError:
-                            if row_num != 0:
-                                error(value)
-                            else:
-                                print("Suspecting headers... skipping this row")
-                                row = None
-                                break
-                    else:
-                        error(value)
-
-                    row[i] = value
-                
-                if row is not None:
-                    n_rows.append(row)
 
-            n_rows = nparray(n_rows, dtype=dtype)
+            if header is not None:
+                print("Suspecting headers... skipping this row")
             
             if desired_shape is not None:
                 # Desired input array length